@@ -0,0 +1,66 @@
+"""Store the workbench config once per release
+
+Revision ID: c7e4a9f21d36
+Revises: e6a2d41c9b07
+Create Date: 2026-10-18 15:20:41.118342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e4a9f21d36'
+down_revision: Union[str, None] = 'e6a2d41c9b07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('release', sa.Column('workbench_config_json', sa.JSON(), nullable=True))
+    op.add_column('app', sa.Column('config_json', sa.JSON(), nullable=True))
+    op.add_column('service', sa.Column('config_json', sa.JSON(), nullable=True))
+
+    # every app and service of a release has a copy of the same config
+    op.execute("""
+        UPDATE release SET workbench_config_json = copies.workbench_config_json
+        FROM (
+            SELECT DISTINCT ON (release_id) release_id, workbench_config_json
+            FROM (
+                SELECT release_id, workbench_config_json FROM app
+                UNION ALL
+                SELECT release_id, workbench_config_json FROM service
+            ) AS rows
+            ORDER BY release_id
+        ) AS copies
+        WHERE copies.release_id = release.id
+    """)
+    op.execute("UPDATE app SET config_json = COALESCE(workbench_config_json -> 'apps' -> name, '{}'::json)")
+    op.execute("UPDATE service SET config_json = COALESCE(workbench_config_json -> 'services' -> name, '{}'::json)")
+
+    op.alter_column('app', 'config_json', nullable=False)
+    op.alter_column('service', 'config_json', nullable=False)
+    op.drop_column('app', 'workbench_config_json')
+    op.drop_column('service', 'workbench_config_json')
+
+
+def downgrade() -> None:
+    op.add_column('app', sa.Column('workbench_config_json', sa.JSON(), nullable=True))
+    op.add_column('service', sa.Column('workbench_config_json', sa.JSON(), nullable=True))
+
+    op.execute("""
+        UPDATE app SET workbench_config_json = COALESCE(release.workbench_config_json, '{}'::json)
+        FROM release WHERE release.id = app.release_id
+    """)
+    op.execute("""
+        UPDATE service SET workbench_config_json = COALESCE(release.workbench_config_json, '{}'::json)
+        FROM release WHERE release.id = service.release_id
+    """)
+
+    op.alter_column('app', 'workbench_config_json', nullable=False)
+    op.alter_column('service', 'workbench_config_json', nullable=False)
+    op.drop_column('service', 'config_json')
+    op.drop_column('app', 'config_json')
+    op.drop_column('release', 'workbench_config_json')
@@ -18,7 +18,14 @@ def install_node_modules() -> Optional[int]:
     proc = subprocess.run(['npm','install'])
     return proc.returncode
 
+def packages_installed(packages: List[str]) -> bool:
+    proc = subprocess.run(['dpkg','-s']+packages, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return proc.returncode == 0
+
 def install_extra_packages(packages: List[str]) -> int:
+    # release images install them in a cached layer before running build
+    if packages_installed(packages):
+        return 0
     proc = subprocess.run(['apt-get','-y','update'])
     if proc.returncode != 0:
         return proc.returncode
@@ -1,3 +1,3 @@
 #!/bin/bash
 
-poetry run celery -A workbench_backend.celery_tasks.celery_app worker --loglevel=DEBUG
+poetry run celery -A workbench_backend.celery_tasks.celery_app worker -Q celery,builds --loglevel=DEBUG
@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+import pytest
+from jose import jwt
+
+from workbench_backend.utils.jwks import JWKSKeyManager, JWKSUnavailable, UnknownKeyError
+
+from .util import JWKSServer, SigningKey
+
+
+def manager(server: JWKSServer, max_age: float = 60, refresh_ahead: float = 10, min_refetch_interval: float = 0) -> JWKSKeyManager:
+    return JWKSKeyManager(server.url, max_age, refresh_ahead, min_refetch_interval)
+
+
+@pytest.mark.asyncio
+async def test_keys_are_fetched_lazily_once() -> None:
+    key = SigningKey('one')
+    async with JWKSServer([key]) as server:
+        keys = manager(server)
+        assert server.requests == 0
+        found = await asyncio.gather(*(keys.get_key('one') for _ in range(10)))
+        assert server.requests == 1
+        assert all(jwk == key.jwk for jwk in found)
+        token = key.sign({'sub': 'user', 'exp': int(time.time()) + 60})
+        assert jwt.decode(token, found[0], algorithms=['RS256'])['sub'] == 'user'
+
+
+@pytest.mark.asyncio
+async def test_rotated_key_is_fetched() -> None:
+    old, new = SigningKey('old'), SigningKey('new')
+    async with JWKSServer([old]) as server:
+        keys = manager(server)
+        await keys.get_key('old')
+        server.keys = [new]
+        assert await keys.get_key('new') == new.jwk
+        assert server.requests == 2
+        with pytest.raises(UnknownKeyError):
+            await keys.get_key('old')
+
+
+@pytest.mark.asyncio
+async def test_unknown_kid_refetch_is_rate_limited() -> None:
+    async with JWKSServer([SigningKey('one')]) as server:
+        keys = manager(server, min_refetch_interval=60)
+        await keys.get_key('one')
+        for _ in range(5):
+            with pytest.raises(UnknownKeyError):
+                await keys.get_key('forged')
+        assert server.requests == 1
+
+
+@pytest.mark.asyncio
+async def test_keys_are_refreshed_ahead() -> None:
+    async with JWKSServer([SigningKey('one')]) as server:
+        keys = manager(server, max_age=0.2, refresh_ahead=0.15)
+        await keys.get_key('one')
+        await asyncio.sleep(0.1)
+        await keys.get_key('one')
+        # served from the cache, the refresh runs in the background
+        assert server.requests == 1
+        assert keys._refresh_task is not None
+        await keys._refresh_task
+        assert server.requests == 2
+
+
+@pytest.mark.asyncio
+async def test_cached_keys_outlive_an_outage() -> None:
+    key = SigningKey('one')
+    async with JWKSServer([key]) as server:
+        server.available = False
+        keys = manager(server, max_age=0.05)
+        with pytest.raises(JWKSUnavailable):
+            await keys.get_key('one')
+
+        server.available = True
+        await keys.get_key('one')
+        server.available = False
+        await asyncio.sleep(0.05)
+        assert await keys.get_key('one') == key.jwk
+        assert server.requests == 3
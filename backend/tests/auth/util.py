@@ -0,0 +1,58 @@
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+
+class SigningKey:
+
+    def __init__(self, kid: str) -> None:
+        self.kid = kid
+        self._key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    @property
+    def jwk(self) -> Dict[str, Any]:
+        public = self._key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        return {**jwk.construct(public, 'RS256').to_dict(), 'kid': self.kid, 'use': 'sig'}
+
+    def sign(self, claims: Dict[str, Any]) -> str:
+        private = self._key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+        return jwt.encode(claims, private, algorithm='RS256', headers={'kid': self.kid})
+
+
+class JWKSServer:
+    """Stand-in for the keycloak certs endpoint, counts the requests it serves."""
+
+    def __init__(self, keys: Optional[List[SigningKey]] = None) -> None:
+        self.keys = keys or []
+        self.available = True
+        self.requests = 0
+        self.url = ''
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _certs(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if not self.available:
+            return web.Response(status=503)
+        return web.json_response({'keys': [key.jwk for key in self.keys]})
+
+    async def __aenter__(self) -> 'JWKSServer':
+        app = web.Application()
+        app.router.add_get('/protocol/openid-connect/certs', self._certs)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1] # type: ignore
+        self.url = f'http://127.0.0.1:{port}/protocol/openid-connect/certs'
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        assert self._runner is not None
+        await self._runner.cleanup()
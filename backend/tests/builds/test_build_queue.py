@@ -0,0 +1,162 @@
+import asyncio
+import time
+from typing import AsyncIterator, List
+
+import pytest
+import pytest_asyncio
+
+from workbench_backend.celery_tasks.build_queue import (
+    QUEUE_PREFIX,
+    RUNNING_KEY,
+    USERS_KEY,
+    BuildJob,
+    BuildQueue,
+)
+from workbench_backend.docker.build_progress import BuildPhase, BuildProgress, progress_key, tail_build_progress
+from workbench_backend.utils.clients import clients
+
+USERS = ['alice', 'bob', 'carol']
+RELEASES = range(1, 10)
+
+
+class RecordingQueue(BuildQueue):
+    """Records the builds it starts instead of sending them to the workers."""
+
+    def __init__(self, max_concurrent: int, lease: float) -> None:
+        super().__init__(max_concurrent, lease)
+        self.started: List[BuildJob] = []
+        self.failures = 0
+
+    def _dispatch(self, job: BuildJob) -> None:
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('broker unavailable')
+        self.started.append(job)
+
+
+async def clear() -> None:
+    await clients.redis().delete(
+        USERS_KEY, RUNNING_KEY,
+        *(QUEUE_PREFIX + user for user in USERS),
+        *(progress_key(release) for release in RELEASES)
+    )
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def clean() -> AsyncIterator[None]:
+    await clear()
+    yield
+    await clear()
+    await clients.close()
+
+
+def job(release_id: int, user: str) -> BuildJob:
+    return BuildJob(release_id, 1, user, f'v{release_id}', None, time.time())
+
+
+def started(queue: RecordingQueue) -> List[int]:
+    return [job.release_id for job in queue.started]
+
+
+@pytest.mark.asyncio
+async def test_users_take_turns() -> None:
+    queue = RecordingQueue(0, 60)
+    for release_id, user in [(1, 'alice'), (2, 'alice'), (3, 'alice'), (4, 'bob'), (5, 'carol')]:
+        await queue.enqueue(job(release_id, user))
+    assert queue.started == []
+
+    queue.max_concurrent = 1
+    await queue.schedule()
+    for release_id in [1, 4, 5, 2]:
+        assert started(queue)[-1] == release_id
+        await queue.finish(release_id)
+    assert started(queue) == [1, 4, 5, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_concurrency_cap() -> None:
+    queue = RecordingQueue(2, 60)
+    for release_id in range(1, 6):
+        await queue.enqueue(job(release_id, 'alice'))
+    assert started(queue) == [1, 2]
+
+    await queue.finish(1)
+    assert started(queue) == [1, 2, 3]
+    assert await clients.redis().zcard(RUNNING_KEY) == 2
+
+
+@pytest.mark.asyncio
+async def test_expired_leases_free_their_slot() -> None:
+    queue = RecordingQueue(1, 0.3)
+    await queue.enqueue(job(1, 'alice'))
+    await queue.enqueue(job(2, 'alice'))
+    await queue.enqueue(job(3, 'alice'))
+    assert started(queue) == [1]
+
+    # a running build keeps renewing its lease
+    async with queue.running(1):
+        await asyncio.sleep(0.6)
+        await queue.schedule()
+        assert started(queue) == [1]
+    assert started(queue) == [1, 2]
+
+    # the lease of a build whose worker died runs out
+    await asyncio.sleep(0.4)
+    await queue.schedule()
+    assert started(queue) == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_a_build_started_after_its_lease_ran_out_takes_its_slot_again() -> None:
+    queue = RecordingQueue(1, 0.3)
+    await queue.enqueue(job(1, 'alice'))
+    await queue.enqueue(job(2, 'alice'))
+    assert started(queue) == [1]
+
+    # the worker picks up the build after the lease of its dispatch ran out
+    await asyncio.sleep(0.4)
+    async with queue.running(1):
+        await queue.schedule()
+        assert started(queue) == [1]
+        assert await clients.redis().zscore(RUNNING_KEY, 1) is not None
+    assert started(queue) == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_a_build_that_could_not_be_started_stays_first() -> None:
+    queue = RecordingQueue(1, 60)
+    queue.failures = 1
+    await queue.enqueue(job(1, 'alice'))
+    assert queue.started == []
+    assert await clients.redis().zcard(RUNNING_KEY) == 0
+
+    await queue.enqueue(job(2, 'alice'))
+    assert started(queue) == [1]
+
+
+@pytest.mark.asyncio
+async def test_progress_can_be_tailed_and_resumed() -> None:
+    progress = BuildProgress(1, flush_interval=0.01)
+    await progress.phase(BuildPhase.STARTED)
+    events: List[str] = []
+
+    async def tail(last_id: str = '0') -> List[str]:
+        entries = []
+        async for entry_id, fields in tail_build_progress(1, last_id, block=0.1):
+            events.append(entry_id)
+            entries.append(fields.get('phase') or fields['line'])
+        return entries
+
+    reader = asyncio.create_task(tail())
+    await progress.phase(BuildPhase.BUILDING)
+    for i in range(3):
+        progress.log(f'step {i}')
+    await asyncio.sleep(0.05)
+    await progress.close()
+    await progress.phase(BuildPhase.READY, duration='1.000')
+
+    assert await asyncio.wait_for(reader, 5) == ['started', 'building', 'step 0', 'step 1', 'step 2', 'ready']
+    assert await tail(events[2]) == ['step 1', 'step 2', 'ready']
+    # a finished build ends the tail right away
+    assert await tail(events[-1]) == []
+    assert 0 < await clients.redis().ttl(progress_key(1)) <= progress.ttl
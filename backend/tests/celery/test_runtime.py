@@ -0,0 +1,115 @@
+import asyncio
+import time
+from typing import Any, Iterator
+
+import aiohttp
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from workbench_backend.app.config import config
+from workbench_backend.celery_tasks import runtime as runtime_module
+from workbench_backend.celery_tasks import to_sync
+from workbench_backend.celery_tasks.runtime import WorkerRuntime
+from workbench_backend.utils.clients import clients
+
+
+@pytest.fixture
+def runtime(monkeypatch: pytest.MonkeyPatch) -> Iterator[WorkerRuntime]:
+    runtime = WorkerRuntime()
+    monkeypatch.setattr(to_sync, 'worker_runtime', runtime)
+    yield runtime
+    runtime.stop()
+
+
+async def task_loop() -> asyncio.AbstractEventLoop:
+    return asyncio.get_running_loop()
+
+
+async def task_http_client() -> aiohttp.ClientSession:
+    return clients.http()
+
+
+async def failing_task() -> None:
+    raise ValueError('task failed')
+
+
+def test_tasks_share_the_loop_and_clients(runtime: WorkerRuntime) -> None:
+    assert runtime.run(task_loop()) is runtime.run(task_loop())
+    session = runtime.run(task_http_client())
+    assert runtime.run(task_http_client()) is session
+    with pytest.raises(ValueError, match='task failed'):
+        runtime.run(failing_task())
+    assert runtime.run(task_http_client()) is session
+
+    runtime.stop()
+    assert session.closed
+    assert not runtime.running
+    # started again on the next task
+    assert not runtime.run(task_loop()).is_closed()
+
+
+def test_syncify_runs_on_the_worker_runtime(runtime: WorkerRuntime) -> None:
+    get_loop = to_sync.syncify(task_loop)
+    assert get_loop() is get_loop()
+    assert runtime.running
+
+
+@pytest.fixture
+def pooled_engine(monkeypatch: pytest.MonkeyPatch) -> Iterator[AsyncEngine]:
+    # the test engine doesn't pool, the worker's does
+    engine = create_async_engine(config.DB_URI, pool_size=2, max_overflow=0)
+    monkeypatch.setattr(runtime_module, 'async_engine', engine)
+    yield engine
+    engine.sync_engine.dispose()
+
+
+def test_tasks_reuse_pooled_connections(runtime: WorkerRuntime, pooled_engine: AsyncEngine) -> None:
+    connects = 0
+
+    def on_connect(*args: Any) -> None:
+        nonlocal connects
+        connects += 1
+
+    event.listen(pooled_engine.sync_engine, 'connect', on_connect)
+
+    async def query() -> int:
+        async with pooled_engine.connect() as conn:
+            assert (await conn.execute(text('SELECT 1'))).scalar() == 1
+            return id((await conn.get_raw_connection()).driver_connection)
+
+    first = runtime.run(query())
+    assert runtime.run(query()) == first
+    assert connects == 1
+    assert pooled_engine.sync_engine.pool.checkedin() == 1  # type: ignore
+
+    # closed when the worker stops
+    runtime.stop()
+    assert pooled_engine.sync_engine.pool.checkedin() == 0  # type: ignore
+
+
+@pytest.mark.benchmark
+def test_per_task_overhead(runtime: WorkerRuntime) -> None:
+    async def task() -> None:
+        clients.http()
+
+    async def with_own_loop() -> None:
+        # what every task did before, the clients of a finished loop can't be reused
+        try:
+            await task()
+        finally:
+            await clients.close()
+
+    count = 200
+    start = time.perf_counter()
+    for _ in range(count):
+        asyncio.run(with_own_loop())
+    own_loop = (time.perf_counter() - start) / count
+
+    runtime.run(task())
+    start = time.perf_counter()
+    for _ in range(count):
+        runtime.run(task())
+    shared_loop = (time.perf_counter() - start) / count
+
+    print(f'per task overhead: {own_loop * 1e6:.0f} us with a loop per task, {shared_loop * 1e6:.0f} us on the worker runtime')
@@ -0,0 +1,106 @@
+import asyncio
+import tempfile
+from pathlib import Path
+from typing import AsyncIterator, Tuple
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+
+from workbench_backend.utils.clients import ClientRegistry
+from workbench_backend.utils.metrics import metrics
+
+
+class Upstream:
+    """Counts the requests it is serving at the same time."""
+
+    def __init__(self) -> None:
+        self.active = 0
+        self.peak = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.05)
+        self.active -= 1
+        return web.json_response({'ApiVersion': '1.41', 'Version': 'test'})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route('*', '/{tail:.*}', self.handle)
+        return app
+
+
+def registry(docker_host: str = 'unix:///nonexistent.sock', max_connections: int = 10) -> ClientRegistry:
+    return ClientRegistry(
+        docker_host, 'redis://127.0.0.1:9', max_connections, max_connections, max_connections, 60, max_connections
+    )
+
+
+@pytest_asyncio.fixture
+async def http_upstream() -> AsyncIterator[Tuple[Upstream, str]]:
+    upstream = Upstream()
+    runner = web.AppRunner(upstream.app())
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    yield upstream, f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}' # type: ignore
+    await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_http_connections_are_shared_and_bounded(http_upstream: Tuple[Upstream, str]) -> None:
+    upstream, url = http_upstream
+    clients = registry(max_connections=2)
+    assert clients.http() is clients.http()
+
+    async def get() -> None:
+        async with clients.http().get(url) as resp:
+            resp.raise_for_status()
+
+    await asyncio.gather(*(get() for _ in range(10)))
+    assert upstream.peak == 2
+    counts = clients._collect()
+    assert counts['clients.http.open_connections'] == 2
+    assert counts['clients.http.connections_in_use'] == 0
+
+    await clients.close()
+    assert clients._collect()['clients.http.open_connections'] == 0
+
+
+@pytest.mark.asyncio
+async def test_blocking_redis_has_its_own_pool() -> None:
+    clients = ClientRegistry('unix:///nonexistent.sock', 'redis://127.0.0.1:9', 10, 10, 10, 60, 3)
+    blocking = clients.blocking_redis()
+    assert blocking is clients.blocking_redis()
+    assert blocking is not clients.redis()
+    assert blocking.connection_pool is not clients.redis().connection_pool
+    assert blocking.connection_pool.max_connections == 3
+    assert clients._collect()['clients.blocking_redis.open_connections'] == 0
+    await clients.close()
+
+
+@pytest.mark.asyncio
+async def test_docker_health_check() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        socket_path = str(Path(tmp) / 'docker.sock')
+        runner = web.AppRunner(Upstream().app())
+        await runner.setup()
+        await web.UnixSite(runner, socket_path).start()
+        clients = registry(f'unix://{socket_path}')
+        try:
+            docker = clients.docker()
+            assert docker is clients.docker()
+            assert await clients.check_health() == {'docker': True}
+            counts = clients._collect()
+            assert counts['clients.docker.healthy'] == 1
+            assert counts['clients.docker.open_connections'] == 1
+
+            await runner.cleanup()
+            errors = metrics.counter('clients.docker.health_check_errors')
+            assert await clients.check_health() == {'docker': False}
+            assert metrics.counter('clients.docker.health_check_errors') == errors + 1
+            assert clients._collect()['clients.docker.healthy'] == 0
+        finally:
+            await clients.close()
+            await runner.cleanup()
@@ -1,5 +1,6 @@
 import asyncio
-from typing import AsyncGenerator, Generator
+from pathlib import Path
+from typing import AsyncGenerator, Generator, Iterator
 
 import pytest
 import pytest_asyncio
@@ -10,6 +11,8 @@ from workbench_backend.db.models import *  # noqa
 from workbench_backend.db.models.base import Base
 from workbench_backend.db.session import async_engine, session_context
 
+from .git.util import git
+
 
 @pytest_asyncio.fixture(scope='session', autouse=True)
 def event_loop() -> Generator[asyncio.AbstractEventLoop, None, None]:
@@ -39,3 +42,23 @@ async def db() -> AsyncGenerator[None, None]:
          yield
          await conn.run_sync(Base.metadata.drop_all)
          await conn.commit()
+
+@pytest.fixture
+def repo_path(tmp_path: Path) -> Iterator[Path]:
+    git(tmp_path, 'init', '-b', 'main')
+    (tmp_path / 'workbench.yml').write_text('apps: {}\n')
+    (tmp_path / 'main.py').write_text('print(1)\n')
+    (tmp_path / 'removed.py').write_text('')
+    git(tmp_path, 'add', '.')
+    git(tmp_path, 'commit', '-m', 'init')
+    git(tmp_path, 'tag', 'v1')
+    git(tmp_path, 'tag', 'a-tag')
+    git(tmp_path, 'branch', 'feature')
+
+    (tmp_path / 'main.py').write_text('print(2)\n')
+    (tmp_path / 'staged.py').write_text('')
+    git(tmp_path, 'add', 'staged.py')
+    (tmp_path / 'removed.py').unlink()
+    (tmp_path / 'untracked_dir').mkdir()
+    (tmp_path / 'untracked_dir' / 'file.txt').write_text('')
+    yield tmp_path
@@ -0,0 +1,121 @@
+import uuid
+from typing import AsyncGenerator, Dict
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+
+from workbench_backend.crud.exceptions import DBNotFoundException, InvalidAccess
+from workbench_backend.crud.load_plan import LoadPlan
+from workbench_backend.crud.schemas.repository import (
+    RepositoryCRUD,
+    RepositoryResponseSchema,
+    RepositoryUpdateSchema,
+)
+from workbench_backend.db.models import Repository, User
+from workbench_backend.db.models.mixins import ReadWriteEnum
+from workbench_backend.db.session import session
+
+from .util import QueryCounter, random_string
+
+
+@pytest_asyncio.fixture
+async def users() -> AsyncGenerator[Dict[str, User], None]:
+    """A repository shared with a reader and a writer, and one that is not shared."""
+    users = {
+        name: User(id=uuid.uuid4(), username=random_string(), email=random_string())
+        for name in ('owner', 'reader', 'writer', 'stranger')
+    }
+    records = {name: User(id=user.id, username=user.username, email=user.email) for name, user in users.items()}
+    session.add_all(users.values())
+    await session.commit()
+    session.add(Repository(name='shared', owner_id=records['owner'].id))
+    session.add(Repository(name='private', owner_id=records['owner'].id))
+    await session.commit()
+    shared = (await session.execute(
+        select(Repository).where(Repository.owner_id == records['owner'].id, Repository.name == 'shared')
+    )).scalar_one()
+    crud = RepositoryCRUD.make_instance(session, True)
+    await crud.share(shared, records['reader'].id, ReadWriteEnum.READ)
+    await session.refresh(shared)
+    await crud.share(shared, records['writer'].id, ReadWriteEnum.WRITE)
+    session.expunge_all()
+
+    yield records
+
+    for repo in (await session.execute(select(Repository).where(Repository.owner_id == records['owner'].id))).scalars():
+        await session.delete(repo)
+    for user in records.values():
+        await session.delete(await session.get(User, user.id))
+    await session.commit()
+    session.expunge_all()
+
+
+async def list_access(user: User) -> Dict[str, ReadWriteEnum]:
+    with RepositoryCRUD.make_instance(session).with_user(user) as crud:
+        page = await crud.read_page({}, plan=LoadPlan.for_schema(Repository, RepositoryResponseSchema))
+    return {repo.name: repo.access for repo in page.items} # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_access_is_loaded_with_each_row(users: Dict[str, User]) -> None:
+    with QueryCounter() as counter:
+        owned = await list_access(users['owner'])
+    assert len(counter.statements) == 1
+    # the share rows of the owner's repository must not repeat it
+    assert counter.loaded['Repository'] == 2
+    assert owned == {'shared': ReadWriteEnum.WRITE, 'private': ReadWriteEnum.WRITE}
+
+    assert await list_access(users['reader']) == {'shared': ReadWriteEnum.READ}
+    assert await list_access(users['writer']) == {'shared': ReadWriteEnum.WRITE}
+    assert await list_access(users['stranger']) == {}
+    session.expunge_all()
+
+
+@pytest.mark.asyncio
+async def test_read_with_permission_is_one_query(users: Dict[str, User]) -> None:
+    with RepositoryCRUD.make_instance(session).with_user(users['reader']) as crud:
+        id = (await crud.read_page({})).items[0].id
+        session.expunge_all()
+        with QueryCounter() as counter:
+            repo = await crud.read_by_id(id)
+            loaded = len(counter.statements)
+            assert await crud.get_rw_access(repo) == ReadWriteEnum.READ
+        assert len(counter.statements) == loaded
+        assert len([statement for statement in counter.statements if 'share_link' in statement]) == 1
+
+        with pytest.raises(InvalidAccess):
+            await crud.update(repo, RepositoryUpdateSchema(name=random_string()))
+    # every request has its own session, objects keep the access they were loaded with
+    session.expunge_all()
+
+    with RepositoryCRUD.make_instance(session).with_user(users['writer']) as crud:
+        repo = await crud.read_by_id(id)
+        repo = await crud.update(repo, RepositoryUpdateSchema(name='renamed'))
+        assert repo.access == ReadWriteEnum.WRITE
+
+    with RepositoryCRUD.make_instance(session).with_user(users['stranger']) as crud:
+        with pytest.raises(DBNotFoundException):
+            await crud.read_by_id(id)
+    session.expunge_all()
+
+
+@pytest.mark.asyncio
+async def test_share_and_unshare_are_single_statements(users: Dict[str, User]) -> None:
+    with RepositoryCRUD.make_instance(session).with_user(users['owner']) as crud:
+        repo = (await crud.read_page({'name': 'private'})).items[0]
+        with QueryCounter() as counter:
+            await crud.share(repo, users['stranger'].id, ReadWriteEnum.WRITE)
+        assert len(counter.statements) == 1
+        assert await list_access(users['stranger']) == {'private': ReadWriteEnum.WRITE}
+
+        repo = (await crud.read_page({'name': 'private'})).items[0]
+        with QueryCounter() as counter:
+            await crud.delete_share(repo, users['stranger'].id)
+        assert len(counter.statements) == 1
+        assert await list_access(users['stranger']) == {}
+
+        repo = (await crud.read_page({'name': 'private'})).items[0]
+        with pytest.raises(DBNotFoundException):
+            await crud.delete_share(repo, users['stranger'].id)
+    session.expunge_all()
@@ -0,0 +1,142 @@
+import contextlib
+import time
+import uuid
+from typing import Any, AsyncIterator, Iterator
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from jose import jwt
+
+from workbench_backend.dependencies import auth
+from workbench_backend.utils.jwks import JWKSKeyManager
+from workbench_backend.utils.ttl_cache import TTLCache
+
+from ..auth.util import JWKSServer, SigningKey
+from .util import QueryCounter, random_string
+
+
+@pytest_asyncio.fixture
+async def signing_key(monkeypatch: pytest.MonkeyPatch) -> AsyncIterator[SigningKey]:
+    key = SigningKey('workbench')
+    async with JWKSServer([key]) as server:
+        monkeypatch.setattr(auth, 'key_manager', JWKSKeyManager(server.url, 60, 10, 10))
+        auth.token_cache.clear()
+        auth.user_cache.clear()
+        yield key
+    auth.token_cache.clear()
+    auth.user_cache.clear()
+
+
+def make_token(signing_key: SigningKey, sub: str, exp: float) -> str:
+    return signing_key.sign({
+        'sub': sub,
+        'exp': int(exp),
+        'preferred_username': random_string(),
+        'email': random_string(),
+        'resource_access': {'workbench-api': {'roles': ['repo']}},
+    })
+
+
+def test_entries_expire() -> None:
+    cache: TTLCache[str, int] = TTLCache('test_cache', 2, 60)
+    cache.set('expired', 1, time.time() - 1)
+    cache.set('a', 2)
+    cache.set('b', 3)
+    cache.set('c', 4)
+    assert cache.get('expired') is None
+    assert cache.get('a') is None
+    assert cache.get('c') == 4
+
+
+@pytest.mark.asyncio
+async def test_cached_user_is_invalidated(test_client: AsyncClient, signing_key: SigningKey) -> None:
+    sub = str(uuid.uuid4())
+    headers = {'Authorization': f'Bearer {make_token(signing_key, sub, time.time() + 60)}'}
+    # the first request creates the user
+    assert (await test_client.get('/user/me', headers=headers)).json()['id'] == sub
+
+    with QueryCounter() as counter:
+        for _ in range(3):
+            response = await test_client.get('/user/me', headers=headers)
+            assert response.status_code == 200
+            assert response.json()['id'] == sub
+    assert counter.statements == []
+
+    auth.invalidate_user(sub)
+    with QueryCounter() as counter:
+        await test_client.get('/user/me', headers=headers)
+    assert counter.loaded == {'User': 1}
+
+
+@pytest.mark.asyncio
+async def test_expired_token_is_rejected(test_client: AsyncClient, signing_key: SigningKey) -> None:
+    headers = {'Authorization': f'Bearer {make_token(signing_key, str(uuid.uuid4()), time.time() - 1)}'}
+    assert (await test_client.get('/user/me', headers=headers)).status_code == 401
+
+
+async def get_me(test_client: AsyncClient, token: str, requests: int) -> None:
+    for _ in range(requests):
+        response = await test_client.get('/user/me', headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 200
+
+
+async def requests_per_second(test_client: AsyncClient, token: str, requests: int) -> float:
+    start = time.perf_counter()
+    await get_me(test_client, token, requests)
+    return requests / (time.perf_counter() - start)
+
+
+@contextlib.contextmanager
+def caches_disabled() -> Iterator[None]:
+    sizes = auth.token_cache.maxsize, auth.user_cache.maxsize
+    auth.token_cache.maxsize = auth.user_cache.maxsize = 0
+    auth.token_cache.clear()
+    auth.user_cache.clear()
+    try:
+        yield
+    finally:
+        auth.token_cache.maxsize, auth.user_cache.maxsize = sizes
+
+
+@pytest.mark.asyncio
+async def test_user_me_is_served_from_cache(test_client: AsyncClient, signing_key: SigningKey, monkeypatch: pytest.MonkeyPatch) -> None:
+    requests = 20
+    token = make_token(signing_key, str(uuid.uuid4()), time.time() + 600)
+    decodes = 0
+    decode = jwt.decode
+
+    def counting_decode(*args: Any, **kwargs: Any) -> Any:
+        nonlocal decodes
+        decodes += 1
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(auth.jwt, 'decode', counting_decode)
+    await get_me(test_client, token, 1)
+
+    decodes = 0
+    with caches_disabled(), QueryCounter() as uncached_counter:
+        await get_me(test_client, token, requests)
+    assert decodes == requests
+    assert uncached_counter.statements
+
+    await get_me(test_client, token, 1)
+    decodes = 0
+    with QueryCounter() as cached_counter:
+        await get_me(test_client, token, requests)
+    assert decodes == 0
+    assert cached_counter.statements == []
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_user_me_benchmark(test_client: AsyncClient, signing_key: SigningKey) -> None:
+    requests = 300
+    token = make_token(signing_key, str(uuid.uuid4()), time.time() + 600)
+    await get_me(test_client, token, 1)
+
+    with caches_disabled():
+        uncached = await requests_per_second(test_client, token, requests)
+    await get_me(test_client, token, 1)
+    cached = await requests_per_second(test_client, token, requests)
+    print(f"/user/me: {uncached:.0f} req/s uncached, {cached:.0f} req/s cached")
@@ -0,0 +1,104 @@
+import uuid
+from typing import AsyncGenerator, List, Tuple
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete
+
+from workbench_backend.crud.exceptions import InvalidAccess
+from workbench_backend.crud.schemas.app import AppCreateSchema, AppCRUD, AppUpdateSchema
+from workbench_backend.db.models import App, Release, Repository, User
+from workbench_backend.db.session import async_engine, session
+
+from .util import QueryCounter, random_string
+
+APPS = 30
+
+
+def statements(counter: QueryCounter, kind: str) -> List[str]:
+    return [statement for statement in counter.statements if statement.lstrip().upper().startswith(kind)]
+
+
+@pytest_asyncio.fixture
+async def release() -> AsyncGenerator[Tuple[User, User, int], None]:
+    user = User(id=uuid.uuid4(), username=random_string(), email=random_string())
+    other = User(id=uuid.uuid4(), username=random_string(), email=random_string())
+    repo = Repository(name=random_string(), owner=user)
+    release = Release(name=random_string(), git_tag=random_string(), repository=repo, owner=user)
+    session.add_all([user, other, repo, release])
+    await session.commit()
+    await session.refresh(release)
+    release_id = release.id
+    await session.refresh(user)
+    await session.refresh(other)
+
+    yield user, other, release_id
+
+    await session.execute(delete(App).where(App.release_id == release_id))
+    await session.delete(release)
+    await session.delete(repo)
+    await session.delete(user)
+    await session.delete(other)
+    await session.commit()
+
+
+def create_args(release_id: int, names: List[str]) -> List[AppCreateSchema]:
+    return [AppCreateSchema(name=name, release_id=release_id, config_json={}) for name in names]
+
+
+@pytest.mark.asyncio
+async def test_create_and_update_many(release: Tuple[User, User, int]) -> None:
+    user, _, release_id = release
+    crud = AppCRUD.make_instance(session)
+    names = [random_string() for _ in range(APPS)]
+
+    with crud.with_user(user) as c:
+        apps = await c.create_many(create_args(release_id, names))
+    assert [app.name for app in apps] == names
+    assert all(app.owner_id == user.id and not app.ready for app in apps)
+
+    await session.refresh(user)
+    with crud.with_user(user) as c:
+        apps = await c.update_many(apps, AppUpdateSchema(ready=True))
+    assert [app.name for app in apps] == names
+    assert all(app.ready for app in apps)
+
+    admin = AppCRUD.make_instance(session, True)
+    assert await admin.create_many([]) == []
+    assert await admin.update_many([], AppUpdateSchema(ready=False)) == []
+
+
+# sqlite can't keep the RETURNING rows of a batch in order, there sqlalchemy inserts one row at a time
+@pytest.mark.skipif(async_engine.dialect.name != 'postgresql', reason='batched INSERT ... RETURNING in order')
+@pytest.mark.asyncio
+async def test_bulk_statements(release: Tuple[User, User, int]) -> None:
+    user, _, release_id = release
+    crud = AppCRUD.make_instance(session, True)
+    with crud.with_user(user) as c:
+        with QueryCounter() as counter:
+            apps = await c.create_many(create_args(release_id, [random_string() for _ in range(APPS)]))
+    assert len(statements(counter, 'INSERT')) == 1
+    # the insert, and loading the new rows back with their owners
+    assert len(counter.statements) <= 3
+
+    with QueryCounter() as counter:
+        await crud.update_many(apps, AppUpdateSchema(ready=True))
+    assert len(statements(counter, 'UPDATE')) == 1
+    assert len(counter.statements) <= 3
+
+
+@pytest.mark.asyncio
+async def test_update_many_needs_write_access(release: Tuple[User, User, int]) -> None:
+    user, other, release_id = release
+    other_id = other.id
+    crud = AppCRUD.make_instance(session)
+    with crud.with_user(user) as c:
+        app_id = (await c.create_many(create_args(release_id, [random_string()])))[0].id
+        await c.share(await c.read_by_id(app_id), other_id)
+
+    await session.refresh(other)
+    with crud.with_user(other) as c:
+        app = await c.read_by_id(app_id)
+        with pytest.raises(InvalidAccess):
+            await c.update_many([app], AppUpdateSchema(ready=True))
+        assert not (await c.read_by_id(app_id)).ready
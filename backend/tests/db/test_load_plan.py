@@ -0,0 +1,87 @@
+import uuid
+from typing import AsyncGenerator
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+
+from workbench_backend.crud.load_plan import LoadPlan
+from workbench_backend.crud.schemas.app import AppCRUD, AppResponseSchema
+from workbench_backend.crud.schemas.release import ReleaseResponseSchema
+from workbench_backend.crud.schemas.user import UserCRUD
+from workbench_backend.db.models import App, Release, Repository, Service, User
+from workbench_backend.db.session import session
+
+from .util import QueryCounter, random_string
+
+RELEASES = 3
+PER_RELEASE = 4
+
+
+@pytest_asyncio.fixture
+async def owner_id() -> AsyncGenerator[uuid.UUID, None]:
+    """A user owning releases with apps and services, everything shared with another user."""
+    user_id, other_id = uuid.uuid4(), uuid.uuid4()
+    user = User(id=user_id, username=random_string(), email=random_string())
+    other = User(id=other_id, username=random_string(), email=random_string())
+    repo = Repository(name=random_string(), owner=user, shared_with=[other])
+    for _ in range(RELEASES):
+        release = Release(name=random_string(), git_tag=random_string(), repository=repo, owner=user, shared_with=[other])
+        for _ in range(PER_RELEASE):
+            name = random_string()
+            session.add(App(name=name, release=release, owner=user, config_json={}, shared_with=[other]))
+            session.add(Service(name=name, release=release, owner=user, config_json={}, shared_with=[other]))
+    session.add_all([user, other, repo])
+    await session.commit()
+    session.expunge_all()
+
+    yield user_id
+
+    for repo in (await session.execute(select(Repository).where(Repository.owner_id == user_id))).scalars():
+        await session.delete(repo)
+    for id in (user_id, other_id):
+        await session.delete(await session.get(User, id))
+    await session.commit()
+    session.expunge_all()
+
+
+def test_plan_follows_response_schema() -> None:
+    plan = LoadPlan.for_schema(App, AppResponseSchema)
+    assert set(plan.relationships) == {'owner', 'release'}
+    assert set(plan.relationships['release'].relationships) == {'owner'}
+    # app_config is a property reading config_json
+    assert plan.columns is None
+
+    release_plan = LoadPlan.for_schema(Release, ReleaseResponseSchema)
+    assert release_plan.columns == {
+        'id', 'git_tag', 'repo_id', 'name', 'created_at', 'owner_id',
+        'build_queued_at', 'build_started_at', 'build_finished_at',
+    }
+    assert LoadPlan.for_schema(Release, ReleaseResponseSchema) is release_plan
+
+
+@pytest.mark.asyncio
+async def test_list_apps_loads_only_the_response(owner_id: uuid.UUID) -> None:
+    crud = AppCRUD.make_instance(session, True)
+    with QueryCounter() as counter:
+        page = await crud.read_page({}, limit=PER_RELEASE * RELEASES, plan=LoadPlan.for_schema(App, AppResponseSchema))
+        for app in page.items:
+            AppResponseSchema.model_validate(app, from_attributes=True)
+
+    assert len(page.items) >= PER_RELEASE * RELEASES
+    # apps, their releases and both owners come from one joined query
+    assert len(counter.statements) == 1
+    assert set(counter.loaded) <= {'App', 'Release', 'User'}
+    assert counter.loaded['App'] == len(page.items)
+    session.expunge_all()
+
+
+@pytest.mark.asyncio
+async def test_loading_a_user_loads_nothing_else(owner_id: uuid.UUID) -> None:
+    with QueryCounter() as counter:
+        user = await UserCRUD.make_instance(session, True).read_by_id(owner_id)
+
+    assert user.id == owner_id
+    assert len(counter.statements) == 1
+    assert counter.loaded == {'User': 1}
+    session.expunge_all()
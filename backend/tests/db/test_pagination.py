@@ -0,0 +1,134 @@
+import datetime
+import re
+import uuid
+from typing import Any, AsyncGenerator, AsyncIterator, List, Tuple
+
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from httpx import AsyncClient
+from sqlalchemy import event
+
+from workbench_backend.crud.crud_router import CRUDRouter
+from workbench_backend.crud.exceptions import CRUDException
+from workbench_backend.crud.pagination import Cursor, InvalidCursor
+from workbench_backend.crud.schemas.release import ReleaseCRUD, ReleaseResponseSchema
+from workbench_backend.db.models import Release, Repository, User
+from workbench_backend.db.session import async_engine, session
+
+from .util import random_string
+
+RELEASES = 25
+
+
+@pytest_asyncio.fixture
+async def releases() -> AsyncGenerator[Tuple[Repository, List[Release]], None]:
+    user = User(id=uuid.uuid4(), username=random_string(), email=random_string())
+    session.add(user)
+    await session.commit()
+    await session.refresh(user)
+
+    repo = Repository(name=random_string(), owner_id=user.id)
+    session.add(repo)
+    await session.commit()
+    await session.refresh(repo)
+
+    # pairs share a created_at, so the id has to break ties
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    releases = [
+        Release(
+            name=random_string(),
+            git_tag=random_string(),
+            repo_id=repo.id,
+            owner_id=user.id,
+            created_at=start + datetime.timedelta(minutes=i // 2)
+        )
+        for i in range(RELEASES)
+    ]
+    session.add_all(releases)
+    await session.commit()
+    await session.refresh(repo)
+    for release in releases:
+        await session.refresh(release)
+
+    yield repo, releases
+
+    for release in releases:
+        await session.delete(release)
+    await session.delete(repo)
+    await session.delete(user)
+    await session.commit()
+
+
+def test_cursor_round_trip() -> None:
+    cursor = Cursor(datetime.datetime(2024, 1, 1, 12, tzinfo=datetime.timezone.utc), 42)
+    assert Cursor.decode(cursor.encode()) == cursor
+    with pytest.raises(InvalidCursor):
+        Cursor.decode('not a cursor')
+
+
+@pytest.mark.parametrize('order', ['desc', 'asc'])
+@pytest.mark.asyncio
+async def test_pages_cover_every_row_once(releases: Tuple[Repository, List[Release]], order: str) -> None:
+    repo, created = releases
+    crud = ReleaseCRUD.make_instance(session, True)
+    queries: List[Tuple[str, Any]] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany) -> None: # type: ignore
+        queries.append((statement, parameters))
+
+    event.listen(async_engine.sync_engine, 'before_cursor_execute', record)
+    pages: List[List[int]] = []
+    cursor = None
+    try:
+        while True:
+            page = await crud.read_page({'repo_id': repo.id}, cursor, 10, order) # type: ignore
+            pages.append([release.id for release in page.items])
+            if page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+    finally:
+        event.remove(async_engine.sync_engine, 'before_cursor_execute', record)
+
+    expected = sorted(created, key=lambda r: (r.created_at, r.id), reverse=order == 'desc')
+    assert [len(ids) for ids in pages] == [10, 10, 5]
+    assert sum(pages, []) == [release.id for release in expected]
+
+    # the later pages seek past the cursor instead of skipping rows,
+    # sqlite renders an OFFSET for every LIMIT, it has to stay 0
+    comparison = '<' if order == 'desc' else '>'
+    keyset = re.compile(rf'\(release\.created_at, release\.id\) {comparison} \(')
+    page_queries = [(statement, parameters) for statement, parameters in queries if 'LIMIT' in statement]
+    assert [bool(keyset.search(statement)) for statement, _ in page_queries] == [False, True, True]
+    assert all(parameters[-1] == 0 for statement, parameters in page_queries if 'OFFSET' in statement)
+
+
+@pytest.mark.asyncio
+async def test_unknown_filter_is_rejected() -> None:
+    crud = ReleaseCRUD.make_instance(session, True)
+    with pytest.raises(CRUDException):
+        await crud.read_page({'missing': 1})
+
+
+@pytest.mark.asyncio
+async def test_unknown_query_param_is_rejected(releases: Tuple[Repository, List[Release]]) -> None:
+    repo, created = releases
+
+    async def get_crud() -> AsyncIterator[ReleaseCRUD]:
+        yield ReleaseCRUD.make_instance(session, True)
+
+    app = FastAPI()
+    app.include_router(CRUDRouter(
+        prefix='/release',
+        response_schema=ReleaseResponseSchema,
+        get_crud=get_crud,  # type: ignore
+        filters={'repo_id': int},
+    ))
+    async with AsyncClient(app=app, base_url='http://test') as client:
+        response = await client.get('/release', params={'repo_id': repo.id, 'limit': 5})
+        assert response.status_code == 200
+        assert len(response.json()) == 5
+        response = await client.get('/release', params={'owner_id': str(created[0].owner_id)})
+        assert response.status_code == 400
+        assert 'owner_id' in response.json()['detail']
+        assert (await client.get('/release', params={'cursor': 'not a cursor'})).status_code == 400
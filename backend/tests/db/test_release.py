@@ -3,9 +3,12 @@ from typing import AsyncGenerator, Tuple
 
 import pytest
 import pytest_asyncio
+from sqlalchemy import delete, select, update
 
-from workbench_backend.db.models import Release, Repository, User
+from workbench_backend.db.models import App, Release, Repository, User
 from workbench_backend.db.session import session
+from workbench_backend.db.standalone_session import standalone_session
+from workbench_backend.workbench_config.model import AppConfig, WorkBenchConfig
 
 from .util import random_string
 
@@ -40,7 +43,71 @@ async def test_release(test_data: Tuple[User, Repository, Release]) -> None:
     await session.refresh(user)
     await session.refresh(repo)
     await session.refresh(release)
+    # collections of the user are not loaded with it
+    await session.refresh(user, ['owned_releases'])
     assert user.id == repo.owner_id
     assert repo.id == release.repo_id
     assert user.id == release.owner_id
     assert user.owned_releases[0].id == release.id
+
+
+@pytest.mark.asyncio
+async def test_workbench_config_is_parsed_once_per_session(test_data: Tuple[User, Repository, Release]) -> None:
+    user, _, release = test_data
+    config = WorkBenchConfig(
+        apps={'web': AppConfig.model_validate({'run': 'python'})},
+        networks=['internal'],
+    )
+    release_id = release.id
+    await session.execute(
+        update(Release).where(Release.id == release_id).values(workbench_config_json=config.model_dump())
+    )
+    apps = [
+        App(name='web', release_id=release_id, owner_id=user.id, config_json=config.apps['web'].model_dump())
+        for _ in range(3)
+    ]
+    session.add_all(apps)
+    await session.commit()
+
+    loaded = (await session.execute(select(App).where(App.release_id == release_id))).scalars().all()
+    assert len(loaded) == 3
+    assert all(app.app_config == config.apps['web'] for app in loaded)
+    assert loaded[0].workbench_config.networks == ['internal']
+    # one parse shared by every app of the release
+    assert all(app.workbench_config is loaded[0].workbench_config for app in loaded)
+
+    async with standalone_session() as other_session:
+        other = (await other_session.execute(select(App).where(App.id == loaded[0].id))).scalars().one()
+        assert other.workbench_config == loaded[0].workbench_config
+        assert other.workbench_config is not loaded[0].workbench_config
+
+    await session.execute(delete(App).where(App.release_id == release_id))
+    await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_configs_follow_a_reload(test_data: Tuple[User, Repository, Release]) -> None:
+    user, _, release = test_data
+    release_id = release.id
+    app = App(name='web', release_id=release_id, owner_id=user.id, config_json={'run': 'python'})
+    session.add(app)
+    await session.commit()
+    await session.refresh(app)
+    app_id = app.id
+    app = (await session.execute(select(App).where(App.id == app_id))).scalars().one()
+    assert app.app_config.run == 'python'
+    assert app.workbench_config.networks is None
+
+    await session.execute(update(App).where(App.id == app_id).values(config_json={'run': 'node'}))
+    await session.execute(
+        update(Release).where(Release.id == release_id).values(workbench_config_json={'networks': ['internal']})
+    )
+    await session.commit()
+    app = (await session.execute(
+        select(App).where(App.id == app_id).execution_options(populate_existing=True)
+    )).scalars().one()
+    assert app.app_config.run == 'node'
+    assert app.workbench_config.networks == ['internal']
+
+    await session.execute(delete(App).where(App.release_id == release_id))
+    await session.commit()
@@ -52,7 +52,12 @@ async def test_query(test_data: Tuple[User, Repository]) -> None:
 @pytest.mark.asyncio
 async def test_share(test_data: Tuple[User, Repository], test_user: User) -> None:
     user, repo = test_data
-    repo = await repo_crud.share(repo, test_user)
+    # creating test_user committed, which expired both
+    await session.refresh(repo)
+    await session.refresh(test_user)
+    await repo_crud.share(repo, test_user.id)
+    await session.refresh(repo, ['shared_with'])
+    await session.refresh(test_user, ['shared_repositories'])
     assert repo.shared_with[0].id == test_user.id
     assert test_user.shared_repositories[0].id == repo.id
 
@@ -0,0 +1,142 @@
+import asyncio
+import time
+import uuid
+from typing import AsyncGenerator, Dict, List
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+
+from workbench_backend.db.models import Release, Repository, User
+from workbench_backend.db.models.service import Service, ServiceStatusEnum
+from workbench_backend.db.session import session
+from workbench_backend.docker import service_reconciler as reconciler_module
+from workbench_backend.docker.events import DockerEventActor, DockerEventMessage, DockerEvents
+from workbench_backend.docker.service_reconciler import ServiceReconciler
+from workbench_backend.docker.utils import WorkbenchContainerLabels
+from workbench_backend.utils.metrics import metrics
+
+from .util import QueryCounter, random_string
+
+
+class ProxyTask:
+    """Records `proxy_latest_service.delay` calls."""
+
+    def __init__(self) -> None:
+        self.names: List[str] = []
+
+    def delay(self, name: str) -> None:
+        self.names.append(name)
+
+
+def container_event(action: str, service_id: int) -> DockerEventMessage:
+    return DockerEventMessage(
+        Type='container',  # type: ignore
+        Action=action,  # type: ignore
+        Actor=DockerEventActor(f'container{service_id}', {
+            WorkbenchContainerLabels.IS_SERVICE_CONTAINER.value: '1',
+            WorkbenchContainerLabels.RESOURCE_ID.value: str(service_id),
+            'name': f'container{service_id}',
+        }),
+        timeNano=time.time_ns(),
+    )
+
+
+@pytest_asyncio.fixture
+async def services(monkeypatch: pytest.MonkeyPatch) -> AsyncGenerator[Dict[str, int], None]:
+    """Two releases of `api` and one of `worker`, all running."""
+    user = User(id=uuid.uuid4(), username=random_string(), email=random_string())
+    session.add(user)
+    repo = Repository(name=random_string(), owner_id=user.id)
+    session.add(repo)
+    await session.flush()
+    release = Release(name=random_string(), git_tag=random_string(), repo_id=repo.id, owner_id=user.id)
+    session.add(release)
+    await session.flush()
+    user_id, repo_id, release_id = user.id, repo.id, release.id
+    ids = {}
+    for key, name in (('api_old', 'api'), ('api_new', 'api'), ('worker', 'worker')):
+        service = Service(
+            name=name,
+            release_id=release_id,
+            owner_id=user_id,
+            config_json={},
+            enabled=True,
+            status=ServiceStatusEnum.ACTIVE,
+        )
+        session.add(service)
+        await session.flush()
+        ids[key] = service.id
+        await session.commit()
+        await asyncio.sleep(0.01)  # distinct created_at
+    session.expunge_all()
+
+    yield ids
+
+    await session.delete(await session.get(Release, release_id))
+    await session.delete(await session.get(Repository, repo_id))
+    await session.delete(await session.get(User, user_id))
+    await session.commit()
+    session.expunge_all()
+
+
+async def statuses(ids: Dict[str, int]) -> Dict[str, ServiceStatusEnum]:
+    rows = (await session.execute(select(Service.id, Service.status).where(Service.id.in_(ids.values())))).all()
+    session.expunge_all()
+    by_id = dict(rows)  # type: ignore
+    return {key: by_id[id] for key, id in ids.items()}
+
+
+@pytest.mark.asyncio
+async def test_changes_are_applied_in_one_update(services: Dict[str, int], monkeypatch: pytest.MonkeyPatch) -> None:
+    proxy = ProxyTask()
+    monkeypatch.setattr(reconciler_module, 'proxy_latest_service', proxy)
+    reconciler = ServiceReconciler(DockerEvents(), max_lag=2, batch_size=100)
+
+    # the latest api release crashed, the worker was restarted by its restart policy
+    await reconciler._on_event(container_event('oom', services['api_new']))
+    await reconciler._on_event(container_event('die', services['api_new']))
+    await reconciler._on_event(container_event('die', services['worker']))
+    await reconciler._on_event(container_event('start', services['worker']))
+    await reconciler._on_event(container_event('exec_start', services['api_old']))
+    assert set(reconciler._pending) == {services['api_new'], services['worker']}
+
+    with QueryCounter() as counter:
+        await reconciler.apply(reconciler._pending)
+    updates = [statement for statement in counter.statements if statement.lstrip().upper().startswith('UPDATE')]
+    assert len(updates) == 1
+
+    assert await statuses(services) == {
+        'api_old': ServiceStatusEnum.ACTIVE,
+        'api_new': ServiceStatusEnum.INACTIVE,
+        'worker': ServiceStatusEnum.ACTIVE,
+    }
+    worker = await session.get(Service, services['worker'])
+    assert worker is not None and worker.started_at is not None
+    session.expunge_all()
+    # traffic of api moves to the old release, the worker kept serving
+    assert proxy.names == ['api']
+
+
+@pytest.mark.asyncio
+async def test_changes_are_applied_within_the_lag_bound(services: Dict[str, int], monkeypatch: pytest.MonkeyPatch) -> None:
+    proxy = ProxyTask()
+    monkeypatch.setattr(reconciler_module, 'proxy_latest_service', proxy)
+    reconciler = ServiceReconciler(DockerEvents(), max_lag=0.5, batch_size=100)
+    reconciler.start()
+    try:
+        batches = metrics.counter('service_reconciler.batches')
+        exceeded = metrics.counter('service_reconciler.lag_exceeded')
+        await reconciler._on_event(container_event('die', services['worker']))
+        await reconciler._on_event(container_event('die', services['api_old']))
+        deadline = time.monotonic() + 0.5
+        while metrics.counter('service_reconciler.batches') == batches:
+            assert time.monotonic() < deadline
+            await asyncio.sleep(0.01)
+        assert metrics.counter('service_reconciler.batches') == batches + 1
+        assert metrics.counter('service_reconciler.lag_exceeded') == exceeded
+        assert reconciler.current_lag() == 0
+        assert (await statuses(services))['worker'] == ServiceStatusEnum.INACTIVE
+        assert proxy.names == ['worker']
+    finally:
+        await reconciler.close()
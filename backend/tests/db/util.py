@@ -1,7 +1,37 @@
 import random
 import string
+from collections import Counter
+from typing import Any, List
+
+from sqlalchemy import event
+
+from workbench_backend.db.models.base import Base
+from workbench_backend.db.session import async_engine
 
 
 def random_string() -> str:
     return ''.join(random.choices(string.ascii_uppercase +
                              string.digits, k=10))
+
+
+class QueryCounter:
+    """Statements executed and ORM objects loaded, per model, while active."""
+
+    def __init__(self) -> None:
+        self.statements: List[str] = []
+        self.loaded: Counter[str] = Counter()
+
+    def _on_execute(self, conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+        self.statements.append(statement)
+
+    def _on_load(self, target: Any, context: Any) -> None:
+        self.loaded[type(target).__name__] += 1
+
+    def __enter__(self) -> 'QueryCounter':
+        event.listen(async_engine.sync_engine, 'before_cursor_execute', self._on_execute)
+        event.listen(Base, 'load', self._on_load, propagate=True)
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        event.remove(async_engine.sync_engine, 'before_cursor_execute', self._on_execute)
+        event.remove(Base, 'load', self._on_load)
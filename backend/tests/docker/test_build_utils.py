@@ -0,0 +1,79 @@
+import io
+import tarfile
+from pathlib import Path
+
+import pytest
+
+from workbench_backend.docker.build_utils import (
+    BuildError,
+    GitArchiveStream,
+    release_context_key,
+    release_dockerfile,
+)
+
+from ..git.util import git
+
+
+async def read_all(stream: GitArchiveStream) -> bytes:
+    try:
+        return b''.join([chunk async for chunk in stream])
+    finally:
+        await stream.close()
+
+
+@pytest.mark.asyncio
+async def test_git_archive_stream_contains_tag_and_extra_files(repo_path: Path) -> None:
+    stream = GitArchiveStream(str(repo_path), 'v1', {'Dockerfile.workbench': 'FROM scratch\n'})
+
+    data = await read_all(stream)
+    assert stream.size == len(data)
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        files = {member.name: member for member in tar.getmembers() if member.isfile()}
+        assert set(files) == {'Dockerfile.workbench', 'main.py', 'removed.py', 'workbench.yml'}
+        assert tar.extractfile(files['Dockerfile.workbench']).read() == b'FROM scratch\n'  # type: ignore
+        # working tree changes are not part of the tagged context
+        assert tar.extractfile(files['main.py']).read() == b'print(1)\n'  # type: ignore
+    assert stream.archive_seconds is not None
+
+
+@pytest.mark.asyncio
+async def test_git_archive_stream_is_reproducible(repo_path: Path) -> None:
+    first = await read_all(GitArchiveStream(str(repo_path), 'v1', {'Dockerfile.workbench': ''}))
+    git(repo_path, 'tag', 'v2', 'v1')
+    assert await read_all(GitArchiveStream(str(repo_path), 'v2', {'Dockerfile.workbench': ''})) == first
+
+
+@pytest.mark.asyncio
+async def test_git_archive_stream_unknown_ref(repo_path: Path) -> None:
+    with pytest.raises(BuildError):
+        await read_all(GitArchiveStream(str(repo_path), 'missing'))
+
+
+def test_release_context_key() -> None:
+    assert release_context_key('tree', 'FROM a', 'sha256:1') == release_context_key('tree', 'FROM a', 'sha256:1')
+    assert release_context_key('tree', 'FROM a', 'sha256:1') != release_context_key('tree', 'FROM b', 'sha256:1')
+    assert release_context_key('tree', 'FROM a', 'sha256:1') != release_context_key('other', 'FROM a', 'sha256:1')
+    assert release_context_key('tree', 'FROM a', 'sha256:1') != release_context_key('tree', 'FROM a', 'sha256:2')
+
+
+def test_release_dockerfile_installs_dependencies_before_sources() -> None:
+    dockerfile = release_dockerfile(
+        ['libgl1', 'ffmpeg'],
+        ['pyproject.toml', 'poetry.lock', 'package.json']
+    )
+    lines = [line for line in dockerfile.splitlines() if line]
+
+    assert 'RUN apt-get -y update && apt-get -y install libgl1 ffmpeg' in lines
+    assert 'COPY pyproject.toml poetry.lock ./' in lines
+    assert 'COPY package.json ./' in lines
+    assert lines.index('RUN npm install') < lines.index('COPY . .')
+    assert lines.index('RUN poetry install --no-root --no-interaction') < lines.index('COPY . .')
+
+
+def test_release_dockerfile_skips_missing_manifests() -> None:
+    dockerfile = release_dockerfile(None, ['poetry.lock', 'package-lock.json'])
+    assert 'apt-get' not in dockerfile
+    assert 'poetry' not in dockerfile
+    assert 'npm' not in dockerfile
+    # source only changes do not touch anything before this point
+    assert dockerfile.index('FROM dependencies') < dockerfile.index('COPY . .')
@@ -0,0 +1,193 @@
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+
+from workbench_backend.api.routers.service import platform_service_handler
+from workbench_backend.api.routers.service.platform_service_handler import (
+    PlatformServiceHandler,
+    PlatFormServiceNotFound,
+)
+from workbench_backend.docker.container_state import ContainerStateCache
+from workbench_backend.docker.events import DockerEvents
+from workbench_backend.docker.utils import WorkbenchContainerLabels
+from workbench_backend.utils.clients import clients
+
+SHOW = WorkbenchContainerLabels.SHOW_IN_WORKBENCH.value
+STARTED_AT = '2024-01-01T10:00:00.123456789Z'
+
+
+class FakeDaemon:
+    """The container list, inspect and event stream endpoints of the docker API."""
+
+    def __init__(self) -> None:
+        self.containers: Dict[str, Dict[str, Any]] = {}
+        self.lists = 0
+        self.inspects = 0
+        self._streams: List[asyncio.Queue[Optional[Dict[str, Any]]]] = []
+
+    def add(self, id: str, name: str, state: str, labels: Dict[str, str]) -> None:
+        self.containers[id] = {'Id': id, 'Names': [f'/{name}'], 'State': state, 'Labels': labels}
+
+    async def push(self, action: str, id: str, **attributes: str) -> None:
+        event = {
+            'Type': 'container',
+            'Action': action,
+            'Actor': {'ID': id, 'Attributes': attributes},
+            'scope': 'local',
+            'time': int(time.time()),
+            'timeNano': time.time_ns(),
+        }
+        for stream in self._streams:
+            await stream.put(event)
+
+    async def disconnect(self) -> None:
+        for stream in self._streams:
+            await stream.put(None)
+
+    async def connected(self, count: int = 1) -> None:
+        while len(self._streams) < count:
+            await asyncio.sleep(0.01)
+
+    async def _version(self, request: web.Request) -> web.Response:
+        return web.json_response({'ApiVersion': '1.41'})
+
+    async def _list(self, request: web.Request) -> web.Response:
+        self.lists += 1
+        return web.json_response(list(self.containers.values()))
+
+    async def _inspect(self, request: web.Request) -> web.Response:
+        self.inspects += 1
+        container = self.containers.get(request.match_info['id'])
+        if container is None:
+            return web.json_response({'message': 'No such container'}, status=404)
+        return web.json_response({
+            'Id': container['Id'],
+            'Name': container['Names'][0],
+            'State': {'Status': container['State'], 'StartedAt': STARTED_AT},
+            'Config': {'Labels': container['Labels']},
+        })
+
+    async def _events(self, request: web.Request) -> web.StreamResponse:
+        stream: asyncio.Queue[Optional[Dict[str, Any]]] = asyncio.Queue()
+        self._streams.append(stream)
+        response = web.StreamResponse()
+        await response.prepare(request)
+        try:
+            while (event := await stream.get()) is not None:
+                await response.write(json.dumps(event).encode() + b'\n')
+        finally:
+            self._streams.remove(stream)
+        return response
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/version', self._version)
+        app.router.add_get('/v1.41/containers/json', self._list)
+        app.router.add_get('/v1.41/containers/{id}/json', self._inspect)
+        app.router.add_get('/v1.41/events', self._events)
+        return app
+
+
+async def until(condition: Any, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        await asyncio.sleep(0.01)
+
+
+@pytest_asyncio.fixture
+async def daemon(monkeypatch: pytest.MonkeyPatch) -> AsyncIterator[Tuple[FakeDaemon, ContainerStateCache]]:
+    daemon = FakeDaemon()
+    for i in range(500):
+        daemon.add(f'service{i}', f'service-{i}', 'exited', {SHOW: '1'})
+    for i in range(10):
+        daemon.add(f'other{i}', f'other-{i}', 'exited', {})
+    daemon.add('running', 'running-service', 'running', {SHOW: '1'})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        socket_path = str(Path(tmp) / 'docker.sock')
+        runner = web.AppRunner(daemon.app())
+        await runner.setup()
+        await web.UnixSite(runner, socket_path).start()
+        monkeypatch.setattr(clients, 'docker_host', f'unix://{socket_path}')
+
+        events = DockerEvents({'type': ['container']}, retry_interval=0.05)
+        cache = ContainerStateCache(events)
+        monkeypatch.setattr(platform_service_handler, 'container_states', cache)
+        events.start()
+        await until(lambda: cache.ready)
+        await daemon.connected()
+        yield daemon, cache
+        await events.close()
+        await cache.close()
+        await clients.close()
+        await daemon.disconnect()
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_listing_is_served_from_memory(daemon: Tuple[FakeDaemon, ContainerStateCache]) -> None:
+    fake, cache = daemon
+    # the start time of the running container is inspected once after the bootstrap
+    await until(lambda: (state := cache.get('running-service')) is not None and state.started_at is not None)
+    assert fake.inspects == 1
+    assert fake.lists == 1
+
+    handler = PlatformServiceHandler()
+    start = time.perf_counter()
+    services = await handler.get_all()
+    elapsed = time.perf_counter() - start
+    print(f'listed {len(services)} platform services in {elapsed * 1000:.2f} ms')
+
+    assert len(services) == 501
+    assert (fake.lists, fake.inspects) == (1, 1)
+    running = await handler.get_one('running')
+    assert running.status == 'running'
+    assert running.name == '/running-service'
+    assert running.started_at is not None and running.started_at.year == 2024
+    with pytest.raises(PlatFormServiceNotFound):
+        await handler.get_one('other0')
+    assert (fake.lists, fake.inspects) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_events_keep_the_state_current(daemon: Tuple[FakeDaemon, ContainerStateCache]) -> None:
+    fake, cache = daemon
+    handler = PlatformServiceHandler()
+
+    await fake.push('create', 'new', name='new-service', image='app:1', **{SHOW: '1'})
+    await fake.push('start', 'new', name='new-service', image='app:1', **{SHOW: '1'})
+    await until(lambda: (state := cache.get('new-service')) is not None and state.status == 'running')
+    service = await handler.get_one('new')
+    assert service.started_at is not None
+    assert cache.get('new').labels == {SHOW: '1'}  # type: ignore
+
+    await fake.push('rename', 'new', name='renamed', oldName='/new-service')
+    await fake.push('die', 'new', name='renamed', exitCode='1')
+    await until(lambda: cache.get('renamed') is not None and cache.get('renamed').status == 'exited')  # type: ignore
+    assert cache.get('new-service') is None
+
+    await fake.push('destroy', 'new', name='renamed')
+    await until(lambda: cache.get('new') is None)
+    with pytest.raises(PlatFormServiceNotFound):
+        await handler.get_one('new')
+    assert fake.lists == 1
+
+
+@pytest.mark.asyncio
+async def test_a_new_stream_bootstraps_again(daemon: Tuple[FakeDaemon, ContainerStateCache]) -> None:
+    fake, cache = daemon
+    await fake.disconnect()
+    await until(lambda: not cache.ready)
+    # changed while the stream was down
+    fake.add('missed', 'missed-service', 'running', {SHOW: '1'})
+    await until(lambda: cache.ready)
+    assert fake.lists == 2
+    assert cache.get('missed-service') is not None
@@ -0,0 +1,51 @@
+import pytest
+
+from workbench_backend.docker.editor_pool import EditorPool, EditorSpec
+from workbench_backend.docker.utils import ContainerConfigBuilder
+from workbench_backend.utils.metrics import metrics
+
+
+def spec(name: str) -> EditorSpec:
+    return EditorSpec(name, ContainerConfigBuilder('editor-container:latest'), f'/repos/{name}', 'runner')
+
+
+def test_pool_keeps_most_recent_editors() -> None:
+    pool = EditorPool(size=2, refill_interval=30)
+    for name in ('a', 'b', 'c'):
+        pool.remember(spec(name))
+    pool.remember(spec('b'))
+
+    assert pool.warm_names == ['c', 'b']
+    assert pool.release('b')
+    assert not pool.release('a')
+
+
+@pytest.mark.asyncio
+async def test_claim_reports_latency_and_tracks_sessions() -> None:
+    pool = EditorPool(size=2, refill_interval=30)
+    warm = metrics.counter('editor_pool.claims.warm')
+    cold = metrics.counter('editor_pool.claims.cold')
+
+    async with pool.claim('a'):
+        pass
+    async with pool.claim('a') as claim:
+        claim.warm = True
+    pool.remember(spec('a'))
+
+    assert metrics.counter('editor_pool.claims.cold') - cold == 1
+    assert metrics.counter('editor_pool.claims.warm') - warm == 1
+    assert 'editor_pool.claim_latency.max' in metrics.snapshot()
+    assert pool.active_count == 1
+    # the second session on the same container keeps it running
+    assert pool.release('a')
+    assert pool.release('a')
+    assert pool.active_count == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_claim_is_released() -> None:
+    pool = EditorPool(size=2, refill_interval=30)
+    with pytest.raises(RuntimeError):
+        async with pool.claim('a'):
+            raise RuntimeError("Cannot access container")
+    assert pool.active_count == 0
@@ -0,0 +1,268 @@
+import asyncio
+import contextlib
+import datetime
+import struct
+import tempfile
+import time
+from pathlib import Path
+from typing import AsyncIterator, List, Optional, Tuple
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+
+from workbench_backend.api.routers.service.logs import event_stream_response
+from workbench_backend.docker.log_stream import (
+    PENDING_BUFFERS,
+    LogLine,
+    LogStreams,
+    parse_time,
+)
+from workbench_backend.utils.clients import clients
+from workbench_backend.utils.metrics import metrics
+
+
+def rfc3339(nanos: int) -> str:
+    moment = datetime.datetime.fromtimestamp(nanos // 10**9, datetime.timezone.utc)
+    return f"{moment.strftime('%Y-%m-%dT%H:%M:%S')}.{nanos % 10**9:09d}Z"
+
+
+class FakeDaemon:
+    """The inspect and log endpoints of the docker API for one container, with multiplexed output."""
+
+    def __init__(self) -> None:
+        self.lines: List[Tuple[int, str]] = []
+        self.history_requests = 0
+        self.follow_requests = 0
+        self.closed = False
+        self._written = asyncio.Condition()
+
+    async def write(self, *texts: str) -> None:
+        async with self._written:
+            for text in texts:
+                self.lines.append((time.time_ns(), text))
+            self._written.notify_all()
+
+    async def close(self) -> None:
+        async with self._written:
+            self.closed = True
+            self._written.notify_all()
+
+    async def _version(self, request: web.Request) -> web.Response:
+        return web.json_response({'ApiVersion': '1.41'})
+
+    async def _inspect(self, request: web.Request) -> web.Response:
+        return web.json_response({'Id': 'c1', 'Config': {'Tty': False}})
+
+    async def _logs(self, request: web.Request) -> web.StreamResponse:
+        query = request.query
+        follow = query.get('follow') == '1'
+        since = parse_time(query['since']) if 'since' in query else 0
+        until = parse_time(query['until']) if 'until' in query else None
+        if follow:
+            self.follow_requests += 1
+        else:
+            self.history_requests += 1
+        history = [line for line in self.lines if line[0] >= since and (until is None or line[0] <= until)]
+        if query.get('tail', 'all') != 'all':
+            tail = int(query['tail'])
+            history = history[len(history) - tail:] if tail else []
+
+        response = web.StreamResponse()
+        await response.prepare(request)
+
+        async def send(nanos: int, text: str) -> None:
+            frame = f'{rfc3339(nanos)} {text}\n'.encode()
+            await response.write(struct.pack('>BxxxL', 1, len(frame)) + frame)
+
+        for nanos, text in history:
+            await send(nanos, text)
+        sent = len(self.lines)
+        while follow and not self.closed:
+            async with self._written:
+                await self._written.wait_for(lambda: self.closed or len(self.lines) > sent)
+            for nanos, text in self.lines[sent:]:
+                if nanos >= since:
+                    await send(nanos, text)
+            sent = len(self.lines)
+        return response
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/version', self._version)
+        app.router.add_get('/v1.41/containers/{id}/json', self._inspect)
+        app.router.add_get('/v1.41/containers/{id}/logs', self._logs)
+        return app
+
+
+@pytest_asyncio.fixture
+async def daemon(monkeypatch: pytest.MonkeyPatch) -> AsyncIterator[FakeDaemon]:
+    daemon = FakeDaemon()
+    with tempfile.TemporaryDirectory() as tmp:
+        socket_path = str(Path(tmp) / 'docker.sock')
+        runner = web.AppRunner(daemon.app())
+        await runner.setup()
+        await web.UnixSite(runner, socket_path).start()
+        monkeypatch.setattr(clients, 'docker_host', f'unix://{socket_path}')
+        yield daemon
+        await daemon.close()
+        await clients.close()
+        await runner.cleanup()
+
+
+async def collect(lines: AsyncIterator[LogLine], into: List[str], count: Optional[int] = None) -> None:
+    async with contextlib.aclosing(lines): # type: ignore
+        async for line in lines:
+            into.append(line.line.split(' ', 1)[1].rstrip('\n'))
+            if len(into) == count:
+                return
+
+
+async def until(condition: object, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition(): # type: ignore
+        assert time.monotonic() < deadline
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_viewers_share_one_upstream(daemon: FakeDaemon) -> None:
+    await daemon.write('old 1', 'old 2', 'old 3')
+    streams = LogStreams(buffer_size=100, slow_viewer_timeout=1)
+    container = clients.docker().containers.container('c1')
+
+    first: List[str] = []
+    others: List[List[str]] = [[], []]
+    readers = [asyncio.create_task(collect(streams.read(container, tail=2), first, 5))]
+    readers += [asyncio.create_task(collect(streams.read(container, tail=0), lines, 3)) for lines in others]
+    await until(lambda: daemon.history_requests == 3)
+
+    await daemon.write('new 1', 'new 2', 'new 3')
+    await asyncio.wait_for(asyncio.gather(*readers), 5)
+    assert first == ['old 2', 'old 3', 'new 1', 'new 2', 'new 3']
+    assert others == [['new 1', 'new 2', 'new 3']] * 2
+    assert daemon.follow_requests == 1
+    # the upstream is closed with its last viewer
+    assert streams._followers == {}
+    await streams.close()
+
+
+@pytest.mark.asyncio
+async def test_cursors(daemon: FakeDaemon) -> None:
+    await daemon.write(*(f'line {i}' for i in range(5)))
+    streams = LogStreams(buffer_size=100, slow_viewer_timeout=1)
+    container = clients.docker().containers.container('c1')
+    nanos = [line[0] for line in daemon.lines]
+
+    lines: List[str] = []
+    await collect(streams.read(container, since=nanos[1], follow=False), lines)
+    assert lines == ['line 2', 'line 3', 'line 4']
+
+    lines = []
+    await collect(streams.read(container, since=nanos[1], until=nanos[3]), lines)
+    assert lines == ['line 2', 'line 3']
+    assert daemon.follow_requests == 0
+
+    # the event ids are the cursors to continue from
+    response = event_stream_response(streams.read(container, tail=1, follow=False))
+    events = [event async for event in response.body_iterator]
+    assert events == [f'id: {rfc3339(nanos[4])}\ndata: {rfc3339(nanos[4])} line 4\n\n']
+    assert parse_time(rfc3339(nanos[4])) == nanos[4]
+
+
+def live_viewers(streams: LogStreams) -> int:
+    return sum(viewer.pending is None for follower in streams._followers.values() for viewer in follower.viewers)
+
+
+@pytest.mark.asyncio
+async def test_a_slow_viewer_does_not_hold_up_the_others(daemon: FakeDaemon) -> None:
+    streams = LogStreams(buffer_size=2, slow_viewer_timeout=0.1)
+    container = clients.docker().containers.container('c1')
+    disconnected = metrics.counter('log_streams.slow_viewers')
+
+    async def slow() -> None:
+        async with contextlib.aclosing(streams.read(container, tail=0)) as lines: # type: ignore
+            async for _ in lines:
+                await asyncio.sleep(60)
+
+    fast: List[str] = []
+    slow_reader = asyncio.create_task(slow())
+    fast_reader = asyncio.create_task(collect(streams.read(container, tail=0), fast, 10))
+    await until(lambda: live_viewers(streams) == 2)
+
+    await daemon.write(*(f'line {i}' for i in range(10)))
+    await asyncio.wait_for(fast_reader, 5)
+    assert fast == [f'line {i}' for i in range(10)]
+    assert metrics.counter('log_streams.slow_viewers') == disconnected + 1
+
+    slow_reader.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await slow_reader
+    await streams.close()
+
+
+async def read_paused_in_history(
+    daemon: FakeDaemon,
+    streams: LogStreams,
+    written: int
+) -> Tuple[List[str], List[str]]:
+    """
+    Lines of a viewer that pauses after the first line of its history while `written`
+    new lines are written, and of a viewer that reads them meanwhile.
+    """
+    await daemon.write(*(f'old {i}' for i in range(5)))
+    container = clients.docker().containers.container('c1')
+    reading = asyncio.Event()
+    resume = asyncio.Event()
+
+    history: List[str] = []
+
+    async def paused_in_history() -> None:
+        async with contextlib.aclosing(streams.read(container)) as lines: # type: ignore
+            async for line in lines:
+                history.append(line.line.split(' ', 1)[1].rstrip('\n'))
+                if len(history) == 1:
+                    reading.set()
+                    await resume.wait()
+                if len(history) == 5 + written:
+                    return
+
+    live: List[str] = []
+    history_reader = asyncio.create_task(paused_in_history())
+    live_reader = asyncio.create_task(collect(streams.read(container, tail=0), live, written))
+    await reading.wait()
+    await until(lambda: live_viewers(streams) == 1)
+
+    await daemon.write(*(f'line {i}' for i in range(written)))
+    await asyncio.wait_for(live_reader, 5)
+    resume.set()
+    await asyncio.wait_for(history_reader, 5)
+    return history, live
+
+
+@pytest.mark.asyncio
+async def test_reading_history_does_not_hold_up_the_others(daemon: FakeDaemon) -> None:
+    streams = LogStreams(buffer_size=2, slow_viewer_timeout=0.5)
+    disconnected = metrics.counter('log_streams.slow_viewers')
+
+    # more lines than the buffers hold, as many as are kept aside for the viewer in its history
+    written = 2 * PENDING_BUFFERS
+    history, live = await read_paused_in_history(daemon, streams, written)
+    assert live == [f'line {i}' for i in range(written)]
+    assert history == [f'old {i}' for i in range(5)] + [f'line {i}' for i in range(written)]
+    assert metrics.counter('log_streams.slow_viewers') == disconnected
+    await streams.close()
+
+
+@pytest.mark.asyncio
+async def test_a_viewer_too_far_behind_in_its_history_is_disconnected(daemon: FakeDaemon) -> None:
+    streams = LogStreams(buffer_size=2, slow_viewer_timeout=0.5)
+    disconnected = metrics.counter('log_streams.slow_viewers')
+
+    written = 2 * PENDING_BUFFERS + 5
+    history, live = await read_paused_in_history(daemon, streams, written)
+    assert live == [f'line {i}' for i in range(written)]
+    # it ends after the lines kept aside, and continues from the last of them
+    assert history == [f'old {i}' for i in range(5)] + [f'line {i}' for i in range(2 * PENDING_BUFFERS)]
+    assert metrics.counter('log_streams.slow_viewers') == disconnected + 1
+    await streams.close()
@@ -0,0 +1,114 @@
+import os
+from pathlib import Path
+from typing import AsyncIterator
+
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+from httpx import AsyncClient
+
+from workbench_backend.utils.file_response import IMMUTABLE, cached_file_response
+from workbench_backend.utils.thumbnails import thumbnail
+
+CONTENT = bytes(range(256)) * 1024
+
+
+@pytest.fixture
+def file(tmp_path: Path) -> Path:
+    path = tmp_path / 'data.bin'
+    path.write_bytes(CONTENT)
+    return path
+
+
+@pytest_asyncio.fixture
+async def client(file: Path) -> AsyncIterator[AsyncClient]:
+    app = FastAPI()
+
+    @app.get('/file')
+    async def get_file(request: Request) -> Response:
+        return cached_file_response(request, file)
+
+    @app.get('/logo')
+    async def get_logo(request: Request) -> Response:
+        return cached_file_response(request, file, IMMUTABLE, etag='"abc"')
+
+    async with AsyncClient(app=app, base_url='http://test') as client:
+        yield client
+
+
+@pytest.mark.asyncio
+async def test_conditional_requests(client: AsyncClient, file: Path) -> None:
+    response = await client.get('/file')
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers['accept-ranges'] == 'bytes'
+    etag, last_modified = response.headers['etag'], response.headers['last-modified']
+    assert not etag.startswith('W/')
+
+    response = await client.get('/file', headers={'If-None-Match': f'"other", {etag}'})
+    assert response.status_code == 304
+    assert response.content == b''
+    assert response.headers['etag'] == etag
+    assert (await client.get('/file', headers={'If-Modified-Since': last_modified})).status_code == 304
+
+    # a new version of the file gets a new tag
+    file.write_bytes(CONTENT[:100])
+    os.utime(file, ns=(file.stat().st_atime_ns, file.stat().st_mtime_ns + 10**9))
+    response = await client.get('/file', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.content == CONTENT[:100]
+    assert response.headers['etag'] != etag
+
+    response = await client.get('/logo', headers={'If-None-Match': '"abc"'})
+    assert response.status_code == 304
+    assert response.headers['cache-control'] == IMMUTABLE
+
+
+@pytest.mark.asyncio
+async def test_ranges(client: AsyncClient, file: Path) -> None:
+    etag = (await client.get('/file')).headers['etag']
+    size = len(CONTENT)
+
+    response = await client.get('/file', headers={'Range': 'bytes=1000-70999'})
+    assert response.status_code == 206
+    assert response.content == CONTENT[1000:71000]
+    assert response.headers['content-range'] == f'bytes 1000-70999/{size}'
+    assert response.headers['content-length'] == '70000'
+
+    response = await client.get('/file', headers={'Range': 'bytes=-10'})
+    assert response.content == CONTENT[-10:]
+    response = await client.get('/file', headers={'Range': f'bytes={size - 5}-{size + 100}', 'If-Range': etag})
+    assert response.status_code == 206
+    assert response.content == CONTENT[-5:]
+
+    response = await client.get('/file', headers={'Range': f'bytes={size}-'})
+    assert response.status_code == 416
+    assert response.headers['content-range'] == f'bytes */{size}'
+
+    # a range of another version of the file gets the whole file
+    response = await client.get('/file', headers={'Range': 'bytes=0-9', 'If-Range': '"old"'})
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    # as do ranges it doesn't serve
+    assert (await client.get('/file', headers={'Range': 'bytes=0-9,20-29'})).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_thumbnails_are_made_once(tmp_path: Path) -> None:
+    Image = pytest.importorskip('PIL.Image')
+    logo = tmp_path / 'f00d.png'
+    Image.new('RGBA', (512, 256), (255, 0, 0, 128)).save(logo)
+
+    small = await thumbnail(logo, 64)
+    assert small == tmp_path / 'thumbnails' / 'f00d-64.png'
+    with Image.open(small) as image:
+        assert image.size == (64, 32)
+    made = small.stat().st_mtime_ns
+    assert await thumbnail(logo, 64) == small
+    assert small.stat().st_mtime_ns == made
+
+    svg = tmp_path / 'beef.svg'
+    svg.write_text('<svg xmlns="http://www.w3.org/2000/svg"/>')
+    assert await thumbnail(svg, 64) == svg
+    assert list((tmp_path / 'thumbnails').iterdir()) == [small]
@@ -0,0 +1,101 @@
+import asyncio
+import statistics
+import time
+from pathlib import Path
+from typing import Any, List
+
+import pytest
+
+from workbench_backend.git import AsyncGitRepository
+from workbench_backend.git.backends import Pygit2GitBackend, SubprocessGitBackend
+
+from .util import git
+
+
+@pytest.mark.asyncio
+async def test_backends_are_equivalent(repo_path: Path) -> None:
+    subprocess_backend = SubprocessGitBackend(str(repo_path))
+    native_backend = Pygit2GitBackend(str(repo_path))
+
+    assert await native_backend.status() == await subprocess_backend.status()
+    assert await native_backend.get_branches() == await subprocess_backend.get_branches()
+    assert await native_backend.get_tags() == await subprocess_backend.get_tags()
+    assert await native_backend.get_head_shorthand() == await subprocess_backend.get_head_shorthand()
+    for refish in ('v1', 'feature', 'HEAD~0', 'missing'):
+        assert await native_backend.refish_exists(refish) == await subprocess_backend.refish_exists(refish)
+    for file in ('main.py', 'workbench.yml', 'missing.py'):
+        assert (
+            await native_backend.get_tagged_file_content('v1', file)
+            == await subprocess_backend.get_tagged_file_content('v1', file)
+        )
+    native_backend.close()
+
+
+@pytest.mark.asyncio
+async def test_native_backend_sees_new_refs(repo_path: Path) -> None:
+    native_backend = Pygit2GitBackend(str(repo_path))
+    assert 'v2' not in await native_backend.get_tags()
+    git(repo_path, 'tag', 'v2')
+    assert 'v2' in await native_backend.get_tags()
+    native_backend.close()
+
+
+def count_forks(monkeypatch: pytest.MonkeyPatch) -> List[int]:
+    forks = [0]
+    create_subprocess_exec = asyncio.create_subprocess_exec
+
+    async def counting_create_subprocess_exec(*args: Any, **kwargs: Any) -> Any:
+        forks[0] += 1
+        return await create_subprocess_exec(*args, **kwargs)
+
+    monkeypatch.setattr(asyncio, 'create_subprocess_exec', counting_create_subprocess_exec)
+    return forks
+
+
+@pytest.mark.parametrize('backend_type', [SubprocessGitBackend, Pygit2GitBackend])
+@pytest.mark.asyncio
+async def test_git_state_forks(
+    repo_path: Path,
+    backend_type: type[SubprocessGitBackend] | type[Pygit2GitBackend],
+    monkeypatch: pytest.MonkeyPatch
+) -> None:
+    concurrency = 5
+    forks = count_forks(monkeypatch)
+
+    git_repo = AsyncGitRepository(str(repo_path), backend_type(str(repo_path)))
+    await asyncio.gather(*[git_repo.compute_state() for _ in range(concurrency)])
+    git_repo.backend.close()
+
+    if backend_type is Pygit2GitBackend:
+        assert forks[0] == 0
+    else:
+        assert forks[0] == 4 * concurrency
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('backend_type', [SubprocessGitBackend, Pygit2GitBackend])
+@pytest.mark.asyncio
+async def test_git_state_benchmark(
+    repo_path: Path,
+    backend_type: type[SubprocessGitBackend] | type[Pygit2GitBackend],
+    monkeypatch: pytest.MonkeyPatch
+) -> None:
+    concurrency = 200
+    forks = count_forks(monkeypatch)
+
+    git_repo = AsyncGitRepository(str(repo_path), backend_type(str(repo_path)))
+    latencies: List[float] = []
+
+    async def request() -> None:
+        start = time.perf_counter()
+        await git_repo.compute_state()
+        latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*[request() for _ in range(concurrency)])
+    git_repo.backend.close()
+
+    p99 = statistics.quantiles(latencies, n=100)[98]
+    print(
+        f"{backend_type.__name__}: {forks[0] / concurrency:.1f} forks/request, "
+        f"p99 {p99 * 1000:.1f} ms under {concurrency} concurrent /git/state calls"
+    )
@@ -0,0 +1,73 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from workbench_backend.git import AsyncGitRepository
+from workbench_backend.git.state_cache import GitStateCache
+from workbench_backend.utils.metrics import metrics
+
+from .util import git
+
+
+class CountingRepository(AsyncGitRepository):
+    computed = 0
+
+    async def compute_state(self):  # type: ignore
+        self.computed += 1
+        return await super().compute_state()
+
+
+@pytest.mark.asyncio
+async def test_idle_repository_is_served_from_memory(repo_path: Path) -> None:
+    cache = GitStateCache()
+    git_repo = CountingRepository(str(repo_path))
+    hits = metrics.counter('git_state_cache.hits')
+
+    first = await cache.get_state(git_repo)
+    for _ in range(10):
+        assert await cache.get_state(git_repo) == first
+
+    assert git_repo.computed == 1
+    assert metrics.counter('git_state_cache.hits') - hits == 10
+
+
+@pytest.mark.asyncio
+async def test_git_metadata_changes_miss(repo_path: Path) -> None:
+    cache = GitStateCache()
+    git_repo = CountingRepository(str(repo_path))
+    await cache.get_state(git_repo)
+
+    git(repo_path, 'tag', 'v2')
+    assert 'v2' in (await cache.get_state(git_repo))['tags']
+
+    git(repo_path, 'checkout', 'feature')
+    assert (await cache.get_state(git_repo))['head'] == 'feature'
+
+    git(repo_path, 'add', 'main.py')
+    assert (await cache.get_state(git_repo))['status']['main.py'] == 'M'
+    assert git_repo.computed == 4
+
+
+@pytest.mark.asyncio
+async def test_working_tree_changes_need_invalidation(repo_path: Path) -> None:
+    cache = GitStateCache()
+    git_repo = CountingRepository(str(repo_path))
+    await cache.get_state(git_repo)
+
+    (repo_path / 'new.py').write_text('')
+    assert 'new.py' not in (await cache.get_state(git_repo))['status']
+
+    cache.invalidate(str(repo_path))
+    assert (await cache.get_state(git_repo))['status']['new.py'] == '??'
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_are_coalesced(repo_path: Path) -> None:
+    cache = GitStateCache()
+    git_repo = CountingRepository(str(repo_path))
+
+    states = await asyncio.gather(*[cache.get_state(git_repo) for _ in range(50)])
+
+    assert git_repo.computed == 1
+    assert all(state == states[0] for state in states)
@@ -0,0 +1,15 @@
+import os
+import subprocess
+from pathlib import Path
+
+GIT_ENV = {
+    **os.environ,
+    'GIT_AUTHOR_NAME': 'test',
+    'GIT_AUTHOR_EMAIL': 'test@test',
+    'GIT_COMMITTER_NAME': 'test',
+    'GIT_COMMITTER_EMAIL': 'test@test',
+}
+
+
+def git(path: Path, *args: str) -> None:
+    subprocess.run(['git', *args], cwd=path, env=GIT_ENV, check=True, capture_output=True)
@@ -0,0 +1,112 @@
+import asyncio
+import json
+import time
+from typing import Any, List
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+from workbench_backend.jsonrpc import jsonrpc
+
+
+class EchoRpc(jsonrpc.JsonRpc):
+
+    @jsonrpc.register
+    async def echo(self, value: Any) -> Any:
+        return value
+
+
+async def drain(rpc: jsonrpc.JsonRpc) -> List[Any]:
+    await rpc.end()
+    return [jsonable_encoder(item, exclude_none=True) async for item in rpc]
+
+
+@pytest.mark.asyncio
+async def test_consecutive_stream_chunks_are_merged() -> None:
+    rpc = EchoRpc()
+    rpc.enable_batching(max_delay=10)
+    await rpc.notify('on_stream', pid=1, data='a')
+    await rpc.notify('on_stream', pid=1, data='b')
+    await rpc.notify('on_stream', pid=2, data='c')
+    await rpc.notify('status', state='ready')
+    await rpc.notify('on_stream', pid=1, data='d')
+    await rpc.notify('on_task_stream', id='x', name='build', data='e')
+    await rpc.notify('on_task_stream', id='x', name='build', data='f')
+
+    [batch] = await drain(rpc)
+    assert [(item['method'], item['params']) for item in batch] == [
+        ('on_stream', {'pid': 1, 'data': 'ab'}),
+        ('on_stream', {'pid': 2, 'data': 'c'}),
+        ('status', {'state': 'ready'}),
+        ('on_stream', {'pid': 1, 'data': 'd'}),
+        ('on_task_stream', {'id': 'x', 'name': 'build', 'data': 'ef'}),
+    ]
+    assert all(item['jsonrpc'] == '2.0' and 'id' not in item for item in batch)
+
+
+@pytest.mark.asyncio
+async def test_batch_flushes_on_thresholds_and_before_responses() -> None:
+    rpc = EchoRpc()
+    rpc.enable_batching(max_items=2, max_bytes=4, max_delay=10)
+    await rpc.notify('status', state='a')
+    await rpc.notify('status', state='b')
+    await rpc.notify('on_stream', pid=1, data='12345')
+    await rpc.notify('status', state='c')
+    await rpc.dispatch(json.dumps({'jsonrpc': '2.0', 'method': 'echo', 'params': [1], 'id': 1}))
+
+    frames = await drain(rpc)
+    assert [len(frame) for frame in frames[:3]] == [2, 1, 1]
+    assert frames[3] == {'jsonrpc': '2.0', 'result': 1, 'id': 1}
+
+
+@pytest.mark.asyncio
+async def test_batch_flushes_after_delay() -> None:
+    rpc = EchoRpc()
+    rpc.enable_batching(max_delay=0.01)
+    await rpc.notify('status', state='ready')
+    frame = await asyncio.wait_for(rpc.__anext__(), 1)
+    assert isinstance(frame, list) and len(frame) == 1
+
+
+async def flood(batching: bool, chunks: int) -> tuple[int, float]:
+    rpc = EchoRpc()
+    if batching:
+        rpc.enable_batching()
+    frames = 0
+
+    async def sender() -> None:
+        nonlocal frames
+        async for data in rpc:
+            jsonrpc.encode_message(data)
+            frames += 1
+
+    start = time.process_time()
+    sender_task = asyncio.create_task(sender())
+    for _ in range(chunks):
+        await rpc.notify('on_stream', pid=1, data='y\n')
+        # every chunk is read from its own websocket message
+        await asyncio.sleep(0)
+    await rpc.end()
+    await sender_task
+    return frames, time.process_time() - start
+
+
+@pytest.mark.asyncio
+async def test_flood_is_coalesced() -> None:
+    chunks = 1000
+    unbatched_frames, _ = await flood(False, chunks)
+    batched_frames, _ = await flood(True, chunks)
+    assert unbatched_frames == chunks
+    assert batched_frames * 10 <= unbatched_frames
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_flood_benchmark() -> None:
+    chunks = 20000
+    unbatched_frames, unbatched_cpu = await flood(False, chunks)
+    batched_frames, batched_cpu = await flood(True, chunks)
+    print(
+        f"{chunks} chunks: unbatched {unbatched_frames} frames {unbatched_cpu:.2f}s cpu, "
+        f"batched {batched_frames} frames {batched_cpu:.2f}s cpu"
+    )
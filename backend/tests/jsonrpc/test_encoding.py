@@ -0,0 +1,81 @@
+import datetime
+import json
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+from workbench_backend.jsonrpc import jsonrpc
+
+
+class Process(BaseModel):
+    pid: int
+    cmd: List[str]
+    started: datetime.datetime
+    exit_code: Optional[int] = None
+
+
+def messages() -> List[jsonrpc.RPCMessage]:
+    return [
+        jsonrpc.RPCRequest(jsonrpc='2.0', method='on_stream', params={'pid': 1, 'data': b'output \xe2\x9c\x93\n'}),
+        jsonrpc.RPCRequest(jsonrpc='2.0', method='on_task_stream', params={'id': 'x', 'name': 'build', 'data': 'text'}),
+        jsonrpc.RPCResponse(id=1, result={1: Process(pid=1, cmd=['python', 'main.py'], started=datetime.datetime(2024, 1, 1))}),
+        jsonrpc.RPCResponse(id='a', result={'id': uuid.UUID(int=1), 'files': ['a.py', 'b.py']}),
+        jsonrpc.RPCResponse(id=2, error=jsonrpc.METHOD_NOT_FOUND('missing not found')),
+        jsonrpc.RPCResponse(id=3),
+        [
+            jsonrpc.RPCRequest.model_construct(jsonrpc='2.0', method='on_stream', params={'pid': 2, 'data': b'a' * 100}, id=None),
+            jsonrpc.RPCRequest.model_construct(jsonrpc='2.0', method='status', params={'state': 'ready'}, id=None),
+        ],
+    ]
+
+
+def test_encode_message_matches_jsonable_encoder() -> None:
+    for message in messages():
+        assert json.loads(jsonrpc.encode_message(message)) == jsonable_encoder(message, exclude_none=True)
+
+
+def test_encode_message_replaces_split_characters() -> None:
+    message = jsonrpc.RPCRequest(jsonrpc='2.0', method='on_stream', params={'pid': 1, 'data': '✓'.encode()[:2]})
+    assert json.loads(jsonrpc.encode_message(message))['params']['data'] == '�'
+
+
+def per_message(encode: Callable[[Any], str], message: Any, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        encode(message)
+    return (time.perf_counter() - start) / rounds
+
+
+BENCHMARK_MESSAGES = [
+    ('stream chunk', jsonrpc.RPCRequest(jsonrpc='2.0', method='on_stream', params={'pid': 1, 'data': b'y' * 4096})),
+    ('process list', jsonrpc.RPCResponse(id=1, result={
+        pid: Process(pid=pid, cmd=['python', 'main.py'], started=datetime.datetime(2024, 1, 1)) for pid in range(50)
+    })),
+    ('batch', [
+        jsonrpc.RPCRequest.model_construct(jsonrpc='2.0', method='on_stream', params={'pid': 1, 'data': b'line\n' * 20}, id=None)
+        for _ in range(100)
+    ]),
+]
+
+
+@pytest.mark.parametrize('name,message', BENCHMARK_MESSAGES)
+def test_benchmark_messages_match_jsonable_encoder(name: str, message: Any) -> None:
+    assert json.loads(jsonrpc.encode_message(message)) == jsonable_encoder(message, exclude_none=True)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('name,message', BENCHMARK_MESSAGES)
+def test_encode_benchmark(name: str, message: Any) -> None:
+    rounds = 200
+    results: Dict[str, float] = {
+        'jsonable_encoder': per_message(lambda m: json.dumps(jsonable_encoder(m, exclude_none=True)), message, rounds),
+        'encode_message': per_message(jsonrpc.encode_message, message, rounds),
+    }
+    print(
+        f"{name}: jsonable_encoder {results['jsonable_encoder'] * 1e6:.1f} us/message, "
+        f"encode_message {results['encode_message'] * 1e6:.1f} us/message"
+    )
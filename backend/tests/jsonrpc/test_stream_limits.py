@@ -0,0 +1,72 @@
+import asyncio
+from typing import Any, List
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+from workbench_backend.jsonrpc import jsonrpc
+from workbench_backend.utils.metrics import metrics
+
+
+async def take(rpc: jsonrpc.JsonRpc, count: int) -> List[Any]:
+    return [jsonable_encoder(await rpc.__anext__(), exclude_none=True) for _ in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_drop_policy_elides_output_past_high_water() -> None:
+    rpc = jsonrpc.JsonRpc()
+    rpc.enable_stream_limits(8, 'drop', 'drop-session')
+    for _ in range(10):
+        await rpc.notify('on_stream', pid=1, data='abcd')
+    await rpc.notify('on_stream', pid=2, data='other')
+    await rpc.notify('status', state='running')
+
+    assert metrics.snapshot()['stream_buffer.session.drop-session.bytes'] == 13
+    assert metrics.snapshot()['stream_buffer.session.drop-session.elided_bytes'] == 32
+
+    frames = await take(rpc, 4)
+    assert [frame['params']['data'] for frame in frames[:3]] == ['abcd', 'abcd', 'other']
+    # the marker is queued once the stream drained
+    [marker] = await take(rpc, 1)
+    assert marker['params'] == {'pid': 1, 'data': '\r\n[32 bytes elided]\r\n'}
+
+    await rpc.notify('on_stream', pid=1, data='next')
+    [frame] = await take(rpc, 1)
+    assert frame['params']['data'] == 'next'
+    assert metrics.snapshot()['stream_buffer.session.drop-session.bytes'] == 0
+
+
+@pytest.mark.asyncio
+async def test_block_policy_waits_for_the_sender() -> None:
+    rpc = jsonrpc.JsonRpc()
+    rpc.enable_stream_limits(8, 'block')
+    produced = 0
+
+    async def producer() -> None:
+        nonlocal produced
+        for _ in range(10):
+            await rpc.notify('on_task_stream', id='t', name='build', data=b'abcd')
+            produced += 1
+
+    task = asyncio.create_task(producer())
+    await asyncio.sleep(0.01)
+    assert produced == 2
+
+    frames = await take(rpc, 10)
+    await task
+    assert produced == 10
+    assert all(frame['params']['data'] == 'abcd' for frame in frames)
+
+
+@pytest.mark.asyncio
+async def test_stream_limits_with_batching() -> None:
+    rpc = jsonrpc.JsonRpc()
+    rpc.enable_batching(max_delay=0.01)
+    rpc.enable_stream_limits(8, 'drop')
+    for _ in range(4):
+        await rpc.notify('on_stream', pid=1, data='abcd')
+
+    [batch] = await take(rpc, 1)
+    assert batch == [{'jsonrpc': '2.0', 'method': 'on_stream', 'params': {'pid': 1, 'data': 'abcdabcd'}}]
+    [marker] = await take(rpc, 1)
+    assert marker[0]['params']['data'] == '\r\n[8 bytes elided]\r\n'
@@ -0,0 +1,147 @@
+import asyncio
+import socket
+from typing import Any, AsyncIterator, List, Optional, Set
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+
+from workbench_backend.utils import readiness
+from workbench_backend.utils.clients import clients
+from workbench_backend.utils.readiness import RouteWatcher, wait_port_open, wait_ready
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return int(sock.getsockname()[1])
+
+
+async def open_port_later(port: int, delay: float) -> asyncio.AbstractServer:
+    await asyncio.sleep(delay)
+    return await asyncio.start_server(lambda reader, writer: writer.close(), '127.0.0.1', port)
+
+
+class TraefikServer:
+    """
+    Stand-in for the services list of the traefik API. Pages like traefik does,
+    X-Next-Page of the last page is 1.
+    """
+
+    def __init__(self) -> None:
+        self.services: Set[str] = set()
+        self.requests = 0
+        self.pages: List[int] = []
+        self.url = ''
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _services(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        page = int(request.query.get('page', '1'))
+        per_page = int(request.query.get('per_page', '100'))
+        self.pages.append(page)
+        names = sorted(self.services)
+        start = (page - 1) * per_page
+        response = web.json_response([
+            {'name': name, 'serverStatus': {'http://upstream': 'UP'}}
+            for name in names[start:start + per_page]
+        ])
+        response.headers['X-Next-Page'] = str(page + 1 if start + per_page < len(names) else 1)
+        return response
+
+    async def __aenter__(self) -> 'TraefikServer':
+        app = web.Application()
+        app.router.add_get('/api/http/services', self._services)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        self.url = f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}' # type: ignore
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        assert self._runner is not None
+        await self._runner.cleanup()
+
+
+@pytest_asyncio.fixture
+async def traefik(monkeypatch: pytest.MonkeyPatch) -> AsyncIterator[TraefikServer]:
+    async with TraefikServer() as server:
+        monkeypatch.setattr(readiness, 'route_watcher', RouteWatcher(server.url, 0.05))
+        yield server
+    await clients.close()
+
+
+@pytest.mark.asyncio
+async def test_wait_ends_when_the_port_opens() -> None:
+    port = free_port()
+    opener = asyncio.create_task(open_port_later(port, 0.3))
+    # the port opens while it is waited for, a wait that ran out would be False
+    assert await wait_port_open('127.0.0.1', port, 5)
+    assert opener.done()
+    (await opener).close()
+
+    assert not await wait_port_open('127.0.0.1', free_port(), 0.2)
+
+
+@pytest.mark.parametrize('services,pages', [(0, [1]), (4, [1, 2]), (5, [1, 2, 3])])
+@pytest.mark.asyncio
+async def test_every_page_is_read_once(traefik: TraefikServer, services: int, pages: List[int]) -> None:
+    traefik.services.update(f'service{i}@redis' for i in range(services))
+    watcher = RouteWatcher(traefik.url, 0.05, per_page=2)
+    assert await asyncio.wait_for(watcher._published(), 1) == traefik.services
+    assert traefik.pages == pages
+
+
+@pytest.mark.asyncio
+async def test_one_poll_serves_every_waiter(traefik: TraefikServer) -> None:
+    names = [f'service{i}@redis' for i in range(10)]
+
+    async def publish() -> None:
+        await asyncio.sleep(0.2)
+        traefik.services.update(names)
+
+    results = await asyncio.gather(
+        publish(),
+        *(readiness.route_watcher.wait_published(name, 5) for name in names)
+    )
+    assert all(results[1:])
+    # polled every 50ms for all ten, not once per service
+    assert traefik.requests < 10
+    requests = traefik.requests
+    await asyncio.sleep(0.2)
+    assert traefik.requests == requests
+
+
+@pytest.mark.asyncio
+async def test_ports_become_ready_concurrently(traefik: TraefikServer, monkeypatch: pytest.MonkeyPatch) -> None:
+    ports = [free_port() for _ in range(3)]
+    waiting = 0
+    all_waiting = asyncio.Event()
+
+    def counted(wait: Any) -> Any:
+        async def counted_wait(*args: Any) -> bool:
+            nonlocal waiting
+            waiting += 1
+            if waiting == 2 * len(ports):
+                all_waiting.set()
+            try:
+                return bool(await wait(*args))
+            finally:
+                waiting -= 1
+        return counted_wait
+
+    monkeypatch.setattr(readiness, 'wait_port_open', counted(wait_port_open))
+    monkeypatch.setattr(readiness.route_watcher, 'wait_published', counted(readiness.route_watcher.wait_published))
+
+    async def open_when_all_wait() -> List[asyncio.AbstractServer]:
+        # one wait after the other would never get here, and time out
+        await all_waiting.wait()
+        traefik.services.update(f'{port}@redis' for port in ports)
+        return [await open_port_later(port, 0) for port in ports]
+
+    opener = asyncio.create_task(open_when_all_wait())
+    results = await asyncio.gather(*(wait_ready('127.0.0.1', port, f'{port}@redis', 2) for port in ports))
+    assert all(results)
+    for server in await opener:
+        server.close()
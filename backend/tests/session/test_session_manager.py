@@ -0,0 +1,52 @@
+import asyncio
+from typing import AsyncIterator
+
+import pytest
+import pytest_asyncio
+
+from workbench_backend.utils.clients import clients
+from workbench_backend.utils.session_manager import SessionManager
+
+
+@pytest_asyncio.fixture
+async def manager() -> AsyncIterator[SessionManager]:
+    manager = SessionManager(ttl=1)
+    yield manager
+    await manager.close()
+    await clients.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_proxy_updates_are_not_lost(manager: SessionManager) -> None:
+    session_id = await manager.start_session('user@example.com')
+    hashes = [f'hash-{i}' for i in range(50)]
+    await asyncio.gather(*(manager.add_proxy_hash_to_session(session_id, h) for h in hashes))
+    await asyncio.gather(*(manager.remove_proxy_hash_from_session(session_id, h) for h in hashes[:10]))
+
+    session = await manager.get_session_by_proxy_hash(hashes[-1])
+    assert session is not None
+    assert session['user_email'] == 'user@example.com'
+    assert sorted(session['proxy_hashes']) == sorted(hashes[10:])
+    assert await manager.get_session_by_proxy_hash(hashes[0]) is None
+
+    await manager.end_session(session_id)
+    assert await manager.get_session_by_proxy_hash(hashes[-1]) is None
+    # a proxy can not be added to a session that has ended
+    await manager.add_proxy_hash_to_session(session_id, 'late')
+    assert await manager.get_session_by_proxy_hash('late') is None
+
+
+@pytest.mark.asyncio
+async def test_sessions_expire_without_heartbeat(manager: SessionManager) -> None:
+    alive = await manager.start_session('alive@example.com')
+    orphan = await manager.start_session('orphan@example.com')
+    await manager.add_proxy_hash_to_session(alive, 'alive')
+    await manager.add_proxy_hash_to_session(orphan, 'orphan')
+    # what is left behind when a backend crashes
+    manager._heartbeats.pop(orphan).cancel()
+
+    await asyncio.sleep(2)
+    assert await manager.get_session_by_proxy_hash('alive') is not None
+    assert await manager.get_session_by_proxy_hash('orphan') is None
+    assert not await manager.redis.exists(f'session:{orphan}', f'session:{orphan}:proxies', 'proxy:orphan')
+    await manager.end_session(alive)
@@ -1,12 +1,12 @@
 
 import asyncio
 from pathlib import Path
-from typing import Annotated
+from typing import Annotated, Optional
 
-from fastapi import Depends, HTTPException, WebSocket
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import FileResponse, RedirectResponse, Response
+from fastapi import Depends, HTTPException, Request, WebSocket
+from fastapi.responses import RedirectResponse, Response
 
+from ....app.config import config as app_config
 from ....crud.crud_router import UserSharedCRUDRouter
 from ....crud.schemas.app import (
     AppCreateSchema,
@@ -19,6 +19,9 @@ from ....db.models.mixins import ReadWriteEnum
 from ....dependencies.auth import GET_USER
 from ....dependencies.crud import create_crud_dependency_with_user
 from ....dependencies.util import SESSION_MANAGER
+from ....jsonrpc.jsonrpc import encode_message
+from ....utils.file_response import IMMUTABLE, cached_file_response
+from ....utils.thumbnails import thumbnail
 from .runner_handler import AppRunnerRpc
 
 router = UserSharedCRUDRouter(
@@ -28,7 +31,8 @@ router = UserSharedCRUDRouter(
     create_schema=AppCreateSchema,
     update_schema=AppUpdateSchema,
     get_crud=create_crud_dependency_with_user(AppCRUD),
-    disable_methods=['CREATE','DELETE','UPDATE']
+    disable_methods=['CREATE','DELETE','UPDATE'],
+    filters={'release_id': int, 'name': str}
 )
 
 
@@ -36,8 +40,15 @@ APP_BY_READ = Annotated[App, Depends(router.create_read_by_id_check_permission_d
 
 @router.get('/{id}/logo', responses={404: {"description": "Logo not found"}, 200: {"content": {"image/*": {}}},307: {"description": "Redirect to logo"}})
 async def get_app_logo(
-    app: APP_BY_READ
+    app: APP_BY_READ,
+    request: Request,
+    size: Optional[int] = None
 ) -> Response:
+    """
+    Logos are stored by the hash of their content and the logo of an app never changes,
+    so they are cached by the browser for good. `size` scales the logo down to fit in a
+    `size` x `size` square, one of `APP_LOGO_THUMBNAIL_SIZES`.
+    """
     if (logo := app.app_icon) is None:
         raise HTTPException(status_code=404, detail="No logo found")
 
@@ -49,24 +60,36 @@ async def get_app_logo(
     if not logo_path.exists():
         raise HTTPException(status_code=404, detail="Logo not found")
 
-    return FileResponse(logo_path)
+    if size is not None:
+        if size not in app_config.APP_LOGO_THUMBNAIL_SIZES:
+            raise HTTPException(status_code=422, detail=f"size must be one of {app_config.APP_LOGO_THUMBNAIL_SIZES}")
+        logo_path = await thumbnail(logo_path, size)
+
+    return cached_file_response(request, logo_path, IMMUTABLE, etag=f'"{logo_path.stem}"')
 
 @router.websocket('/{id}/run')
 async def run_websocket(
     ws: WebSocket,
     app: APP_BY_READ,
     user: GET_USER,
-    session_manager: SESSION_MANAGER
+    session_manager: SESSION_MANAGER,
+    batch: bool = False
 ) -> None:
     await ws.accept()
     session_id = await session_manager.start_session(user.email)
     rpc = AppRunnerRpc(session_manager, session_id, app, user)
+    if batch:
+        rpc.enable_batching(
+            app_config.RPC_BATCH_MAX_ITEMS,
+            app_config.RPC_BATCH_MAX_BYTES,
+            app_config.RPC_BATCH_MAX_DELAY
+        )
     try:
         async def sender() -> None:
             try:
                 async for data in rpc:
                     try:
-                        await ws.send_json(jsonable_encoder(data, exclude_none=True))
+                        await ws.send_text(encode_message(data))
                     except Exception:
                         continue
             except asyncio.CancelledError:
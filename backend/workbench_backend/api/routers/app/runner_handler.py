@@ -15,7 +15,9 @@ from ....docker.utils import (
     setup_volumes,
 )
 from ....jsonrpc import jsonrpc
-from ....utils.proxy import hash_path, proxy_url, wait_service_up
+from ....utils.clients import clients
+from ....utils.proxy import hash_path, proxy_url
+from ....utils.readiness import wait_ready
 from ....utils.session_manager import SessionManager
 
 
@@ -27,13 +29,18 @@ class AppRunnerRpc(jsonrpc.JsonRpc):
         self.user = user
         self.session_id = session_id
         self.session_manager = session_manager
-        self.docker = aiodocker.Docker()
+        self.docker = clients.docker()
         self.container: Optional[aiodocker.docker.DockerContainer] = None
         self.attach_ws: Optional[ClientWebSocketResponse] = None
         self._attach_ws_receiver_task: Optional[asyncio.Task[Any]] = None
         self._watcher_task: Optional[asyncio.Task[Any]] = None
         self.path_hash: Optional[str] = None
         self.traefik_name: str
+        self.enable_stream_limits(
+            app_config.STREAM_BUFFER_HIGH_WATER,
+            app_config.STREAM_BUFFER_POLICY,
+            session_id
+        )
 
     async def close(self) -> None:
         if self.attach_ws:
@@ -43,7 +50,6 @@ class AppRunnerRpc(jsonrpc.JsonRpc):
         if self.container:
             await self.container.stop()
             await self.container.delete(force=True)
-        await self.docker.close()
 
     @jsonrpc.register
     async def init(self) -> Optional[str]:
@@ -96,8 +102,10 @@ class AppRunnerRpc(jsonrpc.JsonRpc):
         self.attach_ws = await self.container.websocket()
         self._attach_ws_receiver_task = asyncio.create_task(self._attach_ws_receiver())
         if self.app.app_config.proxy:
-            await wait_service_up(f"{self.traefik_name}@docker")
-            await asyncio.sleep(5)
+            await self.container.show()
+            ip = self.container['NetworkSettings']['Networks'][app_config.APPS_DOCKER_NETWORK]['IPAddress']
+            # the port traefik is told to use by the container labels
+            await wait_ready(ip, self.app.app_config.port or 80, f"{self.traefik_name}@docker")
         await self.notify('status', state='active')
 
     @jsonrpc.register
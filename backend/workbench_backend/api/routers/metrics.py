@@ -0,0 +1,17 @@
+from typing import Dict
+
+from fastapi import APIRouter, Depends
+
+from ...dependencies.auth import check_roles, get_user
+from ...utils.metrics import metrics
+
+router = APIRouter(
+    prefix='/metrics',
+    tags=['Metrics'],
+    dependencies=[Depends(get_user), Depends(check_roles(['admin']))]
+)
+
+
+@router.get('')
+async def get_metrics() -> Dict[str, float]:
+    return metrics.snapshot()
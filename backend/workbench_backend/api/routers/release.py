@@ -1,3 +1,11 @@
+import asyncio
+import contextlib
+import json
+from typing import Annotated, AsyncIterator, Optional, TypeAlias
+
+from fastapi import Depends, Header, WebSocket
+from fastapi.responses import StreamingResponse
+
 from ...crud.crud_router import UserSharedCRUDRouter
 from ...crud.schemas.release import (
     ReleaseCreateSchema,
@@ -5,7 +13,10 @@ from ...crud.schemas.release import (
     ReleaseResponseSchema,
     ReleaseUpdateSchema,
 )
+from ...db.models.mixins import ReadWriteEnum
+from ...db.models.release import Release
 from ...dependencies.crud import create_crud_dependency_with_user
+from ...docker.build_progress import BuildEvent, tail_build_progress
 
 router = UserSharedCRUDRouter(
     prefix="/release",
@@ -14,4 +25,49 @@ router = UserSharedCRUDRouter(
     create_schema=ReleaseCreateSchema,
     update_schema=ReleaseUpdateSchema,
     get_crud=create_crud_dependency_with_user(ReleaseCRUD),
+    filters={'repo_id': int},
 )
+
+BY_ID_READ: TypeAlias = Annotated[Release, Depends(router.create_read_by_id_check_permission_dependency(ReadWriteEnum.READ))]
+
+
+async def _build_events(events: AsyncIterator[BuildEvent]) -> AsyncIterator[str]:
+    async with contextlib.aclosing(events): # type: ignore
+        async for entry_id, fields in events:
+            yield f"id: {entry_id}\nevent: {fields.get('type', 'log')}\ndata: {json.dumps(fields)}\n\n"
+
+
+@router.get('/{id}/build/stream', response_class=StreamingResponse, responses={200: {"content": {"text/event-stream": {}}}})
+async def stream_build_progress(release: BY_ID_READ, last_event_id: Annotated[Optional[str], Header()] = None) -> StreamingResponse:
+    """
+    Phase transitions (`phase` events) and output lines (`log` events) of the image build,
+    from the start of the build, or after the last event a reconnecting event source got.
+    Ends when the build is ready or failed.
+    """
+    return StreamingResponse(
+        _build_events(tail_build_progress(release.id, last_event_id or '0')),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@router.websocket('/{id}/build/ws')
+async def build_progress_websocket(ws: WebSocket, release: BY_ID_READ) -> None:
+    """The events of the build stream as json messages, with their id in `id`."""
+    await ws.accept()
+    events = tail_build_progress(release.id)
+
+    async def sender() -> None:
+        async with contextlib.aclosing(events): # type: ignore
+            async for entry_id, fields in events:
+                await ws.send_text(json.dumps({'id': entry_id, **fields}))
+        await ws.close()
+
+    sender_task = asyncio.create_task(sender())
+    try:
+        async for _ in ws.iter_text():
+            pass
+    finally:
+        sender_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await sender_task
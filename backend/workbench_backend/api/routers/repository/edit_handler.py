@@ -73,6 +73,11 @@ class EditorRpc(jsonrpc.JsonRpc):
         self._task_execs: Dict[str, Exec] = {}
         self._lsp_service: Optional[LspServiceHandler] = None
         self._editable_repo: EditableRepository
+        self.enable_stream_limits(
+            app_config.STREAM_BUFFER_HIGH_WATER,
+            app_config.STREAM_BUFFER_POLICY,
+            session_id
+        )
 
     async def init(self) -> None:
         await self.notify('status', state='starting')
@@ -104,7 +109,6 @@ class EditorRpc(jsonrpc.JsonRpc):
 
     async def close(self) -> None:
         await self._edit_container.close()
-        await self._proxy.close()
         for _id, stream in self._process_streams.items():
             stream.stop()
         if self._lsp_service:
@@ -149,14 +153,17 @@ class EditorRpc(jsonrpc.JsonRpc):
 
     async def _handle_proxying(self, notif: Notification) -> None:
         ports: List[int] = notif.data
-        for port in ports:
-            if port < 8000 or port >= 9000:
-                continue
-            assert notif.pid
-            name = self._hash_open_port(notif.pid, port).hex()
+        assert notif.pid
+        pid = notif.pid
+
+        async def proxy_port(port: int) -> None:
+            name = self._hash_open_port(pid, port).hex()
             url = await self._proxy.new_service(name,self._edit_container.ip,port)
             await self._session_manager.add_proxy_hash_to_session(self._session_id, name)
-            await self.notify("proxy_opened", pid=notif.pid, port=port, url=url)
+            await self.notify("proxy_opened", pid=pid, port=port, url=url)
+
+        # every port is announced as soon as it is ready, not after the ones before it
+        await asyncio.gather(*(proxy_port(port) for port in ports if 8000 <= port < 9000))
 
     async def _handle_proxy_close(self, pid: int) -> None:
         try:
@@ -211,6 +218,7 @@ class EditorRpc(jsonrpc.JsonRpc):
             stop_event = asyncio.Event()
             async for changes in watchfiles.awatch(self._repo.path(), stop_event=stop_event):
                 try:
+                    self._editable_repo.invalidate_state()
                     file_changes = list(map(_transform,changes))
                     if next((item for item in file_changes if item["path"] == "workbench.yml"), None):
                         await self._on_workbench_config_changed()
@@ -373,7 +381,7 @@ class EditorRpc(jsonrpc.JsonRpc):
 
     @jsonrpc.register
     async def get_git_status(self) -> Dict[str, str]:
-        return await self._editable_repo.status()
+        return (await self._editable_repo.get_state())['status']
 
     @jsonrpc.register
     async def get_file_content(self, path: str) -> str:
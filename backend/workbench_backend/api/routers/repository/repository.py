@@ -8,13 +8,14 @@ from fastapi import (
     Body,
     Depends,
     HTTPException,
+    Request,
     Response,
     UploadFile,
     WebSocket,
 )
-from fastapi.encoders import jsonable_encoder
 from fastapi.responses import FileResponse
 
+from ....app.config import config as app_config
 from ....crud.crud_router import UserSharedCRUDRouter
 from ....crud.schemas.repository import (
     RepositoryCreateSchema,
@@ -28,6 +29,8 @@ from ....dependencies.auth import GET_USER
 from ....dependencies.crud import create_crud_dependency_with_user
 from ....dependencies.util import SESSION_MANAGER
 from ....git.editable_repository import AsyncFileLike
+from ....jsonrpc.jsonrpc import encode_message
+from ....utils.file_response import cached_file_response
 from .edit_handler import EditorRpc
 
 router = UserSharedCRUDRouter(
@@ -44,18 +47,20 @@ BY_ID_WRITE: TypeAlias = Annotated[Repository, Depends(router.create_read_by_id_
 BY_ID_READ: TypeAlias = Annotated[Repository, Depends(router.create_read_by_id_check_permission_dependency(ReadWriteEnum.READ))]
 
 
-@router.get('/{id}/content/{path:path}')
+@router.get('/{id}/content/{path:path}', response_class=FileResponse)
 async def get_file_content(
     repo: BY_ID_READ,
-    path: str
-) -> FileResponse:
+    path: str,
+    request: Request
+) -> Response:
+    """Revalidated with the ETag on every use, large files can be fetched in parts with Range."""
     git_repo = await repo.get_git_repo()
     full_path = Path(git_repo.root_path) / path
 
     if not full_path.exists():
         raise HTTPException(status_code=404, detail="File not found")
 
-    return FileResponse(full_path)
+    return cached_file_response(request, full_path)
 
 @router.post('/{id}/content/{path:path}')
 async def upload_file(
@@ -82,17 +87,24 @@ async def edit_websocket(
     ws: WebSocket,
     repo: BY_ID_WRITE,
     user: GET_USER,
-    session_manager: SESSION_MANAGER
+    session_manager: SESSION_MANAGER,
+    batch: bool = False
 ) -> None:
     await ws.accept()
     session_id = await session_manager.start_session(user.email)
     edit_rpc = EditorRpc(session_manager, session_id, repo,user)
+    if batch:
+        edit_rpc.enable_batching(
+            app_config.RPC_BATCH_MAX_ITEMS,
+            app_config.RPC_BATCH_MAX_BYTES,
+            app_config.RPC_BATCH_MAX_DELAY
+        )
     try:
         async def sender() -> None:
             try:
                 async for data in edit_rpc:
                     try:
-                        await ws.send_json(jsonable_encoder(data, exclude_none=True))
+                        await ws.send_text(encode_message(data))
                     except Exception as e:
                         logging.error("Edit websocket send error: ", exc_info=e)
                         continue
@@ -118,19 +130,7 @@ git_router = APIRouter(
 @git_router.get('/state')
 async def get_state(repo: BY_ID_READ) -> Any:
     git_repo = await repo.get_git_repo()
-    head_task = asyncio.create_task(git_repo.get_head_shorthand())
-    tags_task = asyncio.create_task(git_repo.get_tags())
-    branches_task = asyncio.create_task(git_repo.get_branches())
-    status_task = asyncio.create_task(git_repo.status())
-
-    head, tags, branches, status = await asyncio.gather(head_task, tags_task, branches_task, status_task)
-
-    return {
-        "head": head,
-        "tags": tags,
-        "branches": branches,
-        "status": status,
-    }
+    return await git_repo.get_state()
 
 @git_router.get('/head')
 async def get_head(repo: BY_ID_READ) -> Any:
@@ -150,7 +150,7 @@ async def get_tags(repo: BY_ID_READ) -> Any:
 @git_router.get('/status')
 async def get_status(repo: BY_ID_READ) -> Any:
     git_repo = await repo.get_git_repo()
-    return await git_repo.status()
+    return (await git_repo.get_state())['status']
 
 @git_router.post('/commit')
 async def commit(repo: BY_ID_WRITE, user: GET_USER, message: str = Body(embed=True)) -> Any:
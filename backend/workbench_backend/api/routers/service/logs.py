@@ -0,0 +1,83 @@
+import asyncio
+import contextlib
+from dataclasses import dataclass
+from typing import Annotated, AsyncIterator, Optional, TypeAlias
+
+from fastapi import Depends, Header, HTTPException, WebSocket
+from fastapi.responses import StreamingResponse
+
+from ....docker.log_stream import LogLine, parse_time
+
+DEFAULT_TAIL = 200
+
+
+@dataclass
+class LogQuery:
+    tail: Optional[int]
+    since: Optional[int]
+    until: Optional[int]
+    follow: bool
+
+
+def _parse_time(name: str, value: Optional[str]) -> Optional[int]:
+    if value is None:
+        return None
+    try:
+        return parse_time(value)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"{name}: {e}") from e
+
+
+async def log_query(
+    tail: Optional[int] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    follow: bool = True,
+    last_event_id: Annotated[Optional[str], Header()] = None,
+) -> LogQuery:
+    """
+    `since` and `until` are RFC 3339 timestamps or unix seconds, only lines after `since` are sent.
+    A reconnecting event source continues after the last line it got, the `id` of each event.
+    Without `since` the last `DEFAULT_TAIL` lines are sent first, unless `tail` is given.
+    """
+    parsed_since = _parse_time('since', last_event_id or since)
+    if tail is None and parsed_since is None:
+        tail = DEFAULT_TAIL
+    return LogQuery(tail, parsed_since, _parse_time('until', until), follow)
+
+LOG_QUERY: TypeAlias = Annotated[LogQuery, Depends(log_query)]
+
+
+async def _events(lines: AsyncIterator[LogLine]) -> AsyncIterator[str]:
+    async with contextlib.aclosing(lines): # type: ignore
+        async for line in lines:
+            data = ''.join(f'data: {part}\n' for part in line.line.rstrip('\n').split('\n'))
+            yield f'id: {line.timestamp}\n{data}\n'
+
+
+def event_stream_response(lines: AsyncIterator[LogLine]) -> StreamingResponse:
+    return StreamingResponse(
+        _events(lines),
+        media_type='text/event-stream',
+        # keeps proxies from buffering the stream
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+async def send_logs(ws: WebSocket, lines: AsyncIterator[LogLine]) -> None:
+    """Sends every line as a text message, closes the websocket at the end of the logs."""
+    async def sender() -> None:
+        async with contextlib.aclosing(lines): # type: ignore
+            async for line in lines:
+                await ws.send_text(line.line)
+        await ws.close()
+
+    sender_task = asyncio.create_task(sender())
+    try:
+        # nothing is expected from the client, the loop ends when it disconnects
+        async for _ in ws.iter_text():
+            pass
+    finally:
+        sender_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await sender_task
@@ -1,9 +1,10 @@
-from typing import Annotated, AsyncIterator, List
+from typing import Annotated, List
 
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import PlainTextResponse
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketException, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
 from ....dependencies.auth import check_roles, get_user
+from .logs import LOG_QUERY, event_stream_response, send_logs
 from .platform_service_handler import (
     PlatformService,
     PlatformServiceHandler,
@@ -11,12 +12,8 @@ from .platform_service_handler import (
 )
 
 
-async def platform_service_dependency() -> AsyncIterator[PlatformServiceHandler]:
-    try:
-        handler = PlatformServiceHandler()
-        yield handler
-    finally:
-        await handler.close()
+async def platform_service_dependency() -> PlatformServiceHandler:
+    return PlatformServiceHandler()
 
 PLATFORM_SERVICE_HANDLER = Annotated[PlatformServiceHandler, Depends(platform_service_dependency)]
 
@@ -45,3 +42,19 @@ async def get_logs(platform_service_handler: PLATFORM_SERVICE_HANDLER, id: str,
     except PlatFormServiceNotFound as e:
         raise HTTPException(status_code=404, detail=str(e)) from e
 
+@platform_service_router.get('/{id}/logs/stream', response_class=StreamingResponse, responses={200: {"content": {"text/event-stream": {}}}})
+async def stream_logs(platform_service_handler: PLATFORM_SERVICE_HANDLER, id: str, query: LOG_QUERY) -> StreamingResponse:
+    try:
+        lines = await platform_service_handler.stream_logs(id, query.tail, query.since, query.until, query.follow)
+    except PlatFormServiceNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    return event_stream_response(lines)
+
+@platform_service_router.websocket('/{id}/logs/ws')
+async def logs_websocket(ws: WebSocket, platform_service_handler: PLATFORM_SERVICE_HANDLER, id: str, query: LOG_QUERY) -> None:
+    try:
+        lines = await platform_service_handler.stream_logs(id, query.tail, query.since, query.until, query.follow)
+    except PlatFormServiceNotFound as e:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=str(e)) from e
+    await ws.accept()
+    await send_logs(ws, lines)
@@ -1,12 +1,14 @@
 import asyncio
 import datetime
-from typing import Dict, List, Literal, Optional, TypeAlias
+from typing import AsyncIterator, List, Literal, Optional, TypeAlias, cast
 
-from aiodocker import Docker, DockerError
-from aiodocker.containers import DockerContainer
+from aiodocker import DockerError
 from pydantic import BaseModel
 
+from ....docker.container_state import ContainerState, container_states
+from ....docker.log_stream import LogLine, log_streams
 from ....docker.utils import WorkbenchContainerLabels
+from ....utils.clients import clients
 
 PlatformServiceStatus: TypeAlias = Literal["created", "running", "paused", "restarting", "exited", "removing", "dead"]
 
@@ -20,25 +22,26 @@ class PlatFormServiceNotFound(Exception):
     pass
 
 class PlatformServiceHandler:
+    """Served from the container state cache, from the docker API while that isn't ready."""
 
     def __init__(self) -> None:
-        self.docker = Docker()
+        self.docker = clients.docker()
 
     async def get_all(self) -> List[PlatformService]:
-        containers = await self._get_service_containers(inspect=True)
-        return [self._to_service(container) for container in containers.values()]
+        states = await self._get_service_states()
+        return [self._to_service(state) for state in states]
 
     async def get_one(self, id: str) -> PlatformService:
-        container = await self._get_service_container(id, inspect=True)
-        if container is None:
+        state = await self._get_service_state(id)
+        if state is None:
             raise PlatFormServiceNotFound(f"Service with id {id} not found")
-        return self._to_service(container)
+        return self._to_service(state)
 
     async def get_logs(self, id: str, limit: int) -> str:
-        container = await self._get_service_container(id, inspect=False)
-        if container is None:
+        state = await self._get_service_state(id)
+        if state is None:
             raise PlatFormServiceNotFound(f"Service with id {id} not found")
-        logs: List[str] = await container.log(
+        logs: List[str] = await self.docker.containers.container(state.id).log(
             stdout=True,
             stderr=True,
             follow=False,
@@ -47,37 +50,47 @@ class PlatformServiceHandler:
         )
         return ''.join(logs)
 
+    async def stream_logs(
+        self,
+        id: str,
+        tail: Optional[int] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        follow: bool = True
+    ) -> AsyncIterator[LogLine]:
+        """Looks the service up first, so a missing one is reported before anything is streamed."""
+        state = await self._get_service_state(id)
+        if state is None:
+            raise PlatFormServiceNotFound(f"Service with id {id} not found")
+        return log_streams.read(self.docker.containers.container(state.id), tail, since, until, follow)
 
-
-    async def _get_service_containers(self, inspect: bool = False) -> Dict[str, DockerContainer]:
+    async def _get_service_states(self) -> List[ContainerState]:
+        if container_states.ready:
+            return container_states.list(WorkbenchContainerLabels.SHOW_IN_WORKBENCH.value, '1')
         containers = await self.docker.containers.list(all=True, filters={"label": [f"{WorkbenchContainerLabels.SHOW_IN_WORKBENCH.value}=1"]})
-        if inspect:
-            tasks = [container.show() for container in containers]
-            await asyncio.gather(*tasks)
-        return {container.id: container for container in containers}
-
-    async def _get_service_container(self, id: str, inspect: bool = False) -> DockerContainer | None:
-        try:
-            container: DockerContainer = await self.docker.containers.get(id)
-            if inspect:
-                await container.show()
-            if container["Config"]["Labels"].get(WorkbenchContainerLabels.SHOW_IN_WORKBENCH.value) is None:
-                return None
-            return container
-        except DockerError as e:
-            if e.status == 404:
-                return None
-            else:
-                raise e
-
-    async def close(self) -> None:
-        await self.docker.close()
-
-    def _to_service(self, container: DockerContainer) -> PlatformService:
+        await asyncio.gather(*[container.show() for container in containers])
+        return [ContainerState.from_inspect(container) for container in containers]
+
+    async def _get_service_state(self, id: str) -> Optional[ContainerState]:
+        if container_states.ready:
+            state = container_states.get(id)
+        else:
+            try:
+                state = ContainerState.from_inspect(await self.docker.containers.get(id))
+            except DockerError as e:
+                if e.status == 404:
+                    return None
+                else:
+                    raise e
+        if state is None or state.labels.get(WorkbenchContainerLabels.SHOW_IN_WORKBENCH.value) is None:
+            return None
+        return state
+
+    def _to_service(self, state: ContainerState) -> PlatformService:
         return PlatformService(
-            id=container.id,
-            name=container['Name'],
-            started_at=datetime.datetime.fromisoformat(container['State']['StartedAt']) if container['State']['StartedAt'] else None,
-            status=container['State']['Status'],
+            id=state.id,
+            # as docker inspect reports it
+            name=f'/{state.name}',
+            started_at=state.started_at,
+            status=cast(PlatformServiceStatus, state.status),
         )
-
@@ -1,7 +1,7 @@
-from typing import Annotated, AsyncIterator, TypeAlias
+from typing import Annotated, TypeAlias
 
-from fastapi import Depends
-from fastapi.responses import PlainTextResponse
+from fastapi import Depends, WebSocket
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
 from ....crud.crud_router import UserSharedCRUDRouter
 from ....crud.schemas.service import (
@@ -14,6 +14,7 @@ from ....db.models.mixins import ReadWriteEnum
 from ....db.models.service import Service
 from ....dependencies.auth import GET_USER
 from ....dependencies.crud import create_crud_dependency_with_user
+from .logs import LOG_QUERY, event_stream_response, send_logs
 from .platform_service import platform_service_router
 from .service_handler import ServiceHandler
 
@@ -25,20 +26,18 @@ router = UserSharedCRUDRouter(
     update_schema=ServiceUpdateSchema,
     get_crud=create_crud_dependency_with_user(ServiceCRUD),
     disable_methods=['CREATE','DELETE','UPDATE'],
-    subrouters=[platform_service_router]
+    subrouters=[platform_service_router],
+    filters={'release_id': int, 'name': str}
 )
 
 CRUD: TypeAlias = Annotated[ServiceCRUD, Depends(create_crud_dependency_with_user(ServiceCRUD))]
 BY_ID_WRITE: TypeAlias = Annotated[Service, Depends(router.create_read_by_id_check_permission_dependency(ReadWriteEnum.WRITE))]
 BY_ID_READ: TypeAlias = Annotated[Service, Depends(router.create_read_by_id_check_permission_dependency(ReadWriteEnum.READ))]
 
-async def get_service_handler(service: BY_ID_WRITE, crud: CRUD, user: GET_USER) -> AsyncIterator[ServiceHandler]:
-    try:
-        handler = ServiceHandler(service, crud, user)
-        await handler.init()
-        yield handler
-    finally:
-        await handler.close()
+async def get_service_handler(service: BY_ID_WRITE, crud: CRUD, user: GET_USER) -> ServiceHandler:
+    handler = ServiceHandler(service, crud, user)
+    await handler.init()
+    return handler
 
 SERVICE_HANDLER: TypeAlias = Annotated[ServiceHandler, Depends(get_service_handler)]
 
@@ -59,9 +58,19 @@ async def restart_service(handler: SERVICE_HANDLER) -> ServiceResponseSchema:
 
 @router.get('/{id}/logs', response_class=PlainTextResponse)
 async def get_service_logs(service: BY_ID_READ, crud: CRUD,user: GET_USER,limit: int = 200, ) -> str:
-    try:
-        handler = ServiceHandler(service, crud, user)
-        await handler.init()
-        return await handler.get_logs(limit)
-    finally:
-        await handler.close()
+    handler = ServiceHandler(service, crud, user)
+    await handler.init()
+    return await handler.get_logs(limit)
+
+@router.get('/{id}/logs/stream', response_class=StreamingResponse, responses={200: {"content": {"text/event-stream": {}}}})
+async def stream_service_logs(service: BY_ID_READ, crud: CRUD, user: GET_USER, query: LOG_QUERY) -> StreamingResponse:
+    handler = ServiceHandler(service, crud, user)
+    await handler.init()
+    return event_stream_response(handler.stream_logs(query.tail, query.since, query.until, query.follow))
+
+@router.websocket('/{id}/logs/ws')
+async def service_logs_websocket(ws: WebSocket, service: BY_ID_READ, crud: CRUD, user: GET_USER, query: LOG_QUERY) -> None:
+    handler = ServiceHandler(service, crud, user)
+    await handler.init()
+    await ws.accept()
+    await send_logs(ws, handler.stream_logs(query.tail, query.since, query.until, query.follow))
@@ -1,7 +1,6 @@
 import datetime
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 
-import aiodocker
 from aiodocker import DockerError
 from aiodocker.docker import DockerContainer
 
@@ -10,6 +9,8 @@ from ....celery_tasks.tasks.service_tasks import proxy_latest_service
 from ....crud.schemas.service import ServiceCRUD, ServiceUpdateSchema
 from ....db.models.service import Service, ServiceStatusEnum
 from ....db.models.user import User
+from ....docker.container_state import container_states
+from ....docker.log_stream import LogLine, log_streams
 from ....docker.utils import (
     ContainerConfigBuilder,
     connect_container_to_networks,
@@ -18,6 +19,7 @@ from ....docker.utils import (
     setup_labels,
     setup_volumes,
 )
+from ....utils.clients import clients
 from ....utils.proxy import hash_path, proxy_url
 
 
@@ -31,15 +33,12 @@ class ServiceHandler:
         self.service = service
         self.service_crud = service_crud
         self.user = user
-        self.docker = aiodocker.Docker()
+        self.docker = clients.docker()
         self.url: str | None = None
 
     async def init(self) -> None:
         self.container = await self._get_container()
 
-    async def close(self) -> None:
-        await self.docker.close()
-
     async def run(self) -> None:
         if self.container:
             await self.container.start()
@@ -120,8 +119,22 @@ class ServiceHandler:
                 )
         return ''.join(logs)
 
+    async def stream_logs(
+        self,
+        tail: Optional[int] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        follow: bool = True
+    ) -> AsyncIterator[LogLine]:
+        if not self.container:
+            return
+        async for line in log_streams.read(self.container, tail, since, until, follow):
+            yield line
 
     async def _get_container(self) -> Optional[DockerContainer]:
+        if container_states.ready:
+            state = container_states.get(self.container_name())
+            return self.docker.containers.container(state.id) if state else None
         try:
             return await self.docker.containers.get(self.container_name())
         except DockerError as e:
@@ -3,22 +3,22 @@ import logging
 import re
 from typing import Annotated, Any, Dict, Optional
 
-from aiodocker import Docker
 from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
 from pydantic import BaseModel
 
 from ...app.config import config
-from ...cache.redis import cache as redis_cache
 from ...crud.schemas.app import AppCRUD
 from ...crud.schemas.user import UserCreateSchema, UserCRUD
+from ...dependencies.auth import invalidate_user
 from ...dependencies.crud import with_standalone_session
-from ...dependencies.util import SESSION_MANAGER
 from ...docker.utils import (
     connect_container_to_networks,
     setup_container_routing,
     setup_environ,
     setup_volumes,
 )
+from ...utils.clients import clients
+from ...utils.session_manager import proxy_user_cache
 
 router = APIRouter(prefix='/webhooks', tags=['Webhooks'])
 
@@ -84,31 +84,31 @@ async def run_init_script(
     if not app.ready:
         raise HTTPException(status_code=500, detail="Image is not ready yet")
 
-    async with Docker() as client:
-        config = app.app_config.create_container_config(
-                app.release.docker_image,
-                "",
-                "apps-network",
-                ""
-            ).hostname(f"{app.name}-webhook-runner").tty(False)
+    client = clients.docker()
+    config = app.app_config.create_container_config(
+            app.release.docker_image,
+            "",
+            "apps-network",
+            ""
+        ).hostname(f"{app.name}-webhook-runner").tty(False)
 
-        config = setup_volumes(config, user, app)
-        config = setup_environ(config, user, app)
+    config = setup_volumes(config, user, app)
+    config = setup_environ(config, user, app)
 
-        container = await client.containers.create_or_replace(
-                f"{app.name}-{app.release.name}-webhook-runner",
-                config
-            )
-        if app.workbench_config.networks:
-            await connect_container_to_networks(container, user, app.workbench_config.networks)
-        await container.start()
-        await setup_container_routing(container.id)
-        exit_code = (await container.wait()).get('StatusCode', -1)
+    container = await client.containers.create_or_replace(
+            f"{app.name}-{app.release.name}-webhook-runner",
+            config
+        )
+    if app.workbench_config.networks:
+        await connect_container_to_networks(container, user, app.workbench_config.networks)
+    await container.start()
+    await setup_container_routing(container.id)
+    exit_code = (await container.wait()).get('StatusCode', -1)
 
-        if exit_code != 0:
-            raise HTTPException(status_code=500,detail=f"Script exited with exit code {exit_code}")
+    if exit_code != 0:
+        raise HTTPException(status_code=500,detail=f"Script exited with exit code {exit_code}")
 
-        return Response(status_code=200)
+    return Response(status_code=200)
 
 
 def format_string_to_named_regex(fmt: str) -> str:
@@ -133,7 +133,6 @@ PROXY_REGEX = re.compile(format_string_to_named_regex(config.PROXY_TEMPLATE))
 
 @router.get('/proxy_auth')
 async def proxy_auth(
-    session_manager: SESSION_MANAGER,
     x_forwarded_user: Annotated[str | None, Header()] = None,
     x_forwarded_host: Annotated[str | None, Header()] = None
 ) -> Response:
@@ -149,27 +148,11 @@ async def proxy_auth(
     if not x_forwarded_user:
         return Response(status_code=401)
 
-    from_cache = await redis_cache.get(proxy_hash)
-    if from_cache is not None:
-        if from_cache == x_forwarded_user:
-            return Response(status_code=200)
-        else:
-            return Response(status_code=403)
-
-    open_session = await session_manager.get_session_by_proxy_hash(proxy_hash)
-    if not open_session:
-        return Response(status_code=403)
-
-    logging.debug(f"Session: {open_session}")
-    logging.debug(f"Proxy hash: {proxy_hash}")
-    logging.debug(f"X-Forwarded-Host: {x_forwarded_host}")
-    logging.debug(f"X-Forwarded-User: {x_forwarded_user}")
-
-    if 'user_email' in open_session and open_session['user_email'] == x_forwarded_user:
-        await redis_cache.set(proxy_hash, x_forwarded_user)
-        return Response(status_code=200)
-    else:
+    # called for every proxied request, so the session is looked up in process first
+    user_email = await proxy_user_cache.user_of(proxy_hash)
+    if user_email is None:
         return Response(status_code=403)
+    return Response(status_code=200 if user_email == x_forwarded_user else 403)
 
 
 async def _handle_user_create(event: IdpEvent, user_crud: UserCRUD) -> None:
@@ -181,11 +164,15 @@ async def _handle_user_create(event: IdpEvent, user_crud: UserCRUD) -> None:
     username = repr.get('username')
     email = repr.get('email')
     await user_crud.create(UserCreateSchema(id=user_id, username=username, email=email))
+    invalidate_user(user_id)
 
 async def _handle_user_delete(event: IdpEvent, user_crud: UserCRUD) -> None:
     if not event.resourcePath:
         raise HTTPException(400, detail="Invalid event data")
     logging.info(f"Deleting user from event: {event}")
     user_id = event.resourcePath.split('/')[1]
-    user = await user_crud.read_by_id(user_id)
-    await user_crud.delete(user)
+    try:
+        user = await user_crud.read_by_id(user_id)
+        await user_crud.delete(user)
+    finally:
+        invalidate_user(user_id)
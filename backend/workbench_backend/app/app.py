@@ -6,15 +6,38 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from ..api import api_router
 from ..cache.redis import cache as redis_cache
+from ..celery_tasks.build_queue import build_queue
+from ..docker.container_state import container_states
+from ..docker.editor_pool import editor_pool
+from ..docker.events import docker_events
+from ..docker.log_stream import log_streams
+from ..docker.service_reconciler import service_reconciler
 from ..middlewares import DbSessionMiddleware
+from ..utils.clients import clients
+from ..utils.session_manager import proxy_user_cache, session_manager
 from .config import config
 from .custom_log import setup_logging
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    clients.start()
+    service_reconciler.start()
+    docker_events.start()
+    editor_pool.start()
+    proxy_user_cache.start()
+    build_queue.start()
     yield
+    await build_queue.close()
+    await proxy_user_cache.close()
+    await editor_pool.close()
+    await log_streams.close()
+    await docker_events.close()
+    await service_reconciler.close()
+    await container_states.close()
     await redis_cache.close()
+    await session_manager.close()
+    await clients.close()
 
 def create_app() -> FastAPI:
     app = FastAPI(
@@ -32,7 +55,8 @@ def create_app() -> FastAPI:
         CORSMiddleware,
         allow_origins=["*"],
         allow_methods=["*"],
-        allow_headers=["*"]
+        allow_headers=["*"],
+        expose_headers=["Link", "X-Next-Cursor"]
     )
     app.include_router(api_router)
     setup_logging(config.LOG_LEVEL)
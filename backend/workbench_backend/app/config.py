@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Literal
+from typing import List, Literal
 
 from pydantic_settings import BaseSettings
 
@@ -27,6 +27,45 @@ class Config(BaseSettings):
     WEBHOOK_SECRET: str = ''
     SERVICE_PROXY_TEMPLATE: str = 'http://localhost/services/{username}/{service_name}/{release_name}/'
     SCHEME: Literal['http', 'https'] = 'http'
+    GIT_BACKEND: Literal['subprocess', 'pygit2'] = 'pygit2'
+    GIT_STATE_CACHE_TTL: float = 60
+    EDITOR_POOL_SIZE: int = 4
+    EDITOR_POOL_REFILL_INTERVAL: float = 30
+    RPC_BATCH_MAX_ITEMS: int = 100
+    RPC_BATCH_MAX_BYTES: int = 64 * 1024
+    RPC_BATCH_MAX_DELAY: float = 0.025
+    STREAM_BUFFER_HIGH_WATER: int = 1024 * 1024
+    STREAM_BUFFER_POLICY: Literal['drop', 'block'] = 'drop'
+    AUTH_TOKEN_CACHE_SIZE: int = 10000
+    AUTH_USER_CACHE_SIZE: int = 10000
+    AUTH_CACHE_TTL: float = 300
+    JWKS_MAX_AGE: float = 3600
+    JWKS_REFRESH_AHEAD: float = 300
+    JWKS_MIN_REFETCH_INTERVAL: float = 30
+    SESSION_TTL: int = 90
+    PROXY_AUTH_CACHE_SIZE: int = 10000
+    PROXY_AUTH_CACHE_TTL: float = 60
+    PROXY_AUTH_NEGATIVE_TTL: float = 5
+    READINESS_TIMEOUT: float = 30
+    ROUTE_WATCH_INTERVAL: float = 0.25
+    DOCKER_HOST: str = 'unix:///var/run/docker.sock'
+    DOCKER_MAX_CONNECTIONS: int = 100
+    REDIS_MAX_CONNECTIONS: int = 100
+    # connections of the pool that blocking reads of build progress streams wait on
+    REDIS_BLOCKING_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_CONNECTIONS: int = 100
+    CLIENT_HEALTH_CHECK_INTERVAL: float = 30
+    SERVICE_RECONCILE_MAX_LAG: float = 2
+    SERVICE_RECONCILE_BATCH_SIZE: int = 500
+    LOG_STREAM_BUFFER_SIZE: int = 1000
+    LOG_STREAM_SLOW_VIEWER_TIMEOUT: float = 5
+    CELERY_DB_POOL_SIZE: int = 5
+    CELERY_DB_MAX_OVERFLOW: int = 5
+    BUILD_MAX_CONCURRENT: int = 2
+    BUILD_LEASE_SECONDS: float = 60
+    BUILD_PROGRESS_MAX_ENTRIES: int = 10000
+    BUILD_PROGRESS_TTL: int = 24 * 60 * 60
+    APP_LOGO_THUMBNAIL_SIZES: List[int] = [32, 64, 128, 256]
 
 
 config = Config()
@@ -0,0 +1,222 @@
+import asyncio
+import contextlib
+import json
+import logging
+import uuid
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator, Dict, List, Optional
+
+from redis.commands.core import AsyncScript
+
+from ..app.config import config
+from ..docker.build_progress import BuildPhase, BuildProgress
+from ..utils.clients import clients
+from ..utils.metrics import metrics
+
+# builds:users is the rotation of users with queued builds, builds:queue:{user} the
+# builds a user queued, in order, and builds:running the releases holding a build slot,
+# scored by the time their lease runs out.
+USERS_KEY = 'builds:users'
+QUEUE_PREFIX = 'builds:queue:'
+RUNNING_KEY = 'builds:running'
+
+_ENQUEUE = """
+redis.call('RPUSH', KEYS[1], ARGV[1])
+if redis.call('LLEN', KEYS[1]) == 1 then
+    redis.call('RPUSH', KEYS[2], ARGV[2])
+end
+"""
+
+# back in front of the queue of the user, and of the rotation
+_REQUEUE = """
+redis.call('ZREM', KEYS[3], ARGV[3])
+redis.call('LPUSH', KEYS[1], ARGV[1])
+if redis.call('LLEN', KEYS[1]) == 1 then
+    redis.call('LPUSH', KEYS[2], ARGV[2])
+end
+"""
+
+# frees the slots of expired leases, then takes the first build of the next user
+# in the rotation while there are free slots
+_SCHEDULE = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+local jobs = {}
+while redis.call('ZCARD', KEYS[2]) < tonumber(ARGV[2]) do
+    local user = redis.call('LPOP', KEYS[1])
+    if not user then
+        break
+    end
+    local queue = ARGV[1] .. user
+    local job = redis.call('LPOP', queue)
+    if job then
+        if redis.call('LLEN', queue) > 0 then
+            redis.call('RPUSH', KEYS[1], user)
+        end
+        redis.call('ZADD', KEYS[2], now + tonumber(ARGV[3]), tostring(cjson.decode(job)['release_id']))
+        table.insert(jobs, job)
+    end
+end
+return jobs
+"""
+
+_RENEW = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+return redis.call('ZADD', KEYS[1], 'XX', 'CH', now + tonumber(ARGV[2]), ARGV[1])
+"""
+
+# the lease taken when a build starts, whether or not the one of its dispatch is left
+_CLAIM = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+return redis.call('ZADD', KEYS[1], now + tonumber(ARGV[2]), ARGV[1])
+"""
+
+
+@dataclass
+class BuildJob:
+    release_id: int
+    repo_id: int
+    user_id: str
+    git_tag: str
+    target_refish: Optional[str]
+    queued_at: float
+
+    def dumps(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def loads(cls, data: str) -> 'BuildJob':
+        return cls(**json.loads(data))
+
+
+class BuildQueue:
+    """
+    Release builds waiting for one of `max_concurrent` build slots shared by every worker.
+    Slots are handed out round-robin between the users with queued builds, so a burst
+    of releases from one user doesn't hold up the builds of the others.
+    A build holds its slot through a lease of `lease` seconds renewed while it runs,
+    the slot of a worker that died is freed when its lease runs out.
+    `start` schedules periodically, for those slots.
+    """
+
+    def __init__(self, max_concurrent: int, lease: float) -> None:
+        self.max_concurrent = max_concurrent
+        self.lease = lease
+        self._scripts: Dict[str, AsyncScript] = {}
+        self._scripts_client: Optional[object] = None
+        self._task: Optional[asyncio.Task[None]] = None
+        self._counts = {'queued': 0, 'running': 0}
+        metrics.gauge('builds.queued', lambda: self._counts['queued'])
+        metrics.gauge('builds.running', lambda: self._counts['running'])
+
+    def _script(self, source: str) -> AsyncScript:
+        redis = clients.redis()
+        if redis is not self._scripts_client:
+            self._scripts = {}
+            self._scripts_client = redis
+        if (script := self._scripts.get(source)) is None:
+            script = self._scripts[source] = redis.register_script(source)
+        return script
+
+    async def enqueue(self, job: BuildJob) -> None:
+        await self._script(_ENQUEUE)(keys=[QUEUE_PREFIX + job.user_id, USERS_KEY], args=[job.dumps(), job.user_id])
+        await BuildProgress(job.release_id).phase(BuildPhase.QUEUED)
+        metrics.inc('builds.queued_total')
+        await self.schedule()
+
+    async def schedule(self) -> List[BuildJob]:
+        """Starts the builds that got a slot."""
+        jobs = [
+            BuildJob.loads(job) for job in
+            await self._script(_SCHEDULE)(
+                keys=[USERS_KEY, RUNNING_KEY],
+                args=[QUEUE_PREFIX, self.max_concurrent, self.lease]
+            )
+        ]
+        for job in jobs:
+            try:
+                self._dispatch(job)
+            except Exception as e:
+                logging.error(f"Couldn't start the build of release {job.release_id}", exc_info=e)
+                await self._script(_REQUEUE)(
+                    keys=[QUEUE_PREFIX + job.user_id, USERS_KEY, RUNNING_KEY],
+                    args=[job.dumps(), job.user_id, job.release_id]
+                )
+        return jobs
+
+    def _dispatch(self, job: BuildJob) -> None:
+        from .tasks.release_tasks import create_releases  # avoids circular import
+        create_releases.delay(
+            job.release_id,
+            job.repo_id,
+            uuid.UUID(job.user_id),
+            git_tag=job.git_tag,
+            target_refish=job.target_refish,
+            queued_at=job.queued_at,
+        )
+
+    async def finish(self, release_id: int) -> None:
+        await clients.redis().zrem(RUNNING_KEY, release_id)
+        await self.schedule()
+
+    @contextlib.asynccontextmanager
+    async def running(self, release_id: int) -> AsyncIterator[None]:
+        """
+        Holds the slot of the build while in the context, renewing its lease, and frees it at the end.
+        The lease taken at dispatch runs out if the build waits longer than that for a worker,
+        so the slot is taken again on entry, for `schedule` to keep counting it.
+        """
+        await self._script(_CLAIM)(keys=[RUNNING_KEY], args=[release_id, self.lease])
+
+        async def renew() -> None:
+            while True:
+                await asyncio.sleep(self.lease / 3)
+                try:
+                    await self._script(_RENEW)(keys=[RUNNING_KEY], args=[release_id, self.lease])
+                except Exception as e:
+                    logging.warning(f"Couldn't renew the build lease of release {release_id}", exc_info=e)
+
+        renewer = asyncio.create_task(renew())
+        try:
+            yield
+        finally:
+            renewer.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await renewer
+            await self.finish(release_id)
+
+    async def _count(self) -> None:
+        redis = clients.redis()
+        users = await redis.lrange(USERS_KEY, 0, -1)
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.zcard(RUNNING_KEY)
+            for user in users:
+                pipe.llen(QUEUE_PREFIX + user)
+            running, *queued = await pipe.execute()
+        self._counts = {'queued': sum(queued), 'running': running}
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.schedule()
+                await self._count()
+            except Exception as e:
+                logging.warning("Couldn't schedule release builds", exc_info=e)
+            await asyncio.sleep(self.lease)
+
+    def start(self) -> None:
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+
+build_queue = BuildQueue(config.BUILD_MAX_CONCURRENT, config.BUILD_LEASE_SECONDS)
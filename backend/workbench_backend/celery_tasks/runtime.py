@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Coroutine, Optional, TypeVar
+
+from celery.signals import worker_process_init, worker_process_shutdown, worker_shutdown
+
+from ..db.session import async_engine
+from ..utils.clients import clients
+
+T = TypeVar('T')
+
+
+class WorkerRuntime:
+    """
+    One event loop per worker process, run by a background thread for as long as the
+    process lives, so the pooled database engine and the shared clients are kept
+    between tasks instead of being set up again by every task.
+    Started on first use, stopped by the worker shutdown signals. A forked child
+    starts its own, the loop of the parent doesn't run there.
+    """
+
+    def __init__(self) -> None:
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None and self._pid == os.getpid()
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                if self._pid is not None and self._pid != os.getpid():
+                    # connections inherited from the parent belong to it
+                    async_engine.sync_engine.dispose(close=False)
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name='worker-runtime', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+            return self._loop
+
+    def run(self, coro: Coroutine[Any, Any, T]) -> T:
+        future = asyncio.run_coroutine_threadsafe(coro, self.start())
+        try:
+            return future.result()
+        except BaseException:
+            # a time limit or a shutdown of the worker interrupted the wait
+            future.cancel()
+            raise
+
+    async def _close(self) -> None:
+        await clients.close()
+        await async_engine.dispose()
+
+    def stop(self) -> None:
+        with self._lock:
+            if not self.running:
+                return
+            assert self._loop and self._thread
+            loop, thread = self._loop, self._thread
+            try:
+                asyncio.run_coroutine_threadsafe(self._close(), loop).result()
+            except Exception as e:
+                logging.warning("Couldn't close the clients of the worker", exc_info=e)
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+            self._loop = self._thread = self._pid = None
+
+
+worker_runtime = WorkerRuntime()
+
+
+@worker_process_init.connect
+def _start_runtime(**kwargs: Any) -> None:
+    worker_runtime.start()
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def _stop_runtime(**kwargs: Any) -> None:
+    worker_runtime.stop()
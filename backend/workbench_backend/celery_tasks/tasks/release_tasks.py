@@ -1,11 +1,13 @@
+import datetime
 import hashlib
 import logging
-import tempfile
+import posixpath
+import time
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Optional
 
 import aiofiles
-from sqlalchemy import UUID
+from sqlalchemy import UUID, update
 
 from ...app.config import config
 from ...crud.schemas.repository import RepositoryCRUD
@@ -17,18 +19,80 @@ from ...crud.schemas.repository import RepositoryCRUD
 #    ServiceUpdateSchema,
 # )
 from ...crud.schemas.user import UserCRUD
-from ...db.models.app import App
-from ...db.models.service import Service
+from ...db.models.release import Release
 from ...db.standalone_session import standalone_session
-from ...docker.build_utils import RELEASE_DOCKERFILE, build_image
+from ...docker.build_progress import BuildPhase, BuildProgress
+from ...docker.build_utils import (
+    RELEASE_MANIFESTS,
+    build_image_from_git,
+    release_dockerfile,
+)
+from ...git import AsyncGitRepository
+from ...utils.metrics import metrics
 from ...workbench_config.model import AppConfig, WorkBenchConfig
+from ..build_queue import build_queue
 from ..celery_app import app
 from ..to_sync import syncify
 
 
-@app.task
+@app.task(queue='builds')
 @syncify
-async def create_releases(release_id: int, repo_id: int,user_id: UUID[str], git_tag: str, target_refish: Optional[str] = None) -> None:
+async def create_releases(
+    release_id: int,
+    repo_id: int,
+    user_id: UUID[str],
+    git_tag: str,
+    target_refish: Optional[str] = None,
+    queued_at: Optional[float] = None
+) -> None:
+    """Run by the build queue, holds a build slot until the image is ready or failed."""
+    async with build_queue.running(release_id):
+        started_at = time.time()
+        queue_wait = started_at - queued_at if queued_at is not None else 0.0
+        metrics.observe('builds.queue_wait', queue_wait)
+        await _record_build_times(
+            release_id,
+            build_queued_at=_timestamp(queued_at if queued_at is not None else started_at),
+            build_started_at=_timestamp(started_at),
+        )
+
+        progress = BuildProgress(release_id)
+        await progress.phase(BuildPhase.STARTED, queue_wait=f'{queue_wait:.3f}')
+        phase = BuildPhase.FAILED
+        try:
+            if await _create_releases(release_id, repo_id, user_id, git_tag, target_refish, progress):
+                phase = BuildPhase.READY
+        finally:
+            finished_at = time.time()
+            metrics.observe('builds.duration', finished_at - started_at)
+            metrics.inc(f'builds.{phase.value}')
+            try:
+                await progress.close()
+                await progress.phase(phase, duration=f'{finished_at - started_at:.3f}')
+                await _record_build_times(release_id, build_finished_at=_timestamp(finished_at))
+            except Exception as e:
+                logging.warning(f"Couldn't record the end of the build of release {release_id}", exc_info=e)
+
+
+def _timestamp(seconds: float) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc)
+
+
+async def _record_build_times(release_id: int, **times: Any) -> None:
+    async with standalone_session() as session:
+        await session.execute(update(Release).where(Release.id == release_id).values(**times))
+        await session.commit()
+
+
+async def _create_releases(
+    release_id: int,
+    repo_id: int,
+    user_id: UUID[str],
+    git_tag: str,
+    target_refish: Optional[str],
+    progress: BuildProgress
+) -> bool:
+    """Creates the apps and services of the release and builds its image, returns whether the image is ready."""
     #workaround for circular imports
     from ...crud.schemas.app import AppCreateSchema, AppCRUD, AppUpdateSchema
     from ...crud.schemas.service import (
@@ -48,67 +112,89 @@ async def create_releases(release_id: int, repo_id: int,user_id: UUID[str], git_
             await git_repo.create_tag(git_tag, ref=target_refish)
 
         user = await user_crud.read_by_id(user_id)
-        with tempfile.TemporaryDirectory() as tmpdir:
-            await git_repo.copy_tagged_version(git_tag, tmpdir)
-            async with aiofiles.open(Path(tmpdir) / 'workbench.yml','r') as f:
-                workbench_config = WorkBenchConfig.yaml_load(await f.read())
-
-            result: List[App | Service] = []
-            with app_crud.with_user(user) as ac, service_crud.with_user(user) as sc:
-                for name, app_config in workbench_config.apps.items():
-                    logo_path = await save_app_logo(app_config, tmpdir)
-                    result.append(await ac.create(AppCreateSchema(name=name, release_id=release_id, app_icon=logo_path, workbench_config_json=workbench_config.model_dump())))
-                for name, _ in workbench_config.services.items():
-                    result.append(await sc.create(ServiceCreateSchema(name=name, release_id=release_id, workbench_config_json=workbench_config.model_dump())))
-
-            try:
-                await build_image(
-                    tmpdir,
-                    f'release:{release_id}',
-                    extra_files={
-                        'Dockerfile':RELEASE_DOCKERFILE
-                    },
-                    stream_callback=lambda d: print(d)
+        await progress.phase(BuildPhase.CHECKOUT)
+        setup_start = time.perf_counter()
+        workbench_yml = await git_repo.get_tagged_file_content(git_tag, 'workbench.yml')
+        if workbench_yml is None:
+            raise FileNotFoundError(f'workbench.yml not found in {git_tag}')
+        workbench_config = WorkBenchConfig.yaml_load(workbench_yml)
+        # committed with the apps and services
+        await session.execute(
+            update(Release).where(Release.id == release_id).values(workbench_config_json=workbench_config.model_dump())
+        )
+
+        with app_crud.with_user(user) as ac, service_crud.with_user(user) as sc:
+            apps = await ac.create_many([
+                AppCreateSchema(
+                    name=name,
+                    release_id=release_id,
+                    app_icon=await save_app_logo(app_config, git_repo, git_tag),
+                    config_json=app_config.model_dump()
                 )
-                for obj in result:
-                    if isinstance(obj, App):
-                        await app_crud.update(obj, AppUpdateSchema(ready=True))
-                    else:
-                        await service_crud.update(obj, ServiceUpdateSchema(ready=True))
-            except Exception as e:
-                logging.error(f'Build error for release {release_id}', exc_info=e)
-
-
-async def save_app_logo(app_config: AppConfig, tmpdir: str) -> str | None:
+                for name, app_config in workbench_config.apps.items()
+            ])
+            services = await sc.create_many([
+                ServiceCreateSchema(name=name, release_id=release_id, config_json=service_config.model_dump())
+                for name, service_config in workbench_config.services.items()
+            ])
+        logging.info(
+            f'Release {release_id}: reading {git_tag} and creating its apps and services '
+            f'took {time.perf_counter() - setup_start:.2f}s'
+        )
+
+        manifests = [
+            file
+            for files, _ in RELEASE_MANIFESTS
+            for file in files
+            if await git_repo.refish_exists(f'{git_tag}:{file}')
+        ]
+        dockerfile = release_dockerfile(
+            workbench_config.setup.packages if workbench_config.setup else None,
+            manifests
+        )
+
+        try:
+            await progress.phase(BuildPhase.BUILDING)
+            build_start = time.perf_counter()
+            await build_image_from_git(
+                git_repo.root_path,
+                git_tag,
+                f'release:{release_id}',
+                dockerfile,
+                stream_callback=progress.log
+            )
+            logging.info(f'Release {release_id}: image ready in {time.perf_counter() - build_start:.2f}s')
+            await app_crud.update_many(apps, AppUpdateSchema(ready=True))
+            await service_crud.update_many(services, ServiceUpdateSchema(ready=True))
+        except Exception as e:
+            logging.error(f'Build error for release {release_id}', exc_info=e)
+            return False
+        return True
+
+
+async def save_app_logo(app_config: AppConfig, git_repo: AsyncGitRepository, git_tag: str) -> str | None:
     if (logo := app_config.app_icon) is None:
         return None
 
     if logo.startswith('http'):
         return logo
 
-    tmp_logo_path = Path(tmpdir) / logo
-
-    if not tmp_logo_path.exists():
+    content = await git_repo.get_tagged_file_bytes(git_tag, posixpath.normpath(logo))
+    if content is None:
         return None
 
     app_logo_root = Path(config.APPS_LOGO_ROOT)
     app_logo_root.mkdir(parents=True, exist_ok=True)
 
-    logo_hash = hashlib.sha256()
-    async with aiofiles.open(tmp_logo_path, 'rb') as src_file:
-        while (chunk := await src_file.read(4096)):
-            logo_hash.update(chunk)
-
-    extension = tmp_logo_path.suffix
+    logo_hash = hashlib.sha256(content)
+    extension = Path(logo).suffix
 
     destination = app_logo_root / f'{logo_hash.hexdigest()}{extension}'
 
     if destination.exists():
         return str(destination)
 
-    async with aiofiles.open(tmp_logo_path, 'rb') as src_file:
-        async with aiofiles.open(destination, 'wb') as dst_file:
-            while chunk := await src_file.read(4096):
-                await dst_file.write(chunk)
+    async with aiofiles.open(destination, 'wb') as dst_file:
+        await dst_file.write(content)
 
     return str(destination)
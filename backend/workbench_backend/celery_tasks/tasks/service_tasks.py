@@ -1,8 +1,7 @@
-import redis.asyncio as aioredis
-
 from ...app.config import config
 from ...crud.schemas.service import ServiceCRUD
 from ...db.standalone_session import standalone_session
+from ...utils.clients import clients
 from ..celery_app import app
 from ..to_sync import syncify
 
@@ -18,8 +17,7 @@ async def proxy_latest_service(service_name: str) -> None:
 
         path = f'/services/{latest_service.owner.username}/{latest_service.name}'
         latest_traefik_name = f"{latest_service.owner.username.replace('.','-')}{latest_service.name.replace('.','-')}-latest"
-        redis = aioredis.from_url(config.REDIS_BROKER_URL) # type: ignore
-        async with redis.pipeline() as pipe:
+        async with clients.redis().pipeline() as pipe:
             # Router to latest service by path
             await pipe.set(f"traefik/http/routers/{latest_traefik_name}/rule", f"Method(`GET`) && PathPrefix(`{path}`)")
             await pipe.set(f"traefik/http/routers/{latest_traefik_name}/service", f"{latest_service.traefik_name}@docker")
@@ -51,5 +49,3 @@ async def proxy_latest_service(service_name: str) -> None:
 
 
             await pipe.execute()
-        await redis.close()
-
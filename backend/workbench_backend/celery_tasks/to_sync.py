@@ -1,7 +1,8 @@
-import asyncio
 import functools
 from typing import Any, Callable, Coroutine, ParamSpec, TypeVar
 
+from .runtime import worker_runtime
+
 T = TypeVar('T')
 P = ParamSpec('P')
 
@@ -11,6 +12,8 @@ def syncify(func: Callable[P, Coroutine[Any, Any,T]]) -> Callable[P, T]:
     It shouldn't be user anywhere else in the app as there is already a
     running event loop, so it will throw an error
 
+    The coroutine runs on the event loop of the worker process, see `WorkerRuntime`.
+
     Args:
         func (Callable[P, Coroutine[Any, Any,T]])
 
@@ -19,5 +22,5 @@ def syncify(func: Callable[P, Coroutine[Any, Any,T]]) -> Callable[P, T]:
     """
     @functools.wraps(func)
     def new_function(*args: P.args, **kwargs: P.kwargs) -> T:
-        return asyncio.run(func(*args,**kwargs))
+        return worker_runtime.run(func(*args,**kwargs))
     return new_function
@@ -1,18 +1,16 @@
 import functools
 import logging
 from typing import (
-    Annotated,
     Any,
     Awaitable,
     Callable,
-    Dict,
     ParamSpec,
     Type,
     TypeVar,
 )
 
 import pydantic
-from fastapi import Depends, HTTPException, Request
+from fastapi import HTTPException
 from sqlalchemy.exc import IntegrityError
 
 from . import exceptions
@@ -25,13 +23,6 @@ def get_id_type(schema: Type[pydantic.BaseModel], id_field: str = 'id') -> Any:
         return int
 
 
-def dynamic_query_params(request: Request) -> Dict[str, Any]:
-    return dict(request.query_params)
-
-
-
-DynamicQueryParams = Annotated[Dict[str, Any], Depends(dynamic_query_params)]
-
 T = TypeVar('T')
 P = ParamSpec('P')
 def catch_errors(func: Callable[P, Awaitable[T]]) -> Callable[P, Awaitable[T]]:
@@ -5,6 +5,7 @@ from typing import (
     Dict,
     Generic,
     Iterator,
+    List,
     Optional,
     Self,
     Sequence,
@@ -17,19 +18,23 @@ from typing import (
 from fastapi.encoders import jsonable_encoder
 from overrides import override
 from pydantic import UUID4, BaseModel
-from sqlalchemy import Select, Table, and_, or_, select
+from sqlalchemy import Select, Table, and_, case, insert, literal, or_, select, tuple_, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession, async_scoped_session
+from sqlalchemy.orm import with_expression
 
 from ..db.models.base import Base
 from ..db.models.mixins import ReadWriteEnum
 from ..db.models.user import User
 from .exceptions import (
+    CRUDException,
     DBDuplicateElementException,
     DBNotFoundException,
     InvalidAccess,
     UserNotSetException,
 )
+from .load_plan import LoadPlan
+from .pagination import Cursor, Page, SortOrder
 
 ModelType = TypeVar('ModelType', bound=Base)
 ModelCreateArgs = TypeVar('ModelCreateArgs', bound=BaseModel)
@@ -85,6 +90,39 @@ class CRUD(ABC, Generic[ModelType, ModelCreateArgs,CreateSchemaType, UpdateSchem
             await self.session.rollback()
             raise e
 
+    async def create_many(self, args: Sequence[CreateSchemaType]) -> List[ModelType]:
+        """
+        Same as `create` for each of `args`, in one multi-row INSERT ... RETURNING and one commit.
+        The objects are returned in the order of `args`, `on_create` is called for each of them.
+        """
+        if not args:
+            return []
+        rows = [self.to_model_create_args(create_args).model_dump() for create_args in args]
+        try:
+            ids = (await self.session.scalars(
+                insert(self.model).returning(self.model.id, sort_by_parameter_order=True), rows
+            )).all()
+            await self.session.commit()
+            objs = await self._read_many(ids)
+            for obj, create_args in zip(objs, args):
+                await self.on_create(obj, create_args)
+            return objs
+        except IntegrityError as e:
+            await self.session.rollback()
+            conflict = DBDuplicateElementException.from_integrity_error(self.model.__name__, e)
+            if not conflict:
+                raise e
+            raise conflict from e
+        except Exception as e:
+            await self.session.rollback()
+            raise e
+
+    async def _read_many(self, ids: Sequence[Any]) -> List[ModelType]:
+        """The objects with `ids` in that order, reloaded like `refresh` would if already in the session."""
+        query = select(self.model).where(self.model.id.in_(ids)).execution_options(populate_existing=True)
+        by_id = {obj.id: obj for obj in (await self.session.execute(query)).scalars().all()}
+        return [by_id[id] for id in ids]
+
     async def read_by_id(self, id: Any) -> ModelType:
         query = self.query().where(self.model.id == id)
         result = (await self.session.execute(query)).scalars().first()
@@ -100,13 +138,38 @@ class CRUD(ABC, Generic[ModelType, ModelCreateArgs,CreateSchemaType, UpdateSchem
         stmt = stmt.offset(offset).limit(limit)
         return (await self.session.execute(stmt)).scalars().all()
 
-    async def read_by_fields(self, fields: Dict[str, Any], offset: int = 0, limit: int = 100) -> Sequence[ModelType]:
-        stmt = self.query().offset(offset).limit(limit)
-        for field, value in fields.items():
-            if hasattr(self.model, field):
-                python_type = getattr(self.model.__table__.c,field).type.python_type
-                stmt = stmt.where(getattr(self.model, field) == python_type(value))
-        return (await self.session.execute(stmt)).scalars().all()
+    async def read_page(
+        self,
+        filters: Dict[str, Any],
+        cursor: Optional[Cursor] = None,
+        limit: int = 100,
+        order: SortOrder = 'desc',
+        plan: Optional[LoadPlan] = None
+    ) -> Page[ModelType]:
+        """
+        Keyset pagination on (created_at, id), the rows of a page are found
+        through the index whatever the position of the page.
+        """
+        created_at, id = self.model.created_at, self.model.id # type: ignore
+        stmt = self.query(plan)
+        for field, value in filters.items():
+            if field not in self.model.__table__.c:
+                raise CRUDException(f'{self.model.__name__} cannot be filtered by {field}')
+            stmt = stmt.where(self.model.__table__.c[field] == value)
+        if cursor is not None:
+            position = tuple_(created_at, id)
+            after = tuple_(literal(cursor.created_at, created_at.type), literal(cursor.id, id.type))
+            stmt = stmt.where(position < after if order == 'desc' else position > after)
+        if order == 'desc':
+            stmt = stmt.order_by(created_at.desc(), id.desc())
+        else:
+            stmt = stmt.order_by(created_at.asc(), id.asc())
+        # one more row tells whether there is a next page
+        items = (await self.session.execute(stmt.limit(limit + 1))).scalars().all()
+        if len(items) <= limit:
+            return Page(items)
+        last = items[limit - 1]
+        return Page(items[:limit], Cursor(last.created_at, last.id)) # type: ignore
 
     async def read_multiple(self, offset: int = 0, limit: int = 100) -> Sequence[ModelType]:
         query = self.query().offset(offset).limit(limit)
@@ -133,6 +196,38 @@ class CRUD(ABC, Generic[ModelType, ModelCreateArgs,CreateSchemaType, UpdateSchem
             await self.session.rollback()
             raise e
 
+    async def update_many(self, objs: Sequence[ModelType], args: UpdateSchemaType) -> List[ModelType]:
+        """
+        Same as `update` with `args` for each of `objs`, in one UPDATE ... WHERE id IN and one commit.
+        `on_update` is called for each of them.
+        """
+        if not objs:
+            return []
+        update_data = jsonable_encoder(args, exclude_unset=True)
+        values = {
+            field: getattr(args, field)
+            for field in self.model.__table__.columns.keys()
+            if field in update_data
+        }
+        ids = [obj.id for obj in objs]
+        try:
+            if values:
+                await self.session.execute(update(self.model).where(self.model.id.in_(ids)).values(**values))
+            await self.session.commit()
+            objs = await self._read_many(ids)
+            for obj in objs:
+                await self.on_update(obj, args)
+            return objs
+        except IntegrityError as e:
+            await self.session.rollback()
+            conflict = DBDuplicateElementException.from_integrity_error(self.model.__name__, e)
+            if not conflict:
+                raise e
+            raise conflict from e
+        except Exception as e:
+            await self.session.rollback()
+            raise e
+
     async def delete(self, obj: ModelType) -> None:
         try:
             await self.session.delete(obj)
@@ -142,8 +237,10 @@ class CRUD(ABC, Generic[ModelType, ModelCreateArgs,CreateSchemaType, UpdateSchem
             await self.session.rollback()
             raise e
 
-    def query(self) -> Select[Tuple[ModelType]]:
-        return select(self.model)
+    def query(self, plan: Optional[LoadPlan] = None) -> Select[Tuple[ModelType]]:
+        """With a `plan` the query loads only what the plan names, instead of the model defaults."""
+        stmt = select(self.model)
+        return stmt.options(*plan.options(self.model)) if plan else stmt
 
     async def on_create(self, obj: ModelType, create_args: CreateSchemaType) -> None:
         pass
@@ -176,13 +273,13 @@ class UserOwnedCrud(CRUD[ModelType, UserOwnedModelCreateArgs,CreateSchemaType, U
         self.model_create_args_type = model_create_args_type
 
     @override
-    def query(self) -> Select[Tuple[ModelType]]:
+    def query(self, plan: Optional[LoadPlan] = None) -> Select[Tuple[ModelType]]:
         if self.is_admin:
-            return super().query()
+            return super().query(plan)
         if self.user is None:
             raise UserNotSetException('User is not set for this query')
 
-        return super().query().where(self.model.owner_id == self.user.id) # type: ignore
+        return super().query(plan).where(self.model.owner_id == self.user.id) # type: ignore
 
     @contextmanager
     def with_user(self,user: User) -> Iterator[Self]:
@@ -204,37 +301,55 @@ class UserOwnedCrud(CRUD[ModelType, UserOwnedModelCreateArgs,CreateSchemaType, U
 class UserSharedCrud(UserOwnedCrud[ModelType, UserOwnedModelCreateArgs, CreateSchemaType, UpdateSchemaType]):
 
     @override
-    def query(self) -> Select[Tuple[ModelType]]:
+    def query(self, plan: Optional[LoadPlan] = None) -> Select[Tuple[ModelType]]:
+        """The access of the user to each row is loaded into `access`, owners can always write."""
+        link_table: Table = self.model.link_table() # type: ignore
+        write = literal(ReadWriteEnum.WRITE, link_table.c.rw.type)
+        # shared objects are not owned, so this skips the owner filter of UserOwnedCrud
+        stmt = CRUD.query(self, plan)
         if self.is_admin:
-            return super().query()
+            return stmt.options(with_expression(self.model.access, write)) # type: ignore
 
         if self.user is None:
             raise UserNotSetException('User is not set for this query')
-        link_table = self.model.link_table() # type: ignore
-        return select(self.model).join(link_table, isouter=True).where(
+        link_id = link_table.c.get(f'{self.model.__tablename__}_id')
+        owned = self.model.owner_id == self.user.id # type: ignore
+        # correlated instead of joined, so a refresh of the object computes it the same way
+        shared_rw = select(link_table.c.rw).where(
+            and_(
+                link_id == self.model.id, # type: ignore
+                link_table.c.user_id == self.user.id
+            )
+        ).scalar_subquery()
+        return stmt.where(
             or_(
-                link_table.c.user_id == self.user.id,
-                self.model.owner_id == self.user.id # type: ignore
+                owned,
+                self.model.id.in_(select(link_id).where(link_table.c.user_id == self.user.id)) # type: ignore
             )
+        ).options(
+            with_expression(self.model.access, case((owned, write), else_=shared_rw)) # type: ignore
         )
 
-    async def share(self, obj: ModelType, to_user: User, rw: ReadWriteEnum = ReadWriteEnum.READ) -> ModelType:
+    async def share(self, obj: ModelType, user_id: UUID4, rw: ReadWriteEnum = ReadWriteEnum.READ) -> None:
         link_table: Table = self.model.link_table() # type: ignore
         model_table_name = self.model.__tablename__
-        await self.session.refresh(obj, attribute_names=['id'])
-        await self.session.refresh(to_user, attribute_names=['id'])
         stmt = link_table.insert().values(
             **{
                 f'{model_table_name}_id':obj.id,
-                'user_id':to_user.id,
+                'user_id':user_id,
                 'rw':rw
             }
         )
-        await self.session.execute(stmt)
-        await self.session.refresh(obj)
-        await self.session.refresh(to_user)
-        await self.session.commit()
-        return obj
+        try:
+            await self.session.execute(stmt)
+            await self.session.commit()
+        except IntegrityError as e:
+            await self.session.rollback()
+            conflict = DBDuplicateElementException.from_integrity_error(f'{self.model.__name__} share', e)
+            if conflict:
+                raise conflict from e
+            # the only other constraint is the foreign key of the user
+            raise DBNotFoundException(User.__name__, user_id) from e
 
     async def share_info(self, obj: ModelType) -> Dict[UUID4, ReadWriteEnum]:
         link_table: Table = self.model.link_table() # type: ignore
@@ -245,17 +360,19 @@ class UserSharedCrud(UserOwnedCrud[ModelType, UserOwnedModelCreateArgs, CreateSc
         result = await self.session.execute(stmt)
         return {row.user_id: row.rw for row in result.fetchall()}
 
-    async def delete_share(self, obj: ModelType, to_user: User) -> None:
+    async def delete_share(self, obj: ModelType, user_id: UUID4) -> None:
         link_table: Table = self.model.link_table() # type: ignore
         model_table_name = self.model.__tablename__
         stmt = link_table.delete().where(
             and_(
                 link_table.c.get(f'{model_table_name}_id') == obj.id,
-                link_table.c.user_id == to_user.id
+                link_table.c.user_id == user_id
             )
         )
-        await self.session.execute(stmt)
+        result = await self.session.execute(stmt)
         await self.session.commit()
+        if result.rowcount == 0: # type: ignore
+            raise DBNotFoundException(f'{self.model.__name__} share', user_id)
 
     async def update(self, obj: ModelType, args: UpdateSchemaType) -> ModelType:
         if self.is_admin:
@@ -269,6 +386,18 @@ class UserSharedCrud(UserOwnedCrud[ModelType, UserOwnedModelCreateArgs, CreateSc
 
         return await super().update(obj, args)
 
+    async def update_many(self, objs: Sequence[ModelType], args: UpdateSchemaType) -> List[ModelType]:
+        if self.is_admin:
+            return await super().update_many(objs, args)
+        if self.user is None:
+            raise UserNotSetException('User is not set for this query')
+
+        for obj in objs:
+            if await self.get_rw_access(obj) != ReadWriteEnum.WRITE:
+                raise InvalidAccess(f'No WRITE access for the given {self.model.__name__} ')
+
+        return await super().update_many(objs, args)
+
     async def delete(self, obj: ModelType) -> None:
         if self.is_admin:
             return await super().delete(obj)
@@ -291,6 +420,10 @@ class UserSharedCrud(UserOwnedCrud[ModelType, UserOwnedModelCreateArgs, CreateSc
         if obj.owner_id == self.user.id: # type: ignore
             return ReadWriteEnum.WRITE
 
+        # loaded with the object by `query`
+        if obj.access is not None: # type: ignore
+            return obj.access # type: ignore
+
         link_table: Table = self.model.link_table() # type: ignore
         model_table_name = self.model.__tablename__
         stmt = select(link_table.c.rw).where(
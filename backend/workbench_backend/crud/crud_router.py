@@ -1,3 +1,4 @@
+import inspect
 from enum import Enum
 from typing import (
     Annotated,
@@ -6,11 +7,13 @@ from typing import (
     Awaitable,
     Callable,
     Dict,
+    FrozenSet,
     Generic,
     List,
     Literal,
     Optional,
     Sequence,
+    Tuple,
     Type,
     TypeAlias,
     TypeVar,
@@ -18,23 +21,24 @@ from typing import (
     cast,
 )
 
-from fastapi import APIRouter, HTTPException, Response
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.dependencies.utils import get_flat_dependant
 from fastapi.params import Depends
+from fastapi.routing import APIRoute
 from fastapi.types import DecoratedCallable
-from pydantic import UUID4, BaseModel
+from pydantic import UUID4, BaseModel, TypeAdapter
 
 from ..db.models.base import Base
 from ..db.models.mixins import ReadWriteEnum
-from ..db.models.user import User
-from ..dependencies.crud import get_user_crud as default_get_user_crud
 from ..utils.annotation import take_annotation_from
 from ._utils import (
-    DynamicQueryParams,
     catch_errors,
     get_id_type,
 )
 from .base import CRUD, UserOwnedModelCreateArgs, UserSharedCrud
-from .schemas.user import UserCreateSchema, UserUpdateSchema
+from .exceptions import InvalidAccess
+from .load_plan import LoadPlan
+from .pagination import Cursor, SortOrder
 
 ModelType = TypeVar("ModelType", bound=Base)
 ModelCreateArgs = TypeVar("ModelCreateArgs", bound=BaseModel)
@@ -49,6 +53,17 @@ CRUD_FACTORY: TypeAlias = Callable[
 CRUD_METHODS: TypeAlias = Literal["GET_ALL", "GET_ONE", "CREATE", "UPDATE", "DELETE"]
 
 
+# id of a route -> the route and the query parameters declared by it and its dependencies
+_route_query_params: Dict[int, Tuple[APIRoute, FrozenSet[str]]] = {}
+
+
+def _declared_query_params(route: APIRoute) -> FrozenSet[str]:
+    if (cached := _route_query_params.get(id(route))) is None:
+        params = frozenset(param.alias for param in get_flat_dependant(route.dependant).query_params)
+        cached = _route_query_params[id(route)] = (route, params)
+    return cached[1]
+
+
 class CRUDRouter(
     Generic[ModelType, ResponseSchemaType, CreateSchemaType, UpdateSchemaType],
     APIRouter,
@@ -68,6 +83,7 @@ class CRUDRouter(
         disable_methods: Optional[List[CRUD_METHODS]] = None,
         responses: Optional[Dict[Union[int, str], Dict[str, Any]]] = None,
         subrouters: Optional[List[APIRouter]] = None,
+        filters: Optional[Dict[str, Any]] = None,
         **kwargs: Any,
     ) -> None:
         super().__init__(
@@ -86,6 +102,9 @@ class CRUDRouter(
         self.get_crud = get_crud
 
         self._response_schema = response_schema
+        self._list_adapter = TypeAdapter(List[response_schema])  # type: ignore
+        # query parameter -> type of the indexed columns the list can be filtered by
+        self._filters = filters or {}
         self._id_type = get_id_type(response_schema)
         self._create_schema = create_schema
         self._update_schema = update_schema
@@ -146,25 +165,64 @@ class CRUDRouter(
                 responses={404: {"description": "Element not found"}},
             )
 
+    def _filter_params(self) -> Callable[..., Dict[str, Any]]:
+        def dep(request: Request, **filters: Any) -> Dict[str, Any]:
+            # an undeclared parameter is most likely a filter this list does not
+            # support (anymore), ignoring it would return unfiltered rows
+            unknown = set(request.query_params) - _declared_query_params(request.scope['route'])
+            if unknown:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Unknown query parameters: {', '.join(sorted(unknown))}"
+                )
+            return {field: value for field, value in filters.items() if value is not None}
+
+        # declared filters become typed query parameters
+        dep.__signature__ = inspect.Signature([  # type: ignore
+            inspect.Parameter('request', inspect.Parameter.POSITIONAL_OR_KEYWORD, annotation=Request),
+            *(
+                inspect.Parameter(field, inspect.Parameter.KEYWORD_ONLY, default=None, annotation=Optional[type_])
+                for field, type_ in self._filters.items()
+            )
+        ])
+        return dep
+
     def _get_all(self) -> Callable[..., Any]:
         @catch_errors
         async def route(
+            request: Request,
             crud: Annotated[
                 CRUD[ModelType, ModelCreateArgs, CreateSchemaType, UpdateSchemaType],
                 Depends(self.get_crud),
             ],
-            params: DynamicQueryParams,
-            offset: int = 0,
-            limit: int = 100,
-        ) -> Sequence[ModelType]:
-            params.pop("offset", None)
-            params.pop("limit", None)
-            if params:
-                return await crud.read_by_fields(params, offset, limit)
-            return await crud.read_multiple(offset, limit)
+            filters: Annotated[Dict[str, Any], Depends(self._filter_params())],
+            cursor: Optional[str] = None,
+            limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+            order: SortOrder = "desc",
+        ) -> Response:
+            page = await crud.read_page(
+                filters,
+                Cursor.decode(cursor) if cursor else None,
+                limit,
+                order,
+                LoadPlan.for_schema(crud.model, self._response_schema)
+            )
+            response = self._list_response(page.items)
+            if page.next_cursor:
+                next_cursor = page.next_cursor.encode()
+                response.headers["X-Next-Cursor"] = next_cursor
+                next_url = request.url.include_query_params(cursor=next_cursor)
+                response.headers["Link"] = f'<{next_url}>; rel="next"'
+            return response
 
         return route
 
+    def _list_response(self, objs: Sequence[ModelType]) -> Response:
+        # Serialized by pydantic-core straight to JSON, instead of FastAPI dumping
+        # the validated list to Python objects and then through json.dumps
+        items = self._list_adapter.validate_python(objs, from_attributes=True)
+        return Response(self._list_adapter.dump_json(items), media_type="application/json")
+
     def _get_one(self) -> Callable[..., Any]:
         @catch_errors
         async def route(
@@ -311,12 +369,10 @@ class UserSharedCRUDRouter(
                 None,
             ],
         ],
-        get_user_crud: Callable[
-            ..., Awaitable[CRUD[User, UserCreateSchema, UserCreateSchema, UserUpdateSchema]]
-        ] = default_get_user_crud,
         responses: Dict[int | str, Dict[str, Any]] | None = None,
         disable_methods: Optional[List[USER_SHARED_CRUD_METHODS]] = None,
         subrouters: Optional[List[APIRouter]] = None,
+        filters: Optional[Dict[str, Any]] = None,
         **kwargs: Any,
     ) -> None:
         super().__init__(
@@ -330,11 +386,11 @@ class UserSharedCRUDRouter(
             responses=responses,
             disable_methods=cast(List[CRUD_METHODS], disable_methods),
             subrouters=subrouters,
+            filters=filters,
             **kwargs,
         )
         if not disable_methods:
             disable_methods = []
-        self.get_user_crud = get_user_crud
         if "SHARE" not in disable_methods:
             self.add_api_route(
                 "/{id}/share",
@@ -374,18 +430,13 @@ class UserSharedCRUDRouter(
                 ],
                 Depends(self.get_crud),
             ],
-            user_crud: Annotated[
-                CRUD[User, UserCreateSchema, UserCreateSchema, UserUpdateSchema],
-                Depends(self.get_user_crud),
-            ],
             id: self._id_type,  # type: ignore
             data: ShareData
         ) -> Response:
             obj = await crud.read_by_id(id)
             if obj.owner_id == data.user_id: # type: ignore
                 raise HTTPException(400, detail="Object is owned by the given user")
-            to_user = await user_crud.read_by_id(data.user_id)
-            await crud.share(obj, to_user, data.rw)
+            await crud.share(obj, data.user_id, data.rw)
             return Response(status_code=204)
 
         return route
@@ -421,16 +472,11 @@ class UserSharedCRUDRouter(
                 ],
                 Depends(self.get_crud),
             ],
-            user_crud: Annotated[
-                CRUD[User, UserCreateSchema, UserCreateSchema, UserUpdateSchema],
-                Depends(self.get_user_crud),
-            ],
             id: self._id_type,  # type: ignore
             user_id: UUID4
         ) -> Response:
             obj = await crud.read_by_id(id)
-            to_user = await user_crud.read_by_id(user_id)
-            await crud.delete_share(obj, to_user)
+            await crud.delete_share(obj, user_id)
             return Response(status_code=204)
 
         return route
@@ -449,7 +495,7 @@ class UserSharedCRUDRouter(
             ],
             obj: Annotated[ModelType, Depends(super().create_read_by_id_dependency())],
         ) -> ModelType:
-            from .exceptions import InvalidAccess
+            # the access is loaded with the object, this needs no query
             access = await crud.get_rw_access(obj)
             if access is None or access.value < rw.value:
                 raise InvalidAccess(f'NO {rw.value} access for the given object')
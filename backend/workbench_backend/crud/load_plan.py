@@ -0,0 +1,85 @@
+import functools
+import types
+import typing
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Self, Type
+
+from pydantic import BaseModel
+from sqlalchemy import inspect, null
+from sqlalchemy.orm import (
+    joinedload,
+    load_only,
+    raiseload,
+    selectinload,
+    with_expression,
+)
+from sqlalchemy.orm.interfaces import ORMOption
+from sqlalchemy.orm.strategy_options import _AbstractLoad
+
+from ..db.models.base import Base
+
+
+def _schema_type(annotation: Any) -> Optional[Type[BaseModel]]:
+    """The response schema inside `Optional[...]`, `List[...]` and similar annotations."""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    if typing.get_origin(annotation) in (typing.Union, types.UnionType, list, List):
+        for arg in typing.get_args(annotation):
+            if (schema := _schema_type(arg)) is not None:
+                return schema
+    return None
+
+
+@dataclass(frozen=True)
+class LoadPlan:
+    """
+    What a query loads: the relationships, each with its own plan, and the
+    columns, `None` meaning all of them. Any other relationship raises when
+    it would need a query. Query expressions are set by the query of the
+    model itself, on related objects they are NULL.
+    """
+    relationships: Dict[str, 'LoadPlan'] = field(default_factory=dict)
+    columns: Optional[FrozenSet[str]] = None
+    expressions: FrozenSet[str] = frozenset()
+
+    @classmethod
+    @functools.cache
+    def for_schema(cls, model: Type[Base], schema: Type[BaseModel]) -> Self:
+        """
+        Loads what `schema` reads from `model`. If the schema reads anything that
+        is not a column or relationship, like a property, all columns are loaded.
+        """
+        mapper = inspect(model)
+        relationships: Dict[str, LoadPlan] = {}
+        columns = set()
+        expressions = set()
+        only_columns = True
+        for name, info in schema.model_fields.items():
+            if name in mapper.relationships:
+                target = mapper.relationships[name].mapper.class_
+                nested = _schema_type(info.annotation)
+                relationships[name] = cls.for_schema(target, nested) if nested else cls()
+            elif name in mapper.column_attrs:
+                if mapper.column_attrs[name].strategy_key == (('query_expression', True),):
+                    expressions.add(name)
+                else:
+                    columns.add(name)
+            else:
+                only_columns = False
+        return cls(relationships, frozenset(columns) if only_columns else None, frozenset(expressions))
+
+    def options(self, model: Type[Base]) -> List[ORMOption]:
+        mapper = inspect(model)
+        options: List[ORMOption] = []
+        if self.columns is not None:
+            options.append(load_only(*(getattr(model, column) for column in self.columns)))
+        for name, plan in self.relationships.items():
+            relationship = mapper.relationships[name]
+            attribute = getattr(model, name)
+            # a many-to-one is joined into the same row, collections are loaded with one IN query
+            loader: _AbstractLoad = selectinload(attribute) if relationship.uselist else joinedload(attribute)
+            target = relationship.mapper.class_
+            expressions = (with_expression(getattr(target, name), null()) for name in plan.expressions)
+            options.append(loader.options(*plan.options(target), *expressions))
+        options.append(raiseload('*', sql_only=True))
+        return options
@@ -0,0 +1,44 @@
+import base64
+import binascii
+import datetime
+from dataclasses import dataclass
+from typing import Any, Generic, Literal, Optional, Self, Sequence, TypeAlias, TypeVar
+
+import orjson
+
+from ..db.models.base import Base
+from .exceptions import CRUDException
+
+ModelType = TypeVar('ModelType', bound=Base)
+
+SortOrder: TypeAlias = Literal['asc', 'desc']
+
+
+class InvalidCursor(CRUDException):
+    pass
+
+
+@dataclass(frozen=True)
+class Cursor:
+    """Position after the last row of a page, lists are ordered by (created_at, id)."""
+    created_at: datetime.datetime
+    id: Any
+
+    def encode(self) -> str:
+        raw = orjson.dumps([self.created_at.isoformat(), self.id])
+        return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+    @classmethod
+    def decode(cls, value: str) -> Self:
+        try:
+            raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+            created_at, id = orjson.loads(raw)
+            return cls(datetime.datetime.fromisoformat(created_at), id)
+        except (binascii.Error, orjson.JSONDecodeError, TypeError, ValueError) as e:
+            raise InvalidCursor(f'Invalid cursor: {value}') from e
+
+
+@dataclass
+class Page(Generic[ModelType]):
+    items: Sequence[ModelType]
+    next_cursor: Optional[Cursor] = None
@@ -7,11 +7,11 @@ from sqlalchemy.ext.asyncio import AsyncSession, async_scoped_session
 from ...db.models.app import App
 from ...workbench_config.model import AppConfig
 from ..base import UserOwnedModelCreateBase, UserSharedCrud
-from .mixins import CreatedAtSchemaMixin, LatestCRUDMixin, UserOwnedSchemaMixin
+from .mixins import CreatedAtSchemaMixin, LatestCRUDMixin, UserOwnedSchemaMixin, UserSharedSchemaMixin
 from .release import ReleaseResponseSchema
 
 
-class AppResponseSchema(BaseModel, CreatedAtSchemaMixin, UserOwnedSchemaMixin):
+class AppResponseSchema(BaseModel, CreatedAtSchemaMixin, UserOwnedSchemaMixin, UserSharedSchemaMixin):
     id: int
     name: str
     ready: bool
@@ -24,7 +24,7 @@ class AppResponseSchema(BaseModel, CreatedAtSchemaMixin, UserOwnedSchemaMixin):
 class AppCreateSchema(BaseModel):
     name: str
     release_id: int
-    workbench_config_json: Dict[str, Any]
+    config_json: Dict[str, Any]
     app_icon: Optional[str] = None
 
 
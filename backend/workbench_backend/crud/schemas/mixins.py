@@ -7,6 +7,8 @@ from sqlalchemy import Select
 from sqlalchemy.ext.asyncio import AsyncSession, async_scoped_session
 
 from ...db.models.base import Base
+from ...db.models.mixins import ReadWriteEnum
+from ..load_plan import LoadPlan
 from .user import UserResponseSchema
 
 
@@ -19,6 +21,11 @@ class UserOwnedSchemaMixin():
     owner: UserResponseSchema
 
 
+class UserSharedSchemaMixin():
+    # only set on the objects that were queried, not on related ones
+    access: Optional[ReadWriteEnum] = None
+
+
 
 
 ModelType = TypeVar('ModelType', bound=Base)
@@ -35,5 +42,5 @@ class LatestCRUDMixin(ABC, Generic[ModelType]):
         return (await self.session.execute(query)).scalars().first()
 
     @abstractmethod
-    def query(self) -> Select[Tuple[ModelType]]:
+    def query(self, plan: Optional[LoadPlan] = None) -> Select[Tuple[ModelType]]:
         pass
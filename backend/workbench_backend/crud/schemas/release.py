@@ -1,3 +1,5 @@
+import datetime
+import time
 from contextlib import contextmanager
 from typing import Iterator, Optional, Self, Type
 
@@ -5,20 +7,23 @@ from overrides import override
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession, async_scoped_session
 
-from ...celery_tasks.tasks.release_tasks import create_releases
+from ...celery_tasks.build_queue import BuildJob, build_queue
 from ...db.models.release import Release
 from ...db.models.user import User
 from ..base import UserOwnedModelCreateBase, UserSharedCrud
 from ..exceptions import CRUDException
-from .mixins import CreatedAtSchemaMixin, UserOwnedSchemaMixin
+from .mixins import CreatedAtSchemaMixin, UserOwnedSchemaMixin, UserSharedSchemaMixin
 from .repository import RepositoryCRUD
 
 
-class ReleaseResponseSchema(BaseModel, CreatedAtSchemaMixin, UserOwnedSchemaMixin):
+class ReleaseResponseSchema(BaseModel, CreatedAtSchemaMixin, UserOwnedSchemaMixin, UserSharedSchemaMixin):
     id: int
     git_tag: str
     repo_id: int
     name: str
+    build_queued_at: Optional[datetime.datetime] = None
+    build_started_at: Optional[datetime.datetime] = None
+    build_finished_at: Optional[datetime.datetime] = None
 
 class ReleaseUpdateSchema(BaseModel):
     name: str
@@ -67,7 +72,14 @@ class ReleaseCRUD(UserSharedCrud[Release, ReleaseModelCreateSchema, ReleaseCreat
                 target_exists = await git_repo.refish_exists(create_args.target_refish)
                 if not target_exists:
                     raise CRUDException(f'Target {create_args.target_refish} do not exists')
-        create_releases.delay(obj.id, obj.repo_id, obj.owner_id,git_tag=create_args.git_tag, target_refish=create_args.target_refish)
+        await build_queue.enqueue(BuildJob(
+            release_id=obj.id,
+            repo_id=obj.repo_id,
+            user_id=str(obj.owner_id),
+            git_tag=create_args.git_tag,
+            target_refish=create_args.target_refish,
+            queued_at=time.time(),
+        ))
         return await super().on_create(obj, create_args)
 
 
@@ -9,10 +9,10 @@ from ...db.models.repository import Repository
 from ...git import AsyncGitRepository
 from ...templates.repository import TEMPLATE_TYPES
 from ..base import UserOwnedModelCreateBase, UserSharedCrud
-from .mixins import CreatedAtSchemaMixin, UserOwnedSchemaMixin
+from .mixins import CreatedAtSchemaMixin, UserOwnedSchemaMixin, UserSharedSchemaMixin
 
 
-class RepositoryResponseSchema(BaseModel, CreatedAtSchemaMixin, UserOwnedSchemaMixin):
+class RepositoryResponseSchema(BaseModel, CreatedAtSchemaMixin, UserOwnedSchemaMixin, UserSharedSchemaMixin):
     id: int
     name: str
     ready: bool
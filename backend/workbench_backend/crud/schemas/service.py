@@ -9,11 +9,11 @@ from sqlalchemy.ext.asyncio import AsyncSession, async_scoped_session
 from ...db.models.service import Service, ServiceStatusEnum
 from ...workbench_config.model import ServiceConfig
 from ..base import UserOwnedModelCreateBase, UserSharedCrud
-from .mixins import CreatedAtSchemaMixin, LatestCRUDMixin, UserOwnedSchemaMixin
+from .mixins import CreatedAtSchemaMixin, LatestCRUDMixin, UserOwnedSchemaMixin, UserSharedSchemaMixin
 from .release import ReleaseResponseSchema
 
 
-class ServiceResponseSchema(BaseModel, CreatedAtSchemaMixin, UserOwnedSchemaMixin):
+class ServiceResponseSchema(BaseModel, CreatedAtSchemaMixin, UserOwnedSchemaMixin, UserSharedSchemaMixin):
     id: int
     name: str
     ready: bool
@@ -30,7 +30,7 @@ class ServiceResponseSchema(BaseModel, CreatedAtSchemaMixin, UserOwnedSchemaMixi
 class ServiceCreateSchema(BaseModel):
     name: str
     release_id: int
-    workbench_config_json: Dict[str, Any]
+    config_json: Dict[str, Any]
 
 
 class ServiceModelCreateSchema(ServiceCreateSchema, UserOwnedModelCreateBase):
@@ -61,7 +61,8 @@ class ServiceCRUD(UserSharedCrud[Service, ServiceModelCreateSchema, ServiceCreat
                 )
             )
             .order_by(
-                self.model.created_at.desc())
+                self.model.created_at.desc(),
+                self.model.id.desc())
         )
         return (await self.session.execute(query)).scalars().first()
 
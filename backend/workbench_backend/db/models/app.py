@@ -20,11 +20,11 @@ class App(
 ):
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
 
-    name: Mapped[str] = mapped_column(String)
+    name: Mapped[str] = mapped_column(String, index=True)
 
     ready: Mapped[bool] = mapped_column(default=False)
 
-    release_id: Mapped[int] = mapped_column(ForeignKey('release.id'))
+    release_id: Mapped[int] = mapped_column(ForeignKey('release.id'), index=True)
     release: Mapped['Release'] = relationship(back_populates='apps', lazy='joined', join_depth=2)
 
     app_icon: Mapped[Optional[str]] = mapped_column(String, nullable=True)
@@ -32,7 +32,7 @@ class App(
 
     @property
     def app_config(self) -> AppConfig:
-        return self.workbench_config.apps[self.name]
+        return AppConfig.model_validate(self.config_json)
 
     @property
     def traefik_name(self) -> str:
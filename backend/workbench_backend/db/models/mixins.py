@@ -1,19 +1,33 @@
 import datetime
 import enum
-from typing import Any, Dict, List, Tuple, Type
-
-from sqlalchemy import JSON, UUID, Column, DateTime, Enum, ForeignKey, Table
-from sqlalchemy.orm import Mapped, declared_attr, mapped_column, relationship
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Type
+
+from sqlalchemy import JSON, UUID, Column, DateTime, Enum, ForeignKey, Index, Table
+from sqlalchemy.orm import (
+    Mapped,
+    declared_attr,
+    mapped_column,
+    query_expression,
+    relationship,
+)
 from sqlalchemy.sql import func
 
 from ...workbench_config.model import WorkBenchConfig
 from .base import Base
 from .user import User
 
+if TYPE_CHECKING:
+    from .release import Release
+
 
 class CreatedAtMixin():
     created_at: Mapped[datetime.datetime] = mapped_column(DateTime(True), server_default=func.now())
 
+    # lists are paginated on (created_at, id)
+    @declared_attr.directive
+    def __table_args__(cls) -> Tuple[Any, ...]:
+        return (Index(f'ix_{cls.__tablename__}_created_at_id', 'created_at', 'id'),) # type: ignore
+
 
 class _UserOwnedMeta(type):
     def __getitem__(cls, args: Tuple[str,str]) -> Type[Any]:
@@ -25,7 +39,8 @@ class _UserOwnedMeta(type):
             def owner(self) -> Mapped[User]:
                 return relationship(back_populates=back_populates, lazy='selectin')
 
-        setattr(User, back_populates, relationship(table, back_populates='owner', lazy='selectin'))
+        # loading a user must not load everything the user owns
+        setattr(User, back_populates, relationship(table, back_populates='owner'))
         return Mixin
 
 class UserOwnedMixin(object, metaclass=_UserOwnedMeta):
@@ -52,16 +67,22 @@ class _UserSharedMeta(type):
         class Mixin:
             @declared_attr
             def shared_with(self) -> Mapped[List[User]]:
-                return relationship(back_populates=back_populates, secondary=link_table, lazy='selectin')
+                return relationship(back_populates=back_populates, secondary=link_table)
+
+            # access of the querying user, computed by UserSharedCrud.query in the same SELECT
+            @declared_attr
+            def access(self) -> Mapped[Optional[ReadWriteEnum]]:
+                return query_expression()
 
             @classmethod
             def link_table(cls) -> Table:
                 return link_table
-        setattr(User, back_populates, relationship(table,back_populates='shared_with', secondary=link_table, lazy='selectin'))
+        setattr(User, back_populates, relationship(table,back_populates='shared_with', secondary=link_table))
         return Mixin
 
 class UserSharedMixin(object, metaclass=_UserSharedMeta):
     shared_with: List[User]
+    access: Optional[ReadWriteEnum]
 
     def link_table() -> Table: # type: ignore
         ...
@@ -69,8 +90,14 @@ class UserSharedMixin(object, metaclass=_UserSharedMeta):
 
 
 class WithWorkbenchConfig():
-    workbench_config_json: Mapped[Dict[str, Any]] = mapped_column(JSON)
+    """
+    Apps and services store their own entry of the workbench config in `config_json`,
+    the whole config is stored once, on their release.
+    """
+    config_json: Mapped[Dict[str, Any]] = mapped_column(JSON)
+
+    release: 'Release'
 
     @property
     def workbench_config(self) -> WorkBenchConfig:
-        return WorkBenchConfig.model_validate(self.workbench_config_json)
+        return self.release.workbench_config
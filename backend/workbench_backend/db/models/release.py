@@ -1,8 +1,10 @@
-from typing import TYPE_CHECKING, List
+import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
-from sqlalchemy import ForeignKey, String
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import JSON, DateTime, ForeignKey, String
+from sqlalchemy.orm import Mapped, mapped_column, object_session, relationship
 
+from ...workbench_config.model import WorkBenchConfig
 from .base import Base
 from .mixins import CreatedAtMixin, UserOwnedMixin, UserSharedMixin
 
@@ -25,8 +27,34 @@ class Release(
     repo_id: Mapped[int] = mapped_column(ForeignKey('repository.id'), index=True)
     repository: Mapped['Repository'] = relationship(back_populates='releases')
 
-    apps: Mapped[List['App']] = relationship(back_populates='release', lazy='selectin', cascade="all, delete-orphan")
-    services: Mapped[List['Service']] = relationship(back_populates='release', lazy='selectin', cascade="all, delete-orphan")
+    apps: Mapped[List['App']] = relationship(back_populates='release', cascade="all, delete-orphan")
+    services: Mapped[List['Service']] = relationship(back_populates='release', cascade="all, delete-orphan")
+
+    # the image build, queue wait is started - queued
+    build_queued_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime(True), nullable=True)
+    build_started_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime(True), nullable=True)
+    build_finished_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime(True), nullable=True)
+
+    # stored by the build, apps and services keep only their own entry
+    workbench_config_json: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSON, nullable=True)
+
+    @property
+    def workbench_config(self) -> WorkBenchConfig:
+        """
+        Parsed once per loaded config of a release in a session, every app and service
+        of the release reads it from here. A reload of the release parses it again.
+        """
+        session = object_session(self)
+        configs: Dict[int, Tuple[Optional[Dict[str, Any]], WorkBenchConfig]] = (
+            session.info.setdefault('workbench_configs', {}) if session else {}
+        )
+        cached = configs.get(self.id)
+        if cached is None or cached[0] is not self.workbench_config_json:
+            cached = configs[self.id] = (
+                self.workbench_config_json,
+                WorkBenchConfig.model_validate(self.workbench_config_json or {})
+            )
+        return cached[1]
 
     @property
     def docker_image(self) -> str:
@@ -26,7 +26,7 @@ class Service(
 ):
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
 
-    name: Mapped[str] = mapped_column(String)
+    name: Mapped[str] = mapped_column(String, index=True)
 
     enabled: Mapped[bool] = mapped_column(Boolean, default=False)
 
@@ -38,12 +38,12 @@ class Service(
 
     proxied_url: Mapped[str] = mapped_column(String, nullable=True)
 
-    release_id: Mapped[int] = mapped_column(ForeignKey('release.id'))
+    release_id: Mapped[int] = mapped_column(ForeignKey('release.id'), index=True)
     release: Mapped['Release'] = relationship(back_populates='services', lazy='joined', join_depth=2)
 
     @property
     def service_config(self) -> ServiceConfig:
-        return self.workbench_config.services[self.name]
+        return ServiceConfig.model_validate(self.config_json)
 
     @property
     def traefik_name(self) -> str:
@@ -1,4 +1,5 @@
 from contextvars import ContextVar, Token
+from typing import Dict
 
 from sqlalchemy import NullPool
 from sqlalchemy.ext.asyncio import (
@@ -22,13 +23,20 @@ def reset_session_context(context: Token[str]) -> None:
     session_context.reset(context)
 
 
-pool_args = {} if config.ENV in (Env.CELERY, Env.TEST) else {"pool_size": 20, "max_overflow": 40}
+pool_args: Dict[str, int]
+if config.ENV == Env.TEST:
+    pool_args = {}
+elif config.ENV == Env.CELERY:
+    # one engine per worker process, kept on its event loop by the worker runtime
+    pool_args = {"pool_size": config.CELERY_DB_POOL_SIZE, "max_overflow": config.CELERY_DB_MAX_OVERFLOW}
+else:
+    pool_args = {"pool_size": 20, "max_overflow": 40}
 
 
 async_engine = create_async_engine(
     config.DB_URI,
     echo=False,
-    poolclass=NullPool if config.ENV in (Env.CELERY, Env.TEST) else None,
+    poolclass=NullPool if config.ENV == Env.TEST else None,
     **pool_args
 )
 
@@ -1,7 +1,10 @@
+import hashlib
 import logging
-import sys
+import uuid
+from dataclasses import dataclass
 from typing import (
     Annotated,
+    Any,
     Awaitable,
     Callable,
     List,
@@ -11,7 +14,6 @@ from typing import (
     overload,
 )
 
-import httpx
 from fastapi import Depends, HTTPException, Request, Security, WebSocket
 from fastapi.security import OpenIdConnect
 from jose import JWTError, jwt
@@ -22,15 +24,16 @@ from ..crud.exceptions import DBNotFoundException
 from ..crud.schemas.user import UserCreateSchema, UserCRUD
 from ..db.models.user import User
 from ..db.session import session
-
-try:
-    resp = httpx.get(config.KEYCLOAK_REALM_URL)
-    key = resp.json()["public_key"]
-except Exception as e:
-    logging.error("Couldn't get keycloak public key", exc_info=e)
-    sys.exit(1)
-
-PUBLIC_KEY = f"-----BEGIN PUBLIC KEY-----\r\n{key}\r\n-----END PUBLIC KEY-----"
+from ..utils.jwks import JWKSKeyManager, JWKSUnavailable
+from ..utils.ttl_cache import TTLCache
+
+# Keys are fetched on the first verification, not at import time
+key_manager = JWKSKeyManager(
+    f"{config.KEYCLOAK_REALM_URL}/protocol/openid-connect/certs",
+    config.JWKS_MAX_AGE,
+    config.JWKS_REFRESH_AHEAD,
+    config.JWKS_MIN_REFETCH_INTERVAL,
+)
 
 CREDENTIALS_EXCEPTION = HTTPException(
     status_code=401,
@@ -38,6 +41,11 @@ CREDENTIALS_EXCEPTION = HTTPException(
     headers={"WWW-Authenticate": "Bearer"},
 )
 
+KEYS_UNAVAILABLE_EXCEPTION = HTTPException(
+    status_code=503,
+    detail="Could not fetch signing keys",
+)
+
 
 class Oauth2BearerToken(OpenIdConnect):
 
@@ -84,38 +92,92 @@ async def get_user_crud() -> UserCRUD:
     return UserCRUD.make_instance(session)
 
 
+@dataclass(frozen=True)
+class VerifiedToken:
+    sub: uuid.UUID
+    username: Optional[str]
+    email: Optional[str]
+    roles: List[str]
+
+
+@dataclass(frozen=True)
+class UserRecord:
+    id: Any
+    username: str
+    email: str
+
+    def to_user(self) -> User:
+        return User(id=self.id, username=self.username, email=self.email)
+
+
+# Keyed by a digest of the token, entries expire with the token
+token_cache: TTLCache[bytes, VerifiedToken] = TTLCache('auth.token_cache', config.AUTH_TOKEN_CACHE_SIZE, config.AUTH_CACHE_TTL)
+user_cache: TTLCache[str, UserRecord] = TTLCache('auth.user_cache', config.AUTH_USER_CACHE_SIZE, config.AUTH_CACHE_TTL)
+
+
+def invalidate_user(id: str) -> None:
+    user_cache.pop(str(id))
+
+
+async def verify_token(token: str) -> VerifiedToken:
+    digest = hashlib.sha256(token.encode()).digest()
+    if (verified := token_cache.get(digest)) is not None:
+        return verified
+    key = await key_manager.get_key(jwt.get_unverified_header(token).get("kid"))
+    payload = jwt.decode(
+        token,
+        key,
+        algorithms=[ALGORITHMS.RS256],
+        options={"verify_signature": True, "verify_aud": False, "exp": True},
+    )
+    id: Optional[str] = payload.get("sub")
+    if not id:
+        raise CREDENTIALS_EXCEPTION
+    try:
+        sub = uuid.UUID(id)
+    except ValueError:
+        raise CREDENTIALS_EXCEPTION
+    token_roles: List[str] = (
+            payload.get("resource_access", {})
+            .get("workbench-api", {})
+            .get("roles", [])
+        )
+    verified = VerifiedToken(sub, payload.get("preferred_username"), payload.get("email"), token_roles)
+    token_cache.set(digest, verified, payload.get("exp"))
+    return verified
+
+
 async def get_user(
     token: ACCESS_TOKEN, user_crud: Annotated[UserCRUD, Depends(get_user_crud)]
 ) -> User:
+    """
+    The user is a detached record, built from the user cache when possible.
+    Only the columns of the user row are set, its relationships are not loaded.
+    """
     try:
-        payload = jwt.decode(
-            token,
-            PUBLIC_KEY,
-            algorithms=[ALGORITHMS.RS256],
-            options={"verify_signature": True, "verify_aud": False, "exp": True},
-        )
-        id: Optional[str] = payload.get("sub")
-        if not id:
-            raise CREDENTIALS_EXCEPTION
-        try:
-            user = await user_crud.read_by_id(id)
-        except DBNotFoundException:
-            username = payload.get("preferred_username")
-            email = payload.get("email")
-            user = await user_crud.create(
-                UserCreateSchema(id=id, username=username, email=email)
-            )
-        token_roles: List[str] = (
-                payload.get("resource_access", {})
-                .get("workbench-api", {})
-                .get("roles", [])
-            )
-        user.permissions = token_roles
-        user.token = token
-        return user
+        verified = await verify_token(token)
     except JWTError as e:
         logging.warning("JWT validation error", exc_info=e)
         raise CREDENTIALS_EXCEPTION from e
+    except JWKSUnavailable as e:
+        logging.error("Couldn't get keycloak signing keys", exc_info=e)
+        raise KEYS_UNAVAILABLE_EXCEPTION from e
+
+    record = user_cache.get(str(verified.sub))
+    if record is None:
+        try:
+            db_user = await user_crud.read_by_id(verified.sub)
+        except DBNotFoundException:
+            db_user = await user_crud.create(
+                UserCreateSchema(id=verified.sub, username=verified.username, email=verified.email)
+            )
+        record = UserRecord(db_user.id, db_user.username, db_user.email)
+        user_cache.set(str(verified.sub), record)
+
+    user = record.to_user()
+    user.permissions = list(verified.roles)
+    user.token = token
+    return user
 
 
 GET_USER: TypeAlias = Annotated[User, Depends(get_user)]
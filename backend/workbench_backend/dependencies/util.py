@@ -1,15 +1,11 @@
-from typing import Annotated, AsyncGenerator
+from typing import Annotated
 
 from fastapi import Depends
 
-from ..utils.session_manager import SessionManager
+from ..utils.session_manager import SessionManager, session_manager
 
 
-async def session_manager_dep() -> AsyncGenerator[SessionManager, None]:
-    try:
-        manager = SessionManager()
-        yield manager
-    finally:
-        await manager.close()
+async def session_manager_dep() -> SessionManager:
+    return session_manager
 
 SESSION_MANAGER = Annotated[SessionManager, Depends(session_manager_dep)]
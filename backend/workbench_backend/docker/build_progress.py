@@ -0,0 +1,120 @@
+import asyncio
+import contextlib
+import logging
+from enum import Enum
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from ..app.config import config
+from ..utils.clients import clients
+
+
+class BuildPhase(str, Enum):
+    QUEUED = 'queued'
+    STARTED = 'started'
+    CHECKOUT = 'checkout'
+    BUILDING = 'building'
+    READY = 'ready'
+    FAILED = 'failed'
+
+
+FINAL_PHASES = {BuildPhase.READY.value, BuildPhase.FAILED.value}
+
+BuildEvent = Tuple[str, Dict[str, str]]
+
+
+def _is_final(fields: Dict[str, str]) -> bool:
+    return fields.get('type') == 'phase' and fields.get('phase') in FINAL_PHASES
+
+
+def progress_key(release_id: int) -> str:
+    return f'build:{release_id}:progress'
+
+
+class BuildProgress:
+    """
+    Phase transitions and output lines of one release build, appended to the
+    redis stream `build:{release_id}:progress` as entries with a `type` of
+    `phase` or `log`. Lines are buffered and written every `flush_interval` in
+    one round trip, the stream keeps about `max_entries` of them and expires
+    `ttl` seconds after the build.
+    """
+
+    def __init__(
+        self,
+        release_id: int,
+        flush_interval: float = 0.2,
+        max_entries: int = config.BUILD_PROGRESS_MAX_ENTRIES,
+        ttl: int = config.BUILD_PROGRESS_TTL,
+    ) -> None:
+        self.key = progress_key(release_id)
+        self.flush_interval = flush_interval
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lines: List[str] = []
+        self._flusher: Optional[asyncio.Task[None]] = None
+
+    async def phase(self, phase: BuildPhase, **fields: str) -> None:
+        # lines written before the transition stay in front of it
+        await self.flush()
+        await clients.redis().xadd(
+            self.key,
+            {'type': 'phase', 'phase': phase.value, **fields},
+            maxlen=self.max_entries,
+            approximate=True,
+        )
+        if phase.value in FINAL_PHASES:
+            await clients.redis().expire(self.key, self.ttl)
+
+    def log(self, line: str) -> None:
+        """Usable as the `stream_callback` of a build."""
+        self._lines.append(line)
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        try:
+            await self.flush()
+        except Exception as e:
+            logging.warning(f"Couldn't publish build output to {self.key}", exc_info=e)
+
+    async def flush(self) -> None:
+        lines, self._lines = self._lines, []
+        if not lines:
+            return
+        async with clients.redis().pipeline(transaction=False) as pipe:
+            for line in lines:
+                pipe.xadd(self.key, {'type': 'log', 'line': line}, maxlen=self.max_entries, approximate=True)
+            await pipe.execute()
+
+    async def close(self) -> None:
+        if self._flusher:
+            self._flusher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._flusher
+            self._flusher = None
+        await self.flush()
+
+
+async def tail_build_progress(release_id: int, last_id: str = '0', block: float = 5) -> AsyncIterator[BuildEvent]:
+    """
+    Entries of the progress stream after `last_id`, then the new ones as they are
+    written, until the build is ready or failed. Ends right away for a build
+    whose stream already expired, or that was never published.
+    """
+    key = progress_key(release_id)
+    # every viewer holds a connection for up to `block`, they don't take them from the shared pool
+    redis = clients.blocking_redis()
+    while True:
+        response = await redis.xread({key: last_id}, count=100, block=int(block * 1000))
+        if not response:
+            latest = await redis.xrevrange(key, count=1)
+            if not latest or _is_final(latest[0][1]):
+                # expired, or `last_id` is at or after the end of the build
+                return
+            continue
+        for entry_id, fields in response[0][1]:
+            last_id = entry_id
+            yield entry_id, fields
+            if _is_final(fields):
+                return
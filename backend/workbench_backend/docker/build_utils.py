@@ -1,7 +1,11 @@
 import asyncio
 import contextlib
+import hashlib
 import io
+import json
+import logging
 import os
+import shlex
 import tarfile
 import tempfile
 import time
@@ -10,27 +14,76 @@ from typing import (
     IO,
     TYPE_CHECKING,
     Any,
+    AsyncIterable,
     AsyncIterator,
     Callable,
     Dict,
+    Iterable,
+    List,
     Optional,
+    Tuple,
     TypeAlias,
 )
 
-from aiodocker import Docker
+from aiodocker import Docker, DockerError
+from aiodocker.jsonstream import json_stream_stream
 
-RELEASE_DOCKERFILE = """
-    FROM base-workbench:latest
-    ARG HTTP_PROXY
-    ARG HTTPS_PROXY
-    USER root
-    COPY . .
+from ..git.backends import run_git
+from ..utils.clients import clients
 
-    RUN build && \
-        chown -R runner:runner ${HOME}
-    USER runner
+RELEASE_DOCKERFILE_NAME = 'Dockerfile.workbench'
+
+ARCHIVE_CHUNK_SIZE = 64 * 1024
+
+# Images built from a git tree, tagged with a hash of the tree, the Dockerfile and the base image
+RELEASE_CONTEXT_IMAGE = 'release-context'
+
+RELEASE_BASE_IMAGE = 'base-workbench:latest'
+
+# Dependency manifests copied into the image before the sources and the command
+# installing from them. The first file of each group is required.
+RELEASE_MANIFESTS: List[Tuple[List[str], str]] = [
+    (['pyproject.toml', 'poetry.lock'], 'poetry install --no-root --no-interaction'),
+    (['package.json', 'package-lock.json'], 'npm install'),
+]
+
+RELEASE_DOCKERFILE_DEPS = f"""
+FROM {RELEASE_BASE_IMAGE} AS dependencies
+ARG HTTP_PROXY
+ARG HTTPS_PROXY
+USER root
+"""
+
+RELEASE_DOCKERFILE_BUILD = """
+FROM dependencies
+COPY . .
+RUN build && \\
+    chown -R runner:runner ${HOME}
+USER runner
 """
 
+
+def release_dockerfile(packages: Optional[List[str]], manifests: Iterable[str]) -> str:
+    """
+    Dependencies only depend on the manifests, so they are installed in
+    layers that stay cached as long as the manifests do not change.
+    `build` in the last stage finds them installed and only builds the sources.
+    """
+    present = set(manifests)
+    steps = [RELEASE_DOCKERFILE_DEPS]
+    if packages:
+        steps.append(
+            f"RUN apt-get -y update && apt-get -y install {' '.join(map(shlex.quote, packages))}\n"
+        )
+    for files, install in RELEASE_MANIFESTS:
+        if files[0] not in present:
+            continue
+        steps.append(f"COPY {' '.join(file for file in files if file in present)} ./\n")
+        steps.append(f"RUN {install}\n")
+    steps.append(RELEASE_DOCKERFILE_BUILD)
+    return ''.join(steps)
+
+
 class BuildError(Exception):
     pass
 
@@ -70,6 +123,72 @@ async def archive_directory(
         temp.close()
 
 
+async def _build(
+    client: Docker,
+    fileobj: IO[bytes] | AsyncIterable[bytes] | Any,
+    encoding: str,
+    tag: str,
+    path_dockerfile: Optional[str] = None,
+    buildargs: Optional[Dict[str, Any]] = None,
+    labels: Optional[Dict[str, str]] = None,
+    stream_callback: Optional[Callable[[str], None]] = None
+) -> None:
+    proxies = {'HTTP_PROXY': os.environ.get('HTTP_PROXY'),'HTTPS_PROXY':os.environ.get('HTTPS_PROXY')}
+    buildargs = {**buildargs,**proxies} if buildargs else proxies
+    if isinstance(fileobj, AsyncIterable):
+        stream = _build_from_stream(client, fileobj, encoding, tag, path_dockerfile, buildargs, labels)
+    else:
+        stream = client.images.build(
+            fileobj=fileobj,
+            encoding=encoding,
+            path_dockerfile=path_dockerfile,
+            stream=True,
+            tag=tag,
+            buildargs=buildargs,
+            labels=labels
+            # For local development, purposes
+            # nocache=True,
+            # platform="linux/amd64",
+        )
+    async for line in stream:
+        if line.get("errorDetail"):
+            raise BuildError(
+                f"Docker image failed to build {tag}:\n{line['errorDetail']['message']}"
+            )
+        if stream_callback and "stream" in line:
+            stream_callback(line["stream"].strip())
+
+
+async def _build_from_stream(
+    client: Docker,
+    body: AsyncIterable[bytes],
+    encoding: str,
+    tag: str,
+    path_dockerfile: Optional[str],
+    buildargs: Dict[str, Any],
+    labels: Optional[Dict[str, str]],
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    `images.build` with an async request body. `images.build` reads its `fileobj` with
+    blocking reads on the event loop, so the body is passed to `Docker._query` as is,
+    the same request `images.build` makes. aiodocker is pinned for this.
+    """
+    params: Dict[str, Any] = {'t': tag, 'buildargs': json.dumps(buildargs)}
+    if path_dockerfile:
+        params['dockerfile'] = path_dockerfile
+    if labels:
+        params['labels'] = json.dumps(labels)
+    async with client._query(
+        'build',
+        'POST',
+        params=params,
+        headers={'content-type': 'application/x-tar', 'Content-Encoding': encoding},
+        data=body,
+    ) as response:
+        async for line in json_stream_stream(response):
+            yield line
+
+
 async def build_image(
     context: str,
     tag: str,
@@ -78,25 +197,127 @@ async def build_image(
     labels: Optional[Dict[str, str]] = None,
     stream_callback: Optional[Callable[[str], None]] = None
 ) -> Any:
-    proxies = {'HTTP_PROXY': os.environ.get('HTTP_PROXY'),'HTTPS_PROXY':os.environ.get('HTTPS_PROXY')}
-    async with Docker() as client:
-        async with archive_directory(context, extra_files) as file:
-            stream = client.images.build(
-                fileobj=file,
-                encoding='gzip',
-                stream=True,
-                tag=tag,
-                buildargs={**buildargs,**proxies} if buildargs else proxies,
-                labels=labels
-                # For local development, purposes
-                # nocache=True,
-                # platform="linux/amd64",
-            )
-            async for line in stream:
-                if line.get("errorDetail"):
-                    raise BuildError(
-                        f"Docker image failed to build {tag}:\n{line['errorDetail']['message']}"
-                    )
-                if stream_callback and "stream" in line:
-                    stream_callback(line["stream"].strip())
+    client = clients.docker()
+    async with archive_directory(context, extra_files) as file:
+        await _build(client, file, 'gzip', tag, None, buildargs, labels, stream_callback)
+    return await client.images.inspect(tag)
+
+
+def _tar_members(files: Dict[str, str]) -> bytes:
+    buffer = io.BytesIO()
+    for name, content in files.items():
+        encoded = content.encode()
+        tarinfo = tarfile.TarInfo(name)
+        tarinfo.size = len(encoded)
+        # constant mtime, so the context of an unchanged tree is byte identical
+        tarinfo.mtime = 0
+        buffer.write(tarinfo.tobuf(format=tarfile.PAX_FORMAT))
+        buffer.write(encoded)
+        buffer.write(b'\0' * (-len(encoded) % tarfile.BLOCKSIZE))
+    return buffer.getvalue()
+
+
+class GitArchiveStream:
+    """
+    Build context read straight from `git archive`, nothing is written to disk.
+    `extra_files` are emitted in front of the archive, they must not collide
+    with paths in the tree. Iterating starts `git archive`, it is read
+    without blocking the event loop.
+    """
+
+    def __init__(self, repo_path: str, refish: str, extra_files: Optional[Dict[str, str]] = None) -> None:
+        self._repo_path = repo_path
+        self._refish = refish
+        self._prefix = _tar_members(extra_files or {})
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self.archive_seconds: Optional[float] = None
+        self.size = 0
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        started = time.perf_counter()
+        self._process = await asyncio.create_subprocess_exec(
+            'git', 'archive', '--format=tar', self._refish,
+            cwd=self._repo_path,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        assert self._process.stdout and self._process.stderr
+        if self._prefix:
+            self.size += len(self._prefix)
+            yield self._prefix
+        while chunk := await self._process.stdout.read(ARCHIVE_CHUNK_SIZE):
+            self.size += len(chunk)
+            yield chunk
+        stderr = await self._process.stderr.read()
+        if await self._process.wait() != 0:
+            raise BuildError(f"git archive failed: {stderr.decode()}")
+        self.archive_seconds = time.perf_counter() - started
+
+    async def close(self) -> None:
+        if self._process is None:
+            return
+        if self._process.returncode is None:
+            with contextlib.suppress(ProcessLookupError):
+                self._process.kill()
+        await self._process.wait()
+
+
+def release_context_key(tree_id: str, dockerfile: str, base_image_id: str) -> str:
+    return hashlib.sha256(f'{tree_id}\0{dockerfile}\0{base_image_id}'.encode()).hexdigest()[:32]
+
+
+async def build_image_from_git(
+    repo_path: str,
+    refish: str,
+    tag: str,
+    dockerfile: str,
+    buildargs: Optional[Dict[str, Any]] = None,
+    labels: Optional[Dict[str, str]] = None,
+    stream_callback: Optional[Callable[[str], None]] = None
+) -> Any:
+    """
+    Builds `refish` of the repository with `dockerfile` and tags the result as `tag`.
+    The image is also tagged with a hash of the git tree, the Dockerfile and the
+    id of the base image, building the same tree on the same base again only
+    retags that image.
+    """
+    client = clients.docker()
+    tree_id = (await run_git(repo_path, 'rev-parse', f"{refish}^{{tree}}")).strip()
+    base_image_id = (await client.images.inspect(RELEASE_BASE_IMAGE))['Id']
+    context_tag = f'{RELEASE_CONTEXT_IMAGE}:{release_context_key(tree_id, dockerfile, base_image_id)}'
+    repository, _, version = tag.partition(':')
+
+    try:
+        await client.images.inspect(context_tag)
+        built = True
+    except DockerError as e:
+        if e.status != 404:
+            raise
+        built = False
+
+    if built:
+        logging.info(f'Reusing {context_tag} for {tag}, tree {tree_id} was already built')
+        await client.images.tag(context_tag, repository, tag=version or None)
         return await client.images.inspect(tag)
+
+    build_start = time.perf_counter()
+    archive = GitArchiveStream(repo_path, refish, {RELEASE_DOCKERFILE_NAME: dockerfile})
+    try:
+        await _build(
+            client,
+            archive,
+            'identity',
+            context_tag,
+            RELEASE_DOCKERFILE_NAME,
+            buildargs,
+            labels,
+            stream_callback
+        )
+    finally:
+        await archive.close()
+    logging.info(
+        f'Built {tag} from tree {tree_id}: archive {archive.archive_seconds or 0:.2f}s '
+        f'({archive.size} bytes streamed), build {time.perf_counter() - build_start:.2f}s'
+    )
+    await client.images.tag(context_tag, repository, tag=version or None)
+    return await client.images.inspect(tag)
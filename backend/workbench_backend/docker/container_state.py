@@ -0,0 +1,176 @@
+import asyncio
+import contextlib
+import datetime
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from aiodocker import DockerError
+from aiodocker.containers import DockerContainer
+
+from ..utils.clients import clients
+from ..utils.metrics import metrics
+from .events import DockerEventAction, DockerEventMessage, DockerEvents, docker_events
+
+# attributes of container events that are not labels
+_EVENT_ATTRIBUTES = {'name', 'image', 'exitCode', 'execDuration', 'execID', 'signal', 'oldName'}
+
+_STATUS_AFTER: Dict[str, str] = {
+    DockerEventAction.CREATE.value: 'created',
+    DockerEventAction.START.value: 'running',
+    DockerEventAction.RESTART.value: 'running',
+    DockerEventAction.UNPAUSE.value: 'running',
+    DockerEventAction.PAUSE.value: 'paused',
+    DockerEventAction.DIE.value: 'exited',
+}
+
+
+@dataclass
+class ContainerState:
+    id: str
+    name: str
+    status: str
+    labels: Dict[str, str] = field(default_factory=dict)
+    started_at: Optional[datetime.datetime] = None
+
+    @classmethod
+    def from_summary(cls, summary: DockerContainer) -> 'ContainerState':
+        """From an entry of `containers.list`, it doesn't tell the start time."""
+        return cls(
+            id=summary['Id'],
+            name=summary['Names'][0].lstrip('/') if summary['Names'] else summary['Id'],
+            status=summary['State'],
+            labels=summary['Labels'] or {},
+        )
+
+    @classmethod
+    def from_inspect(cls, info: DockerContainer) -> 'ContainerState':
+        started_at = info['State']['StartedAt']
+        return cls(
+            id=info['Id'],
+            name=info['Name'].lstrip('/'),
+            status=info['State']['Status'],
+            labels=info['Config'].get('Labels') or {},
+            started_at=datetime.datetime.fromisoformat(started_at) if started_at else None,
+        )
+
+
+class ContainerStateCache:
+    """
+    State of every container of the docker daemon, bootstrapped from one
+    `containers.list` and kept current from the container events.
+    The list doesn't tell when a container started, that is filled in by one
+    inspect per running container after each bootstrap.
+    `ready` is false until the first bootstrap and while the event stream is down,
+    callers fall back to the docker API meanwhile.
+    """
+
+    def __init__(self, events: DockerEvents, backfill_concurrency: int = 8) -> None:
+        self._containers: Dict[str, ContainerState] = {}
+        self._ids_by_name: Dict[str, str] = {}
+        self._backfill_concurrency = backfill_concurrency
+        self._backfill_task: Optional[asyncio.Task[None]] = None
+        self.ready = False
+        events.on_connect(self._bootstrap)
+        events.on_event(self._apply)
+        events.on_disconnect(self._disconnected)
+        metrics.gauge('container_state.containers', lambda: len(self._containers))
+
+    def get(self, id_or_name: str) -> Optional[ContainerState]:
+        container_id = self._ids_by_name.get(id_or_name.lstrip('/'), id_or_name)
+        return self._containers.get(container_id)
+
+    def list(self, label: Optional[str] = None, value: Optional[str] = None) -> List[ContainerState]:
+        """Containers with `label`, set to `value` if given."""
+        return [
+            state for state in self._containers.values()
+            if label is None or (
+                label in state.labels and (value is None or state.labels[label] == value)
+            )
+        ]
+
+    async def _bootstrap(self) -> None:
+        self.ready = False
+        summaries = await clients.docker().containers.list(all=True)
+        previous = self._containers
+        self._containers = {}
+        self._ids_by_name = {}
+        for summary in summaries:
+            state = ContainerState.from_summary(summary)
+            if (known := previous.get(state.id)) is not None and state.status == known.status:
+                state.started_at = known.started_at
+            self._put(state)
+        self.ready = True
+        metrics.inc('container_state.bootstraps')
+        if self._backfill_task:
+            self._backfill_task.cancel()
+        self._backfill_task = asyncio.create_task(self._backfill_started_at())
+
+    async def _backfill_started_at(self) -> None:
+        semaphore = asyncio.Semaphore(self._backfill_concurrency)
+
+        async def backfill(state: ContainerState) -> None:
+            async with semaphore:
+                if state.started_at is not None or self._containers.get(state.id) is not state:
+                    return
+                try:
+                    container = await clients.docker().containers.get(state.id)
+                except DockerError as e:
+                    if e.status != 404:
+                        logging.warning(f"Couldn't inspect container {state.id}", exc_info=e)
+                    return
+                # a start event may have set it in the meantime
+                if state.started_at is None and container['State']['StartedAt']:
+                    state.started_at = datetime.datetime.fromisoformat(container['State']['StartedAt'])
+
+        await asyncio.gather(*(
+            backfill(state) for state in list(self._containers.values())
+            if state.status in ('running', 'paused', 'restarting')
+        ))
+
+    def _put(self, state: ContainerState) -> None:
+        self._containers[state.id] = state
+        self._ids_by_name[state.name] = state.id
+
+    async def _apply(self, event: DockerEventMessage) -> None:
+        container_id = event.Actor.ID
+        attributes = event.Actor.attributes
+        action = event.Action
+        if action == DockerEventAction.DESTROY:
+            if (state := self._containers.pop(container_id, None)) is not None:
+                if self._ids_by_name.get(state.name) == container_id:
+                    del self._ids_by_name[state.name]
+            return
+        state = self._containers.get(container_id)
+        if state is None:
+            # created between the list and the subscription, or a missed create
+            state = ContainerState(
+                id=container_id,
+                name=attributes.get('name', container_id).lstrip('/'),
+                status='created',
+                labels={key: value for key, value in attributes.items() if key not in _EVENT_ATTRIBUTES},
+            )
+            self._put(state)
+        if action == DockerEventAction.RENAME:
+            self._ids_by_name.pop(state.name, None)
+            state.name = attributes.get('name', state.name).lstrip('/')
+            self._ids_by_name[state.name] = container_id
+        if (status := _STATUS_AFTER.get(action)) is not None:
+            state.status = status
+        if action in (DockerEventAction.START, DockerEventAction.RESTART):
+            state.started_at = event.timestamp
+        metrics.inc('container_state.events')
+
+    async def _disconnected(self) -> None:
+        # events are missed until the next bootstrap
+        self.ready = False
+
+    async def close(self) -> None:
+        if self._backfill_task:
+            self._backfill_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._backfill_task
+            self._backfill_task = None
+
+
+container_states = ContainerStateCache(docker_events)
@@ -14,7 +14,6 @@ from typing import (
     cast,
 )
 
-import aiodocker
 import aiohttp
 from aiodocker.docker import DockerContainer
 from pydantic import BaseModel
@@ -31,6 +30,8 @@ from websockets.legacy.client import WebSocketClientProtocol
 from ..app.config import config as app_config
 from ..db.models.repository import Repository
 from ..db.models.user import User
+from ..utils.clients import clients
+from .editor_pool import EditorSpec, editor_pool
 from .utils import (
     ContainerConfigBuilder,
     Event,
@@ -157,8 +158,8 @@ class ProcessManager:
     ) -> None:
         self.ip = ip
         self.port = port
-        self.client = aiohttp.ClientSession(base_url=f'http://{self.ip}:{self.port}')
-        self.docker = aiodocker.Docker()
+        self.url = f'http://{self.ip}:{self.port}'
+        self.client = clients.http()
         self._processes: Dict[int, Process] = {}
         self._notif_task = asyncio.create_task(self._notif_handler())
         self._notif_event = Event[Notification]()
@@ -197,7 +198,7 @@ class ProcessManager:
             'env':env,
             'name':term_type
         }
-        async with self.client.post('/', json=data) as resp:
+        async with self.client.post(f'{self.url}/', json=data) as resp:
             if resp.status == 201:
                 proc = Process(**(await resp.json()))
                 self._processes[proc.pid] = proc
@@ -214,7 +215,7 @@ class ProcessManager:
             'cols':cols,
             'rows':rows
         }
-        async with self.client.post(f'/{pid}/resize',json=data) as resp:
+        async with self.client.post(f'{self.url}/{pid}/resize',json=data) as resp:
             if resp.status == 200:
                 return
             logging.error(await resp.json())
@@ -225,7 +226,7 @@ class ProcessManager:
         pid: int,
         signal: str = "SIGKILL"
     ) -> Any:
-        async with self.client.post(f'/{pid}/kill', params={'signal':signal}) as resp:
+        async with self.client.post(f'{self.url}/{pid}/kill', params={'signal':signal}) as resp:
             if resp.status == 200:
                 return await resp.json()
             else:
@@ -235,7 +236,7 @@ class ProcessManager:
         self,
         pid: int
     ) -> Any:
-        async with self.client.post(f'/{pid}/pause') as resp:
+        async with self.client.post(f'{self.url}/{pid}/pause') as resp:
             if resp.status == 200:
                 return
             else:
@@ -245,7 +246,7 @@ class ProcessManager:
         self,
         pid: int
     ) -> None:
-        async with self.client.post(f'/{pid}/resume') as resp:
+        async with self.client.post(f'{self.url}/{pid}/resume') as resp:
             if resp.status == 200:
                 return
             else:
@@ -255,7 +256,7 @@ class ProcessManager:
         self,
         pid: int,
     ) -> None:
-        async with self.client.post(f'/{pid}/clear') as resp:
+        async with self.client.post(f'{self.url}/{pid}/clear') as resp:
             if resp.status == 200:
                 return
             else:
@@ -266,7 +267,7 @@ class ProcessManager:
         pid: int,
         timeout: Optional[int] = None
     ) -> int:
-        async with self.client.get(f'/{pid}/wait',params={'timeout':timeout}) as resp:
+        async with self.client.get(f'{self.url}/{pid}/wait',params={'timeout':timeout}) as resp:
             if resp.status == 200:
                 data = await resp.json()
                 if 'exitCode' in data:
@@ -282,7 +283,7 @@ class ProcessManager:
         self,
         lspArgs: Dict[str, str]
     ) -> LspServiceHandler:
-        async with self.client.post('/startLsp',json=lspArgs) as resp:
+        async with self.client.post(f'{self.url}/startLsp',json=lspArgs) as resp:
             if resp.status != 200:
                 raise Exception("LSP error")
             data = await resp.json()
@@ -343,13 +344,11 @@ class ProcessManager:
         reraise=True
     )
     async def _ready(self) -> None:
-        async with self.client.get('/'):
+        async with self.client.get(f'{self.url}/'):
             pass
 
     async def close(self) -> None:
         self._notif_task.cancel()
-        await self.docker.close()
-        await self.client.close()
 
 class EditorContainer:
 
@@ -360,7 +359,7 @@ class EditorContainer:
     ) -> None:
         self.repo = repo
         self.user = user
-        self.client = aiodocker.Docker()
+        self.client = clients.docker()
         self.container: DockerContainer
         self._using_existing_container = False
 
@@ -368,8 +367,11 @@ class EditorContainer:
     def using_existing_container(self) -> bool:
         return self._using_existing_container
 
-    async def start(self) -> None:
-        self._using_existing_container = False
+    @property
+    def name(self) -> str:
+        return f"{self.repo.owner.username}-{self.repo.name}-editor"
+
+    def build_config(self) -> ContainerConfigBuilder:
         config = ( ContainerConfigBuilder('editor-container:latest')
                     .hostname(f'{self.repo.name}-editor')
                     .network(app_config.APPS_DOCKER_NETWORK)
@@ -379,37 +381,50 @@ class EditorContainer:
         config = setup_volumes(config,self.user, self.repo)
         config = setup_environ(config, self.user, self.repo)
         config = setup_labels(config, self.repo)
-        try:
-            existing = await self.client.containers.get(f"{self.repo.owner.username}-{self.repo.name}-editor")
-        except Exception:
-            existing = None
-        if existing:
-            container_hash = existing['Config']['Labels'].get(WorkbenchContainerLabels.CONFIG_HASH.value)
-        else:
-            container_hash = None
-        logging.debug(f'Container config: {config}')
-        if existing and config.hash() == container_hash:
-            self.container = existing
-            self._using_existing_container = True
-            logging.debug(f'Using existing container: {self.container}')
-        else:
-            logging.debug('Recreating container')
-            logging.debug(f'Container hash: {container_hash} \n')
-            logging.debug(f'New hash: {config.hash()}')
-            config_hash = config.hash()
-            config.label(WorkbenchContainerLabels.CONFIG_HASH.value, config_hash)
-            self.container = await self.client.containers.create_or_replace(
-                f"{self.repo.owner.username}-{self.repo.name}-editor",
-                config
-            )
-        if not self.container:
-            raise RuntimeError("Couldn't create container")
-        await self.container.start()
-        await self.container.show()
-        self._ip: str = self.container['NetworkSettings']['Networks'][app_config.APPS_DOCKER_NETWORK]["IPAddress"]
-        self._process_manager = ProcessManager(self._ip)
-        if not (await self._process_manager.ready()):
-            raise RuntimeError("Cannot access container")
+        config.label(WorkbenchContainerLabels.CONFIG_HASH.value, config.hash())
+        return config
+
+    async def start(self) -> None:
+        self._using_existing_container = False
+        config = self.build_config()
+        config_hash = config['Labels'][WorkbenchContainerLabels.CONFIG_HASH.value]
+        async with editor_pool.claim(self.name) as claim:
+            try:
+                existing = await self.client.containers.get(self.name)
+            except Exception:
+                existing = None
+            if existing:
+                container_hash = existing['Config']['Labels'].get(WorkbenchContainerLabels.CONFIG_HASH.value)
+            else:
+                container_hash = None
+            logging.debug(f'Container config: {config}')
+            if existing and config_hash == container_hash:
+                self.container = existing
+                self._using_existing_container = True
+                claim.warm = existing['State']['Running']
+                logging.debug(f'Using existing container: {self.container}')
+            else:
+                logging.debug('Recreating container')
+                logging.debug(f'Container hash: {container_hash} \n')
+                logging.debug(f'New hash: {config_hash}')
+                self.container = await self.client.containers.create_or_replace(
+                    self.name,
+                    config
+                )
+            if not self.container:
+                raise RuntimeError("Couldn't create container")
+            await self.container.start()
+            await self.container.show()
+            self._ip: str = self.container['NetworkSettings']['Networks'][app_config.APPS_DOCKER_NETWORK]["IPAddress"]
+            self._process_manager = ProcessManager(self._ip)
+            if not (await self._process_manager.ready()):
+                raise RuntimeError("Cannot access container")
+        editor_pool.remember(EditorSpec(
+            self.name,
+            config,
+            self.repo.path(),
+            'root' if 'god' in self.user.permissions else 'runner'
+        ))
 
     async def remove(self) -> None:
         if not self.container:
@@ -478,6 +493,7 @@ class EditorContainer:
     async def close(self) -> None:
         if self.process_manager:
             await self.process_manager.close()
-        if self.container:
+        # warm containers keep running for the next session
+        keep_warm = editor_pool.release(self.name)
+        if self.container and not keep_warm:
             await self.container.stop()
-        await self.client.close()
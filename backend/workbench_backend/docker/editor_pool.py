@@ -0,0 +1,219 @@
+import asyncio
+import contextlib
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import aiodocker
+from aiodocker.containers import DockerContainer
+
+from ..utils.clients import clients
+from ..utils.metrics import metrics
+from .utils import ContainerConfigBuilder, WorkbenchContainerLabels
+
+
+@dataclass
+class EditorSpec:
+    """Everything needed to recreate an editor container without a session."""
+    name: str
+    config: ContainerConfigBuilder
+    repo_path: str
+    exec_user: str
+
+    @property
+    def config_hash(self) -> str:
+        return str(self.config['Labels'][WorkbenchContainerLabels.CONFIG_HASH.value])
+
+
+@dataclass
+class Claim:
+    name: str
+    warm: bool = False
+    started: float = field(default_factory=time.perf_counter)
+
+
+class EditorPool:
+    """
+    Keeps the editor containers of the most recently edited repositories
+    created, set up and running, so a new edit session only has to attach.
+
+    Docker cannot add binds or change labels of an existing container, so a
+    warm container belongs to a user+repository: it is created from the same
+    config the session would use, and `refill` runs the package install,
+    setup script and `poetry install` a new container would need.
+    """
+
+    def __init__(self, size: int, refill_interval: float) -> None:
+        self._size = size
+        self._refill_interval = refill_interval
+        self._specs: OrderedDict[str, EditorSpec] = OrderedDict()
+        self._evicted: Set[str] = set()
+        self._active: Dict[str, int] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def _lock(self, name: str) -> asyncio.Lock:
+        return self._locks.setdefault(name, asyncio.Lock())
+
+    @property
+    def warm_names(self) -> List[str]:
+        return list(self._specs.keys())
+
+    @property
+    def active_count(self) -> int:
+        return len(self._active)
+
+    @contextlib.asynccontextmanager
+    async def claim(self, name: str) -> AsyncIterator[Claim]:
+        """Held while a session starts the container, reports claim latency."""
+        claim = Claim(name)
+        async with self._lock(name):
+            self._active[name] = self._active.get(name, 0) + 1
+            try:
+                yield claim
+            except BaseException:
+                self.release(name)
+                raise
+        latency = time.perf_counter() - claim.started
+        metrics.inc('editor_pool.claims.warm' if claim.warm else 'editor_pool.claims.cold')
+        metrics.observe('editor_pool.claim_latency', latency)
+        logging.info(f"Editor container {name} claimed {'warm' if claim.warm else 'cold'} in {latency:.2f}s")
+
+    def remember(self, spec: EditorSpec) -> None:
+        self._specs[spec.name] = spec
+        self._specs.move_to_end(spec.name)
+        self._evicted.discard(spec.name)
+        while len(self._specs) > self._size:
+            evicted, _ = self._specs.popitem(last=False)
+            self._evicted.add(evicted)
+
+    def release(self, name: str) -> bool:
+        """Returns whether the container should be kept running for the next session."""
+        if self._active.get(name, 0) > 1:
+            self._active[name] -= 1
+            return True
+        self._active.pop(name, None)
+        self._wakeup.set()
+        return name in self._specs
+
+    async def refill(self) -> None:
+        client = clients.docker()
+        for name in self.warm_names:
+            spec = self._specs.get(name)
+            if not spec or name in self._active:
+                continue
+            async with self._lock(name):
+                try:
+                    await self._warm(client, spec)
+                except Exception as e:
+                    logging.error(f"Could not warm editor container {name}", exc_info=e)
+                    metrics.inc('editor_pool.refill_errors')
+        metrics.inc('editor_pool.refills')
+
+    async def _warm(self, client: aiodocker.Docker, spec: EditorSpec) -> None:
+        try:
+            container: Optional[DockerContainer] = await client.containers.get(spec.name)
+        except aiodocker.DockerError:
+            container = None
+
+        if container and container['Config']['Labels'].get(WorkbenchContainerLabels.CONFIG_HASH.value) == spec.config_hash:
+            if not container['State']['Running']:
+                await container.start()
+                metrics.inc('editor_pool.started')
+            return
+
+        start = time.perf_counter()
+        container = await client.containers.create_or_replace(spec.name, spec.config)
+        await container.start()
+        await container.show()
+        if not await self._prepare(container, spec):
+            # a session would retry the setup on a fresh container
+            await container.delete(force=True)
+            return
+        metrics.inc('editor_pool.created')
+        logging.info(f"Warmed editor container {spec.name} in {time.perf_counter() - start:.2f}s")
+
+    async def _prepare(self, container: DockerContainer, spec: EditorSpec) -> bool:
+        # These are here because of circular import
+        from ..app.config import config as app_config
+        from ..git import EditableRepository
+        from .edit_utils import ProcessManager
+
+        ip = container['NetworkSettings']['Networks'][app_config.APPS_DOCKER_NETWORK]['IPAddress']
+        process_manager = ProcessManager(ip)
+        try:
+            if not await process_manager.ready():
+                return False
+        finally:
+            await process_manager.close()
+
+        repo = await EditableRepository.open_repository(spec.repo_path)
+        await repo.load_workbench_config()
+        setup = repo.workbench_config.setup
+        commands: List[Tuple[List[str], str]] = []
+        if setup and setup.packages:
+            commands.append((['apt-get', '-y', 'update'], 'root'))
+            commands.append((['apt-get', '-y', 'install'] + setup.packages, 'root'))
+        if setup and setup.setup_script:
+            commands.append((['bash', '-c', setup.setup_script], spec.exec_user))
+        if repo.file_exists('pyproject.toml'):
+            commands.append((['poetry', 'install'], spec.exec_user))
+
+        for cmd, user in commands:
+            exec = await container.exec(cmd, user=user, tty=False)
+            async with exec.start(detach=False) as stream:
+                while (msg := await stream.read_out()) is not None:
+                    logging.debug(msg.data.decode(errors='replace'))
+            if (await exec.inspect())['ExitCode'] != 0:
+                logging.warning(f"Editor container {spec.name} setup failed: {' '.join(cmd)}")
+                return False
+        return True
+
+    async def _stop_evicted(self) -> None:
+        """Containers that dropped out of the pool are stopped like after any session."""
+        client = clients.docker()
+        for name in list(self._evicted):
+            if name in self._active or self._lock(name).locked():
+                continue
+            self._evicted.discard(name)
+            with contextlib.suppress(aiodocker.DockerError):
+                container = await client.containers.get(name)
+                await container.stop()
+                metrics.inc('editor_pool.stopped')
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refill()
+                await self._stop_evicted()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error("Editor pool refill error", exc_info=e)
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), self._refill_interval)
+            self._wakeup.clear()
+
+    def start(self) -> None:
+        if self._size > 0 and not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+
+def _create_pool() -> EditorPool:
+    from ..app.config import config
+    return EditorPool(config.EDITOR_POOL_SIZE, config.EDITOR_POOL_REFILL_INTERVAL)
+
+
+editor_pool = _create_pool()
+metrics.gauge('editor_pool.warm', lambda: len(editor_pool.warm_names))
+metrics.gauge('editor_pool.active', lambda: editor_pool.active_count)
@@ -1,10 +1,14 @@
 import asyncio
+import contextlib
+import datetime
+import json
+import logging
 from dataclasses import dataclass
 from enum import Enum
-from typing import Callable, Dict, Optional
-
-from aiodocker import Docker
+from typing import Any, Callable, Dict, List, Optional
 
+from ..utils.clients import clients
+from ..utils.metrics import metrics
 from .utils import Event, EventListener, ListenerCallback
 
 
@@ -90,39 +94,90 @@ class DockerEventMessage:
     time: Optional[int] = None
     timeNano: Optional[int] = None
 
+    @classmethod
+    def parse(cls, event: Dict[str, Any]) -> 'DockerEventMessage':
+        event = dict(event)
+        from_ = event.pop('from', None)
+        actor = event.pop('Actor', {})
+        return cls(
+            **event,
+            Actor=DockerEventActor(actor.get('ID', ''), actor.get('Attributes', {})),
+            from_=from_
+        )
 
-class DockerEvents:
+    @property
+    def timestamp(self) -> datetime.datetime:
+        if self.timeNano is not None:
+            return datetime.datetime.fromtimestamp(self.timeNano / 1e9, datetime.timezone.utc)
+        return datetime.datetime.now(datetime.timezone.utc)
 
-    def __init__(self) -> None:
-        self._client = Docker()
+
+class DockerEvents:
+    """
+    Event stream of the docker daemon, reconnected when it breaks.
+    `on_connect` listeners run before any event of a new stream is delivered,
+    events of the stream queue up meanwhile. `on_disconnect` fires when it breaks.
+    """
+
+    def __init__(self, filters: Optional[Dict[str, List[str]]] = None, retry_interval: float = 1) -> None:
+        self._filters = filters
+        self._retry_interval = retry_interval
         self._events = Event[DockerEventMessage]()
+        self._connected = Event[[]]()
+        self._disconnected = Event[[]]()
+        self._task: Optional[asyncio.Task[None]] = None
 
     def start(self) -> None:
-        self._task = asyncio.create_task(self._watcher_task())
+        if not self._task:
+            self._task = asyncio.create_task(self._watcher_task())
 
     async def _watcher_task(self) -> None:
-        subscriber = self._client.events.subscribe()
-        try:
-            while True:
-                event = await subscriber.get()
-                if event is None:
-                    break
-                from_ = event.get('from')
-                if 'from' in event:
-                    del event['from']
-                await self._events.fire(DockerEventMessage(**event, from_=from_))
-        except asyncio.CancelledError:
-            pass
+        params = {'filters': json.dumps(self._filters)} if self._filters else {}
+        while True:
+            docker = clients.docker()
+            subscriber = docker.events.subscribe(create_task=False)
+            stream = asyncio.create_task(docker.events.run(**params))
+            try:
+                await self._connected.fire()
+                while (event := await subscriber.get()) is not None:
+                    try:
+                        await self._events.fire(DockerEventMessage.parse(event))
+                    except Exception as e:
+                        logging.error(f"Docker event listener failed on {event}", exc_info=e)
+            except Exception as e:
+                logging.warning("Docker event stream setup failed", exc_info=e)
+            finally:
+                stream.cancel()
+                await asyncio.wait([stream])
+                del subscriber
+            if not stream.cancelled() and (error := stream.exception()):
+                logging.warning("Docker event stream failed", exc_info=error)
+            metrics.inc('docker_events.disconnects')
+            await self._disconnected.fire()
+            await asyncio.sleep(self._retry_interval)
 
     @property
     def on_event(self) -> Callable[[ListenerCallback[DockerEventMessage]], EventListener[[DockerEventMessage]]]:
         return self._events.listen
 
+    @property
+    def on_connect(self) -> Callable[[ListenerCallback[[]]], EventListener[[]]]:
+        return self._connected.listen
+
+    @property
+    def on_disconnect(self) -> Callable[[ListenerCallback[[]]], EventListener[[]]]:
+        return self._disconnected.listen
+
     def listen(self, listener: ListenerCallback[DockerEventMessage]) -> ListenerCallback[DockerEventMessage]:
         self._events.listen(listener)
         return listener
 
     async def close(self) -> None:
-        self._task.cancel()
-        await self._task
-        await self._client.close()
+        if self._task:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+
+docker_events = DockerEvents({'type': [DockerEventType.CONTAINER.value]})
@@ -0,0 +1,253 @@
+import asyncio
+import collections
+import contextlib
+import datetime
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Deque, Dict, List, Optional, Set
+
+from aiodocker.containers import DockerContainer
+from aiodocker.multiplexed import multiplexed_result_stream
+
+from ..app.config import config
+from ..utils.metrics import metrics
+
+# how many buffers of live lines a viewer may fall behind while it reads its history
+PENDING_BUFFERS = 4
+
+_TIMESTAMP = re.compile(r'(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d+))?(Z|[+-]\d\d:\d\d)')
+
+
+def parse_time(value: str) -> int:
+    """Nanoseconds since the epoch of an RFC 3339 timestamp or of unix seconds."""
+    try:
+        seconds, _, fraction = value.partition('.')
+        return int(seconds) * 10**9 + int(fraction[:9].ljust(9, '0'))
+    except ValueError:
+        pass
+    match = _TIMESTAMP.fullmatch(value)
+    if match is None:
+        raise ValueError(f'Invalid timestamp: {value}')
+    base, fraction, zone = match.groups()
+    moment = datetime.datetime.fromisoformat(base + ('+00:00' if zone == 'Z' else zone))
+    return int(moment.timestamp()) * 10**9 + int((fraction or '')[:9].ljust(9, '0'))
+
+
+def _docker_time(nanos: int) -> str:
+    # docker takes `since` and `until` as unix seconds, nanoseconds after the dot
+    return f'{nanos // 10**9}.{nanos % 10**9:09d}'
+
+
+@dataclass
+class LogLine:
+    # as docker reports it, RFC 3339 with nanoseconds
+    timestamp: str
+    # the line with its timestamp, like `container.log(timestamps=True)` returns it
+    line: str
+    nanos: Optional[int] = None
+
+    @classmethod
+    def parse(cls, line: str) -> 'LogLine':
+        timestamp, _, _ = line.partition(' ')
+        try:
+            nanos: Optional[int] = parse_time(timestamp)
+        except ValueError:
+            nanos = None
+        return cls(timestamp, line, nanos)
+
+
+def _seen(line: LogLine, last: Optional[int]) -> bool:
+    return last is not None and line.nanos is not None and line.nanos <= last
+
+
+async def read_logs(container: DockerContainer, **params: object) -> AsyncIterator[LogLine]:
+    """
+    Timestamped log lines of `container` as docker sends them, without buffering the whole response.
+    `container.log` only streams when following.
+    """
+    is_tty = (await container.show())['Config']['Tty']
+    params = {'stdout': True, 'stderr': True, 'timestamps': True, **params}
+    # `container.log` without follow reads the whole response into a list, so the request
+    # is made through `Docker._query` and the frames are split by `multiplexed_result_stream`
+    # like `container.log` does when following. Both are internal, aiodocker is pinned for this.
+    # no timeout, like the event stream, a followed log is read as long as there are viewers
+    async with container.docker._query(f'containers/{container.id}/logs', params=params, timeout=0) as response:
+        # tty output comes in chunks, not frames
+        partial = ''
+        async for chunk in multiplexed_result_stream(response, is_tty=is_tty):
+            lines = (partial + chunk).split('\n')
+            partial = lines.pop()
+            for line in lines:
+                yield LogLine.parse(line + '\n')
+        if partial:
+            yield LogLine.parse(partial)
+
+
+@dataclass(eq=False)
+class _Follower:
+    container: DockerContainer
+    viewers: Set['_Viewer'] = field(default_factory=set)
+    task: Optional['asyncio.Task[None]'] = None
+
+
+@dataclass(eq=False)
+class _Viewer:
+    follower: _Follower
+    queue: 'asyncio.Queue[Optional[LogLine]]'
+    lagged: bool = False
+    # live lines that came while the viewer read its history, up to `PENDING_BUFFERS`
+    # buffers of them, they don't hold up the upstream
+    pending: Optional[Deque[LogLine]] = field(default_factory=collections.deque)
+
+
+class LogStreams:
+    """
+    Followed container logs, one upstream docker stream per container shared by all of its viewers.
+    Once it has read its history, every viewer has a buffer of `buffer_size` lines the upstream
+    waits on when it's full, up to `PENDING_BUFFERS` times as many lines that come before are
+    kept aside for it. A viewer that doesn't take a line for `slow_viewer_timeout`, or that
+    falls further behind while reading its history, is disconnected instead of holding up the
+    others, it can continue from the timestamp of the last line it got.
+    """
+
+    def __init__(self, buffer_size: int, slow_viewer_timeout: float) -> None:
+        self.buffer_size = buffer_size
+        self.slow_viewer_timeout = slow_viewer_timeout
+        self._followers: Dict[str, _Follower] = {}
+        metrics.gauge('log_streams.upstreams', lambda: len(self._followers))
+        metrics.gauge('log_streams.viewers', lambda: sum(len(follower.viewers) for follower in self._followers.values()))
+
+    async def read(
+        self,
+        container: DockerContainer,
+        tail: Optional[int] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        follow: bool = True,
+    ) -> AsyncIterator[LogLine]:
+        """
+        The last `tail` lines written after `since` and up to `until`, nanoseconds since
+        the epoch, then the new lines as they come if following and there is no `until`.
+        """
+        params: Dict[str, object] = {'tail': 'all' if tail is None else tail}
+        if since is not None:
+            params['since'] = _docker_time(since)
+        if until is not None:
+            params['until'] = _docker_time(until)
+            follow = False
+        if not follow:
+            async for line in read_logs(container, **params):
+                if not _seen(line, since):
+                    yield line
+            return
+
+        # joined before reading the history, lines of both are told apart by their timestamps
+        viewer = self._join(container)
+        try:
+            last = since
+            async for line in read_logs(container, **params):
+                if not _seen(line, last):
+                    last = line.nanos if line.nanos is not None else last
+                    yield line
+            assert viewer.pending is not None
+            while viewer.pending:
+                line = viewer.pending.popleft()
+                if not _seen(line, last):
+                    yield line
+            # from here on the viewer is held to its buffer like the others
+            viewer.pending = None
+            while (line := await viewer.queue.get()) is not None:
+                if not _seen(line, last):
+                    yield line
+            if viewer.lagged:
+                logging.info(f"Disconnected a slow viewer of the logs of {container.id}")
+        finally:
+            self._leave(viewer)
+
+    def _join(self, container: DockerContainer) -> _Viewer:
+        follower = self._followers.get(container.id)
+        if follower is None:
+            follower = self._followers[container.id] = _Follower(container)
+            # lines written until the upstream is connected are replayed from its start
+            follower.task = asyncio.create_task(self._follow(follower, time.time_ns()))
+        viewer = _Viewer(follower, asyncio.Queue(self.buffer_size))
+        follower.viewers.add(viewer)
+        return viewer
+
+    def _leave(self, viewer: _Viewer) -> None:
+        follower = viewer.follower
+        follower.viewers.discard(viewer)
+        if not follower.viewers and self._followers.get(follower.container.id) is follower:
+            del self._followers[follower.container.id]
+            if follower.task:
+                follower.task.cancel()
+
+    async def _follow(self, follower: _Follower, since: int) -> None:
+        try:
+            async for line in read_logs(follower.container, follow=True, since=_docker_time(since)):
+                await self._publish(follower, line)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.warning(f"Log stream of container {follower.container.id} failed", exc_info=e)
+        finally:
+            if self._followers.get(follower.container.id) is follower:
+                del self._followers[follower.container.id]
+        # the container stopped, or the stream broke
+        for viewer in follower.viewers:
+            self._disconnect(viewer)
+
+    async def _publish(self, follower: _Follower, line: LogLine) -> None:
+        full: List[_Viewer] = []
+        behind: List[_Viewer] = []
+        for viewer in follower.viewers:
+            if viewer.pending is not None:
+                if len(viewer.pending) < self.buffer_size * PENDING_BUFFERS:
+                    viewer.pending.append(line)
+                else:
+                    behind.append(viewer)
+                continue
+            try:
+                viewer.queue.put_nowait(line)
+            except asyncio.QueueFull:
+                full.append(viewer)
+        for viewer in behind:
+            # it ends after its history and the lines kept aside for it
+            self._drop_slow_viewer(follower, viewer)
+        if full:
+            await asyncio.gather(*(self._put(follower, viewer, line) for viewer in full))
+        metrics.inc('log_streams.lines')
+
+    async def _put(self, follower: _Follower, viewer: _Viewer, line: LogLine) -> None:
+        try:
+            await asyncio.wait_for(viewer.queue.put(line), self.slow_viewer_timeout)
+        except asyncio.TimeoutError:
+            self._drop_slow_viewer(follower, viewer)
+
+    def _drop_slow_viewer(self, follower: _Follower, viewer: _Viewer) -> None:
+        follower.viewers.discard(viewer)
+        viewer.lagged = True
+        self._disconnect(viewer)
+        metrics.inc('log_streams.slow_viewers')
+
+    def _disconnect(self, viewer: _Viewer) -> None:
+        # the buffered lines are dropped so the end is seen right away
+        while not viewer.queue.empty():
+            viewer.queue.get_nowait()
+        viewer.queue.put_nowait(None)
+
+    async def close(self) -> None:
+        followers = list(self._followers.values())
+        self._followers.clear()
+        for follower in followers:
+            if follower.task:
+                follower.task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await follower.task
+            for viewer in follower.viewers:
+                self._disconnect(viewer)
+
+
+log_streams = LogStreams(config.LOG_STREAM_BUFFER_SIZE, config.LOG_STREAM_SLOW_VIEWER_TIMEOUT)
@@ -0,0 +1,218 @@
+import asyncio
+import contextlib
+import datetime
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Mapping, Optional
+
+from sqlalchemy import DateTime, case, literal, null, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..app.config import config
+from ..celery_tasks.tasks.service_tasks import proxy_latest_service
+from ..db.models.service import Service, ServiceStatusEnum
+from ..db.standalone_session import standalone_session
+from ..utils.clients import clients
+from ..utils.metrics import metrics
+from .events import DockerEventAction, DockerEventMessage, DockerEvents, docker_events
+from .utils import WorkbenchContainerLabels
+
+_ACTIVE_AFTER = {
+    DockerEventAction.START.value,
+    DockerEventAction.RESTART.value,
+    DockerEventAction.UNPAUSE.value,
+}
+_INACTIVE_AFTER = {
+    DockerEventAction.DIE.value,
+    DockerEventAction.OOM.value,
+}
+
+
+def _service_id(labels: Mapping[str, str]) -> Optional[int]:
+    if labels.get(WorkbenchContainerLabels.IS_SERVICE_CONTAINER.value) != '1':
+        return None
+    try:
+        return int(labels[WorkbenchContainerLabels.RESOURCE_ID.value])
+    except (KeyError, ValueError):
+        return None
+
+
+@dataclass
+class StatusChange:
+    status: ServiceStatusEnum
+    started_at: Optional[datetime.datetime]
+    # time.time() of the oldest change to the service not applied yet
+    observed_at: float
+
+
+class ServiceReconciler:
+    """
+    Keeps `Service.status` and `started_at` in line with the service containers.
+    Changes seen in container events are applied in one UPDATE per batch, at most
+    half of `max_lag` after the oldest of them, or as soon as `batch_size`
+    services changed. On every new event stream the service containers are
+    compared with the database first, for the changes missed while it was down.
+    `proxy_latest_service` runs again for the names whose latest running service changed.
+    """
+
+    def __init__(self, events: DockerEvents, max_lag: float, batch_size: int, retry_interval: float = 1) -> None:
+        self.max_lag = max_lag
+        self.batch_size = batch_size
+        self.retry_interval = retry_interval
+        self._pending: Dict[int, StatusChange] = {}
+        self._staged = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task[None]] = None
+        events.on_connect(self._resync)
+        events.on_event(self._on_event)
+        metrics.gauge('service_reconciler.pending', lambda: len(self._pending))
+        metrics.gauge('service_reconciler.current_lag', self.current_lag)
+
+    def current_lag(self) -> float:
+        if not self._pending:
+            return 0
+        return max(0, time.time() - min(change.observed_at for change in self._pending.values()))
+
+    def stage(self, service_id: int, change: StatusChange) -> None:
+        if (pending := self._pending.get(service_id)) is not None:
+            change.observed_at = min(change.observed_at, pending.observed_at)
+        self._pending[service_id] = change
+        self._staged.set()
+        if len(self._pending) >= self.batch_size:
+            self._full.set()
+
+    async def _on_event(self, event: DockerEventMessage) -> None:
+        service_id = _service_id(event.Actor.attributes)
+        if service_id is None:
+            return
+        if event.Action in _ACTIVE_AFTER:
+            status, started_at = ServiceStatusEnum.ACTIVE, event.timestamp
+        elif event.Action in _INACTIVE_AFTER:
+            status, started_at = ServiceStatusEnum.INACTIVE, None
+        else:
+            return
+        observed_at = event.timeNano / 1e9 if event.timeNano is not None else time.time()
+        self.stage(service_id, StatusChange(status, started_at, observed_at))
+
+    async def _resync(self) -> None:
+        docker = clients.docker()
+        containers = await docker.containers.list(
+            all=True,
+            filters={'label': [f'{WorkbenchContainerLabels.IS_SERVICE_CONTAINER.value}=1']}
+        )
+        running: Dict[int, str] = {}
+        for container in containers:
+            service_id = _service_id(container['Labels'] or {})
+            if service_id is not None and container['State'] == 'running':
+                running[service_id] = container.id
+        async with standalone_session() as session:
+            active = set((await session.execute(
+                select(Service.id).where(Service.status == ServiceStatusEnum.ACTIVE)
+            )).scalars())
+        now = time.time()
+        for service_id in active - running.keys():
+            self.stage(service_id, StatusChange(ServiceStatusEnum.INACTIVE, None, now))
+        for service_id in running.keys() - active:
+            # rare, only services started while nothing was listening
+            started_at = (await docker.containers.get(running[service_id]))['State']['StartedAt']
+            self.stage(service_id, StatusChange(
+                ServiceStatusEnum.ACTIVE,
+                datetime.datetime.fromisoformat(started_at) if started_at else None,
+                now
+            ))
+        metrics.inc('service_reconciler.resyncs')
+
+    async def _latest_running(self, session: AsyncSession, names: Iterable[str]) -> Dict[str, int]:
+        """Id of the service `proxy_latest_service` routes to, by name."""
+        rows = await session.execute(
+            select(Service.name, Service.id)
+            .where(
+                Service.name.in_(names),
+                Service.status == ServiceStatusEnum.ACTIVE,
+                Service.enabled == True  # noqa: E712
+            )
+            .order_by(Service.created_at.desc(), Service.id.desc())
+        )
+        latest: Dict[str, int] = {}
+        for name, service_id in rows:
+            latest.setdefault(name, service_id)
+        return latest
+
+    async def apply(self, changes: Dict[int, StatusChange]) -> None:
+        async with standalone_session() as session:
+            names = set((await session.execute(
+                select(Service.name).where(Service.id.in_(changes.keys()))
+            )).scalars())
+            before = await self._latest_running(session, names)
+            result = await session.execute(
+                update(Service)
+                .where(Service.id.in_(changes.keys()))
+                .values(
+                    status=case(
+                        {id: literal(change.status, Service.status.type) for id, change in changes.items()},
+                        value=Service.id
+                    ),
+                    started_at=case(
+                        {
+                            id: literal(change.started_at, DateTime(True)) if change.started_at else null()
+                            for id, change in changes.items()
+                        },
+                        value=Service.id
+                    ),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            after = await self._latest_running(session, names)
+            await session.commit()
+
+        lag = time.time() - min(change.observed_at for change in changes.values())
+        metrics.observe('service_reconciler.lag', lag)
+        metrics.inc('service_reconciler.batches')
+        metrics.inc('service_reconciler.updates', result.rowcount) # type: ignore
+        if lag > self.max_lag:
+            metrics.inc('service_reconciler.lag_exceeded')
+            logging.warning(f"Service status reconciled {lag:.2f}s after the change, over the {self.max_lag}s bound")
+        for name in sorted(name for name in names if before.get(name) != after.get(name)):
+            proxy_latest_service.delay(name)
+            metrics.inc('service_reconciler.proxy_updates')
+
+    async def _run(self) -> None:
+        while True:
+            await self._staged.wait()
+            oldest = min(change.observed_at for change in self._pending.values())
+            # more changes may follow, but the other half of the bound is left for the update
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._full.wait(), max(0, oldest + self.max_lag / 2 - time.time()))
+            batch, self._pending = self._pending, {}
+            self._staged.clear()
+            self._full.clear()
+            try:
+                await self.apply(batch)
+            except Exception as e:
+                logging.error("Couldn't reconcile service status", exc_info=e)
+                metrics.inc('service_reconciler.errors')
+                for service_id, change in batch.items():
+                    if (newer := self._pending.get(service_id)) is not None:
+                        newer.observed_at = min(newer.observed_at, change.observed_at)
+                    else:
+                        self.stage(service_id, change)
+                await asyncio.sleep(self.retry_interval)
+
+    def start(self) -> None:
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+
+service_reconciler = ServiceReconciler(
+    docker_events,
+    config.SERVICE_RECONCILE_MAX_LAG,
+    config.SERVICE_RECONCILE_BATCH_SIZE
+)
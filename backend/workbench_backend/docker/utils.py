@@ -33,6 +33,8 @@ from enum import Enum
 
 import nsenter  # type: ignore
 
+from ..utils.clients import clients
+
 EventParam = ParamSpec('EventParam')
 
 ListenerCallback: TypeAlias = Callable[EventParam, None | Awaitable[None]]
@@ -232,22 +234,22 @@ async def connect_container_to_networks(container: DockerContainer, user: User,
         except Exception as e:
             logging.error("Container network connect error",exc_info=e)
 
-    async with Docker() as client:
-        await asyncio.gather(*[
-            connect(client, id) for id in networks
-        ])
+    client = clients.docker()
+    await asyncio.gather(*[
+        connect(client, id) for id in networks
+    ])
 
 async def setup_container_routing(container_id: str) -> None:
     try:
-        async with Docker() as client:
-            container = await client.containers.get(container_id)
-            await container.show()
-            if not container['State'].get('Status') == 'running' or not container['State']['Pid']:
-                return
-            pid = container['State']['Pid']
-            with nsenter.Namespace(pid, 'net'):
-                proc = await asyncio.create_subprocess_exec('ip','route','add','192.168.200.0/24','via','10.20.22.1', stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
-                await proc.wait()
+        client = clients.docker()
+        container = await client.containers.get(container_id)
+        await container.show()
+        if not container['State'].get('Status') == 'running' or not container['State']['Pid']:
+            return
+        pid = container['State']['Pid']
+        with nsenter.Namespace(pid, 'net'):
+            proc = await asyncio.create_subprocess_exec('ip','route','add','192.168.200.0/24','via','10.20.22.1', stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+            await proc.wait()
     except Exception as e:
         logging.error("Container routing setup error",exc_info=e)
 
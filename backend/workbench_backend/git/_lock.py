@@ -30,7 +30,11 @@ def with_writer_lock(func: Callable[Concatenate[SelfType, P], Awaitable[T]]) ->
     @functools.wraps(func)
     async def wrapper(s: SelfType, /, *args: P.args, **kwargs: P.kwargs) -> T:
         async with writer_file_lock(s.root_path):
-            return await func(s, *args, **kwargs)
+            try:
+                return await func(s, *args, **kwargs)
+            finally:
+                # writers touch the working tree, cached status is stale
+                s.invalidate_state()
     return wrapper
 
 def with_reader_lock(func: Callable[Concatenate[SelfType, P], Awaitable[T]]) -> Callable[Concatenate[SelfType, P], Coroutine[Any, Any,T]]:
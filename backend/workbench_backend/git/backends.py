@@ -0,0 +1,275 @@
+import asyncio
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Literal, Optional, Tuple, TypeAlias
+
+import pygit2
+
+GIT_BACKEND_TYPES: TypeAlias = Literal['subprocess', 'pygit2']
+
+
+async def run_git_raw(cwd: str, *args: str, check: bool = True, **kwargs: Any) -> bytes:
+    process = await asyncio.create_subprocess_exec(
+        'git', *args,
+        cwd=cwd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        **kwargs
+    )
+    stdout, stderr = await process.communicate()
+    if check and process.returncode != 0:
+        raise RuntimeError(f"Git command failed: {' '.join(args)}\n{stderr.decode()}")
+    return stdout
+
+
+async def run_git(cwd: str, *args: str, check: bool = True, **kwargs: Any) -> str:
+    return (await run_git_raw(cwd, *args, check=check, **kwargs)).decode()
+
+
+class GitBackend(ABC):
+    """
+    Read side of a git repository. Every method must return exactly what the
+    equivalent porcelain `git` command would, so backends are interchangeable.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+
+    @abstractmethod
+    async def status(self) -> Dict[str, str]:
+        pass
+
+    @abstractmethod
+    async def get_branches(self) -> List[str]:
+        pass
+
+    @abstractmethod
+    async def get_tags(self) -> List[str]:
+        pass
+
+    @abstractmethod
+    async def get_head_shorthand(self) -> str:
+        pass
+
+    @abstractmethod
+    async def refish_exists(self, refish: str) -> bool:
+        pass
+
+    @abstractmethod
+    async def get_tagged_file_bytes(self, tag: str, file: str) -> Optional[bytes]:
+        pass
+
+    async def get_tagged_file_content(self, tag: str, file: str) -> Optional[str]:
+        data = await self.get_tagged_file_bytes(tag, file)
+        return data.decode() if data is not None else None
+
+    def close(self) -> None:
+        pass
+
+
+class SubprocessGitBackend(GitBackend):
+    """Forks a `git` process for every call."""
+
+    async def status(self) -> Dict[str, str]:
+        output = await run_git(self._path, 'status', '--porcelain')
+        status = {}
+        for line in output.strip().splitlines():
+            code, file = line.split()
+            status[file] = code.strip()
+        return status
+
+    async def get_branches(self) -> List[str]:
+        output = await run_git(self._path, 'branch', '--list')
+        return [line.strip().lstrip('* ').strip() for line in output.splitlines()]
+
+    async def get_tags(self) -> List[str]:
+        output = await run_git(self._path, 'tag', '--list')
+        return [line.strip() for line in output.splitlines()]
+
+    async def get_head_shorthand(self) -> str:
+        return (await run_git(self._path, 'rev-parse', '--abbrev-ref', 'HEAD')).strip()
+
+    async def refish_exists(self, refish: str) -> bool:
+        try:
+            await run_git(self._path, 'rev-parse', refish)
+            return True
+        except RuntimeError:
+            return False
+
+    async def get_tagged_file_bytes(self, tag: str, file: str) -> Optional[bytes]:
+        try:
+            return await run_git_raw(self._path, 'show', f"{tag}:{file}")
+        except RuntimeError:
+            return None
+
+
+class _Pygit2RepositoryPool:
+    """
+    Keeps opened libgit2 repositories alive between requests so the refs,
+    packfile indexes and object cache are not rebuilt on every call.
+    A libgit2 repository must not be used from several threads at once,
+    so every entry carries its own lock.
+    """
+
+    def __init__(self, max_size: int = 64) -> None:
+        self._max_size = max_size
+        self._repositories: OrderedDict[str, Tuple[pygit2.Repository, threading.Lock]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Tuple[pygit2.Repository, threading.Lock]:
+        with self._lock:
+            if path in self._repositories:
+                self._repositories.move_to_end(path)
+                return self._repositories[path]
+            entry = (pygit2.Repository(path), threading.Lock())
+            self._repositories[path] = entry
+            while len(self._repositories) > self._max_size:
+                # may still be in use by another thread, let it be collected
+                self._repositories.popitem(last=False)
+            return entry
+
+    def evict(self, path: str) -> None:
+        with self._lock:
+            self._repositories.pop(path, None)
+
+
+_pygit2_pool = _Pygit2RepositoryPool()
+
+
+class Pygit2GitBackend(GitBackend):
+    """
+    Reads refs, the index and objects in process through libgit2.
+    The calls are run in a worker thread, no `git` process is forked.
+    """
+
+    async def _run(self, func: Any, *args: Any) -> Any:
+        def _locked() -> Any:
+            repo, lock = _pygit2_pool.get(self._path)
+            with lock:
+                return func(repo, *args)
+        return await asyncio.to_thread(_locked)
+
+    async def status(self) -> Dict[str, str]:
+        return await self._run(_pygit2_status) # type: ignore
+
+    async def get_branches(self) -> List[str]:
+        return await self._run(_pygit2_branches) # type: ignore
+
+    async def get_tags(self) -> List[str]:
+        return await self._run(_pygit2_tags) # type: ignore
+
+    async def get_head_shorthand(self) -> str:
+        return await self._run(_pygit2_head_shorthand) # type: ignore
+
+    async def refish_exists(self, refish: str) -> bool:
+        return await self._run(_pygit2_refish_exists, refish) # type: ignore
+
+    async def get_tagged_file_bytes(self, tag: str, file: str) -> Optional[bytes]:
+        return await self._run(_pygit2_file_data, f"{tag}:{file}") # type: ignore
+
+    def close(self) -> None:
+        _pygit2_pool.evict(self._path)
+
+
+def _pygit2_porcelain_code(flags: int) -> str:
+    if flags & pygit2.GIT_STATUS_CONFLICTED:
+        return 'UU'
+    if flags & pygit2.GIT_STATUS_WT_NEW and not flags & (
+        pygit2.GIT_STATUS_INDEX_NEW
+        | pygit2.GIT_STATUS_INDEX_MODIFIED
+        | pygit2.GIT_STATUS_INDEX_RENAMED
+        | pygit2.GIT_STATUS_INDEX_TYPECHANGE
+    ):
+        return '??'
+
+    index = ' '
+    if flags & pygit2.GIT_STATUS_INDEX_NEW:
+        index = 'A'
+    elif flags & pygit2.GIT_STATUS_INDEX_MODIFIED:
+        index = 'M'
+    elif flags & pygit2.GIT_STATUS_INDEX_DELETED:
+        index = 'D'
+    elif flags & pygit2.GIT_STATUS_INDEX_RENAMED:
+        index = 'R'
+    elif flags & pygit2.GIT_STATUS_INDEX_TYPECHANGE:
+        index = 'T'
+
+    worktree = ' '
+    if flags & pygit2.GIT_STATUS_WT_MODIFIED:
+        worktree = 'M'
+    elif flags & pygit2.GIT_STATUS_WT_DELETED:
+        worktree = 'D'
+    elif flags & pygit2.GIT_STATUS_WT_RENAMED:
+        worktree = 'R'
+    elif flags & pygit2.GIT_STATUS_WT_TYPECHANGE:
+        worktree = 'T'
+
+    return (index + worktree).strip()
+
+
+def _pygit2_status(repo: pygit2.Repository) -> Dict[str, str]:
+    status: Dict[str, str] = {}
+    # 'normal' collapses untracked directories into 'dir/' just like `git status`
+    for file, flags in repo.status(untracked_files='normal', ignored=False).items():
+        if flags == pygit2.GIT_STATUS_CURRENT or flags & pygit2.GIT_STATUS_IGNORED:
+            continue
+        status[file] = _pygit2_porcelain_code(flags)
+    return status
+
+
+def _pygit2_branches(repo: pygit2.Repository) -> List[str]:
+    branches = sorted(repo.branches.local)
+    if not repo.head_is_unborn and repo.head_is_detached:
+        branches.insert(0, f"(HEAD detached at {str(repo.head.target)[:7]})")
+    return branches
+
+
+def _pygit2_tags(repo: pygit2.Repository) -> List[str]:
+    prefix = 'refs/tags/'
+    return sorted(
+        ref[len(prefix):] for ref in repo.references if ref.startswith(prefix)
+    )
+
+
+def _pygit2_head_shorthand(repo: pygit2.Repository) -> str:
+    if repo.head_is_unborn:
+        raise RuntimeError("Git command failed: rev-parse --abbrev-ref HEAD\nHEAD is unborn")
+    if repo.head_is_detached:
+        return 'HEAD'
+    return str(repo.head.shorthand)
+
+
+def _pygit2_refish_exists(repo: pygit2.Repository, refish: str) -> bool:
+    try:
+        repo.revparse_single(refish)
+        return True
+    except (KeyError, ValueError, pygit2.GitError):
+        return False
+
+
+def _pygit2_file_data(repo: pygit2.Repository, spec: str) -> Optional[bytes]:
+    try:
+        obj = repo.revparse_single(spec)
+    except (KeyError, ValueError, pygit2.GitError):
+        return None
+    if not isinstance(obj, pygit2.Blob):
+        return None
+    return bytes(obj.data)
+
+
+_BACKENDS: Dict[GIT_BACKEND_TYPES, type[GitBackend]] = {
+    'subprocess': SubprocessGitBackend,
+    'pygit2': Pygit2GitBackend,
+}
+
+
+def create_backend(path: str, backend_type: Optional[GIT_BACKEND_TYPES] = None) -> GitBackend:
+    if backend_type is None:
+        from ..app.config import config
+        backend_type = config.GIT_BACKEND
+    if backend_type == 'pygit2' and not os.path.isdir(os.path.join(path, '.git')):
+        # libgit2 cannot open a path that is not (yet) a repository
+        return SubprocessGitBackend(path)
+    return _BACKENDS[backend_type](path)
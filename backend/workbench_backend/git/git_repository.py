@@ -1,33 +1,37 @@
 import asyncio
 import os
 import shutil
-from typing import Any, List, Optional, Self
+from typing import Any, Dict, List, Optional, Self, TypedDict
 
 from ..utils import asyncify
 from ..utils.timed import timed_async
+from .backends import GitBackend, create_backend, run_git
+from .state_cache import git_state_cache
+
+
+class GitState(TypedDict):
+    head: str
+    tags: List[str]
+    branches: List[str]
+    status: Dict[str, str]
 
 
 class AsyncGitRepository:
 
-    def __init__(self, path: str):
+    def __init__(self, path: str, backend: Optional[GitBackend] = None):
         self._path = path
+        self._backend = backend or create_backend(path)
 
     @property
     def root_path(self) -> str:
         return self._path
 
+    @property
+    def backend(self) -> GitBackend:
+        return self._backend
+
     async def _git(self, *args: str, check: bool = True, **kwargs: Any) -> str:
-        process = await asyncio.create_subprocess_exec(
-            'git', *args,
-            cwd=self._path,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            **kwargs
-        )
-        stdout, stderr = await process.communicate()
-        if check and process.returncode != 0:
-            raise RuntimeError(f"Git command failed: {' '.join(args)}\n{stderr.decode()}")
-        return stdout.decode()
+        return await run_git(self._path, *args, check=check, **kwargs)
 
     @classmethod
     async def init_repository(cls, path: str ) -> Self:
@@ -61,6 +65,8 @@ class AsyncGitRepository:
 
     @asyncify
     def remove_repository(self) -> None:
+        self._backend.close()
+        self.invalidate_state()
         if os.path.exists(self._path):
             shutil.rmtree(self._path, ignore_errors=True)
         else:
@@ -114,13 +120,11 @@ class AsyncGitRepository:
 
     @timed_async
     async def get_branches(self) -> List[str]:
-        output = await self._git('branch', '--list')
-        return [line.strip().lstrip('* ').strip() for line in output.splitlines()]
+        return await self._backend.get_branches()
 
     @timed_async
     async def get_tags(self) -> List[str]:
-        output = await self._git('tag', '--list')
-        return [line.strip() for line in output.splitlines()]
+        return await self._backend.get_tags()
 
     async def get_stashes_length(self) -> int:
         output = await self._git('stash', 'list')
@@ -128,33 +132,43 @@ class AsyncGitRepository:
 
     @timed_async
     async def status(self) -> dict[str, str]:
-        output = await self._git('status', '--porcelain')
-        status = {}
-        for line in output.strip().splitlines():
-            code, file = line.split()
-            status[file] = code.strip()
-        return status
+        return await self._backend.status()
 
     async def create_branch(self, branch_name: str) -> None:
         await self._git('branch', branch_name)
 
     @timed_async
     async def get_head_shorthand(self) -> str:
-        return (await self._git('rev-parse', '--abbrev-ref', 'HEAD')).strip()
+        return await self._backend.get_head_shorthand()
+
+    async def get_state(self) -> GitState:
+        return await git_state_cache.get_state(self)
+
+    def invalidate_state(self) -> None:
+        git_state_cache.invalidate(self._path)
+
+    async def compute_state(self) -> GitState:
+        head, tags, branches, status = await asyncio.gather(
+            self.get_head_shorthand(),
+            self.get_tags(),
+            self.get_branches(),
+            self.status(),
+        )
+        return {
+            "head": head,
+            "tags": tags,
+            "branches": branches,
+            "status": status,
+        }
 
     async def get_tagged_file_content(self, tag: str, file: str) -> Optional[str]:
-        try:
-            output = await self._git('show', f"{tag}:{file}")
-            return output
-        except RuntimeError:
-            return None
+        return await self._backend.get_tagged_file_content(tag, file)
+
+    async def get_tagged_file_bytes(self, tag: str, file: str) -> Optional[bytes]:
+        return await self._backend.get_tagged_file_bytes(tag, file)
 
     async def refish_exists(self, refish: str) -> bool:
-        try:
-            await self._git('rev-parse', refish)
-            return True
-        except RuntimeError:
-            return False
+        return await self._backend.refish_exists(refish)
 
     # TODO: This barely works, directories are not copied
     async def copy_tagged_version(self, tag: str, to_folder: str) -> None:
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import time
+from typing import TYPE_CHECKING, Dict, Tuple, TypeAlias
+
+from ..utils.metrics import metrics
+
+if TYPE_CHECKING:
+    from .git_repository import AsyncGitRepository, GitState
+
+StateKey: TypeAlias = Tuple[int, ...]
+
+
+def _mtime(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def state_key(path: str) -> StateKey:
+    """
+    Ref and index updates are written to a lock file that is renamed over the
+    target, so HEAD/index/packed-refs and the directories holding loose refs
+    all get a new mtime whenever git changes them.
+    """
+    git_dir = os.path.join(path, '.git')
+    key = [
+        _mtime(os.path.join(git_dir, 'HEAD')),
+        _mtime(os.path.join(git_dir, 'index')),
+        _mtime(os.path.join(git_dir, 'packed-refs')),
+    ]
+    for refs in ('refs/heads', 'refs/tags'):
+        for root, _dirs, _files in os.walk(os.path.join(git_dir, refs)):
+            key.append(_mtime(root))
+    return tuple(key)
+
+
+class GitStateCache:
+    """
+    Caches `AsyncGitRepository.get_state` per repository.
+    Changes under `.git` are detected through `state_key`, working tree changes
+    must be reported with `invalidate` (file watcher, writes through the API).
+    The ttl bounds staleness for edits nobody reported.
+    """
+
+    def __init__(self, ttl: float = 60) -> None:
+        self._ttl = ttl
+        self._entries: Dict[str, Tuple[StateKey, float, 'GitState']] = {}
+        self._pending: Dict[str, Tuple[StateKey, 'asyncio.Future[GitState]']] = {}
+        self._generations: Dict[str, int] = {}
+
+    async def get_state(self, repo: 'AsyncGitRepository') -> 'GitState':
+        path = repo.root_path
+        key = state_key(path)
+        entry = self._entries.get(path)
+        if entry and entry[0] == key and time.monotonic() - entry[1] < self._ttl:
+            metrics.inc('git_state_cache.hits')
+            return entry[2]
+
+        pending = self._pending.get(path)
+        if pending and pending[0] == key:
+            # concurrent misses share one computation
+            metrics.inc('git_state_cache.coalesced')
+            task = pending[1]
+        else:
+            metrics.inc('git_state_cache.misses')
+            task = asyncio.ensure_future(
+                self._compute(repo, key, self._generations.get(path, 0))
+            )
+            self._pending[path] = (key, task)
+            task.add_done_callback(lambda t: self._drop_pending(path, t))
+        # a cancelled caller must not cancel the computation others wait for
+        return await asyncio.shield(task)
+
+    async def _compute(self, repo: 'AsyncGitRepository', key: StateKey, generation: int) -> 'GitState':
+        state = await repo.compute_state()
+        # do not store a result that was invalidated while computing
+        if self._generations.get(repo.root_path, 0) == generation:
+            self._entries[repo.root_path] = (key, time.monotonic(), state)
+        return state
+
+    def _drop_pending(self, path: str, task: 'asyncio.Future[GitState]') -> None:
+        pending = self._pending.get(path)
+        if pending and pending[1] is task:
+            del self._pending[path]
+
+    def invalidate(self, path: str) -> None:
+        metrics.inc('git_state_cache.invalidations')
+        self._generations[path] = self._generations.get(path, 0) + 1
+        self._entries.pop(path, None)
+        self._pending.pop(path, None)
+
+    def hit_ratio(self) -> float:
+        hits = metrics.counter('git_state_cache.hits')
+        total = hits + metrics.counter('git_state_cache.misses')
+        return hits / total if total else 0
+
+
+def _create_cache() -> GitStateCache:
+    from ..app.config import config
+    return GitStateCache(ttl=config.GIT_STATE_CACHE_TTL)
+
+
+git_state_cache = _create_cache()
+metrics.gauge('git_state_cache.hit_ratio', git_state_cache.hit_ratio)
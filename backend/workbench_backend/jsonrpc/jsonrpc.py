@@ -1,6 +1,6 @@
 import asyncio
 import inspect
-import json
+import weakref
 from typing import (
     Any,
     Awaitable,
@@ -11,11 +11,16 @@ from typing import (
     Optional,
     ParamSpec,
     Self,
+    Tuple,
+    TypeAlias,
     TypeVar,
 )
 
+import orjson
 from pydantic import BaseModel, Field
 
+from ..utils.metrics import metrics
+
 
 class RPCRequest(BaseModel):
     jsonrpc: Literal['2.0']
@@ -55,6 +60,46 @@ def INTERNAL_ERROR(data: Optional[Any] = None) -> RPCError:
 
 
 
+RPCMessage: TypeAlias = RPCResponse | List[RPCResponse] | RPCRequest | List[RPCRequest]
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, bytes):
+        # stream output, chunks can end inside a multi byte character
+        return obj.decode(errors='replace')
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode='json', exclude_none=True)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def _message_dict(message: RPCResponse | RPCRequest) -> Dict[str, Any]:
+    if isinstance(message, RPCRequest):
+        result: Dict[str, Any] = {'jsonrpc': message.jsonrpc, 'method': message.method}
+        if message.params is not None:
+            result['params'] = message.params
+    else:
+        result = {'jsonrpc': message.jsonrpc}
+        if message.result is not None:
+            result['result'] = message.result
+        if message.error is not None:
+            result['error'] = message.error
+    if message.id is not None:
+        result['id'] = message.id
+    return result
+
+
+def encode_message(message: RPCMessage) -> str:
+    """
+    Serializes a message the way `jsonable_encoder(message, exclude_none=True)`
+    would, without walking the params and results in Python first.
+    `None` values in plain dicts are kept as `null`.
+    """
+    content = [_message_dict(m) for m in message] if isinstance(message, list) else _message_dict(message)
+    return orjson.dumps(content, default=_json_default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
 ReturnType = TypeVar('ReturnType')
 ParamType = ParamSpec('ParamType')
 def register(f: Optional[Callable[ParamType, ReturnType]] = None,*,name: Optional[str] = None): # type: ignore
@@ -69,10 +114,114 @@ def register(f: Optional[Callable[ParamType, ReturnType]] = None,*,name: Optiona
     return decorator(f) if callable(f) else decorator
 
 
+# Process output notifications, a stream is identified by the method and these params.
+# Consecutive chunks of a stream can be merged and their buffering is bounded.
+STREAM_NOTIFICATIONS: Dict[str, Tuple[str, ...]] = {
+    'on_stream': ('pid',),
+    'on_task_stream': ('id', 'name'),
+}
+
+
+class _NotificationBatch:
+    """
+    Notifications waiting to be sent as one JSON-RPC batch array.
+    Consecutive chunks of the same stream are merged into one notification.
+    """
+
+    def __init__(self) -> None:
+        self.items: List[Tuple[str, Dict[str, Any] | Tuple[Any, ...], List[Any]]] = []
+        self.size = 0
+
+    def add(self, method: str, params: Dict[str, Any] | Tuple[Any, ...]) -> None:
+        data = params.get('data') if isinstance(params, dict) else None
+        if isinstance(data, (str, bytes)):
+            self.size += len(data)
+            if self.items and method in STREAM_NOTIFICATIONS:
+                last_method, last_params, chunks = self.items[-1]
+                if (
+                    last_method == method
+                    and chunks
+                    and type(chunks[-1]) is type(data)
+                    and isinstance(last_params, dict)
+                    and all(last_params.get(key) == params.get(key) for key in STREAM_NOTIFICATIONS[method])
+                ):
+                    chunks.append(data)
+                    return
+            self.items.append((method, params, [data]))
+        else:
+            self.items.append((method, params, []))
+
+    def requests(self) -> List[RPCRequest]:
+        requests = []
+        for method, params, chunks in self.items:
+            if len(chunks) > 1:
+                params = {**params, 'data': chunks[0][:0].join(chunks)} # type: ignore
+            # params are built by us, validation would only cost time
+            requests.append(RPCRequest.model_construct(jsonrpc='2.0', method=method, params=params, id=None))
+        return requests
+
+
+StreamKey: TypeAlias = Tuple[Any, ...]
+
+STREAM_BUFFER_POLICY: TypeAlias = Literal['drop', 'block']
+
+
+def _stream_key(method: str, params: Dict[str, Any]) -> StreamKey:
+    return (method, *(params.get(key) for key in STREAM_NOTIFICATIONS[method]))
+
+
+class _StreamBuffers:
+    """
+    Bytes of stream output queued but not yet taken by the sender, per stream.
+    Past `high_water` a stream either drops output, reported later with an
+    elided marker, or blocks the producer until the sender catches up.
+    """
+
+    def __init__(self, high_water: int, policy: STREAM_BUFFER_POLICY, name: str) -> None:
+        self.high_water = high_water
+        self.policy = policy
+        self.name = name
+        self.occupancy: Dict[StreamKey, int] = {}
+        self.elided: Dict[StreamKey, Tuple[int, Dict[str, Any]]] = {}
+        self.space = asyncio.Condition()
+
+    def fits(self, key: StreamKey, size: int) -> bool:
+        occupied = self.occupancy.get(key, 0)
+        # an empty buffer always takes a chunk, however large
+        return occupied == 0 or occupied + size <= self.high_water
+
+    @property
+    def total(self) -> int:
+        return sum(self.occupancy.values())
+
+
+_stream_buffers: 'weakref.WeakSet[JsonRpc]' = weakref.WeakSet()
+
+
+def _collect_stream_buffers() -> Dict[str, float]:
+    result: Dict[str, float] = {'stream_buffer.sessions': 0, 'stream_buffer.bytes': 0}
+    for rpc in list(_stream_buffers):
+        buffers = rpc._streams
+        if buffers is None:
+            continue
+        result['stream_buffer.sessions'] += 1
+        result['stream_buffer.bytes'] += buffers.total
+        result[f'stream_buffer.session.{buffers.name}.bytes'] = buffers.total
+        result[f'stream_buffer.session.{buffers.name}.elided_bytes'] = sum(count for count, _ in buffers.elided.values())
+    return result
+
+
+metrics.collector(_collect_stream_buffers)
+
+
 class JsonRpc:
     def __init__(self) -> None:
         self._rpc_methods: Dict[str, Callable[..., Any]] = {}
-        self._results_queue: asyncio.Queue[RPCResponse | List[RPCResponse] | RPCRequest | None] = asyncio.Queue()
+        self._results_queue: asyncio.Queue[RPCMessage | None] = asyncio.Queue()
+        self._batch: Optional[_NotificationBatch] = None
+        self._batch_limits: Tuple[int, int, float] = (0, 0, 0)
+        self._batch_timer: Optional[asyncio.TimerHandle] = None
+        self._streams: Optional[_StreamBuffers] = None
         for attr in dir(self):
             obj = getattr(self,attr)
             if callable(obj) and getattr(obj,'_rpc',False):
@@ -123,8 +272,8 @@ class JsonRpc:
 
     async def __dispatch(self, data: str) -> Optional[RPCResponse] | List[RPCResponse]:
         try:
-            parsed = json.loads(data)
-        except json.JSONDecodeError as e:
+            parsed = orjson.loads(data)
+        except orjson.JSONDecodeError as e:
             return RPCResponse(
                 error=PARSE_ERROR(str(e))
             )
@@ -143,21 +292,118 @@ class JsonRpc:
     async def dispatch(self, data: str) -> Optional[RPCResponse] | List[RPCResponse]:
         result = await self.__dispatch(data)
         if result is not None:
+            # keep notifications sent before the response in front of it
+            self._flush_batch()
             await self._results_queue.put(result)
         return result
 
+    def enable_batching(self, max_items: int = 100, max_bytes: int = 64 * 1024, max_delay: float = 0.025) -> None:
+        """
+        Notifications are sent as JSON-RPC batch arrays, flushed when `max_items`
+        notifications or `max_bytes` of stream data are queued, or `max_delay`
+        seconds after the first one.
+        """
+        self._batch = _NotificationBatch()
+        self._batch_limits = (max_items, max_bytes, max_delay)
+
+    def enable_stream_limits(self, high_water: int, policy: STREAM_BUFFER_POLICY = 'drop', name: Optional[str] = None) -> None:
+        """
+        Bounds the output of every stream waiting to be sent to `high_water` bytes.
+        With `drop` the excess is replaced by a "N bytes elided" marker, with
+        `block` `notify` waits, so the reader of the stream stops reading.
+        """
+        self._streams = _StreamBuffers(high_water, policy, name or str(id(self)))
+        _stream_buffers.add(self)
+
     async def notify(self, method: str, *args: Any, **kwargs: Any) -> None:
         assert not (args and kwargs), "Only use args or kwargs"
-        await self._results_queue.put(RPCRequest(jsonrpc="2.0",method=method,params=args if args else kwargs))
+        data = kwargs.get('data')
+        if self._streams is not None and method in STREAM_NOTIFICATIONS and isinstance(data, (str, bytes)):
+            await self._notify_stream(self._streams, method, kwargs, data)
+            return
+        await self._enqueue(method, args if args else kwargs)
+
+    async def _enqueue(self, method: str, params: Dict[str, Any] | Tuple[Any, ...]) -> None:
+        if self._batch is None:
+            await self._results_queue.put(RPCRequest(jsonrpc="2.0",method=method,params=params))
+            return
+        max_items, max_bytes, max_delay = self._batch_limits
+        self._batch.add(method, params)
+        if len(self._batch.items) >= max_items or self._batch.size >= max_bytes:
+            self._flush_batch()
+        elif self._batch_timer is None:
+            self._batch_timer = asyncio.get_running_loop().call_later(max_delay, self._flush_batch)
+
+    async def _notify_stream(self, streams: _StreamBuffers, method: str, params: Dict[str, Any], data: str | bytes) -> None:
+        key = _stream_key(method, params)
+        if not streams.fits(key, len(data)):
+            if streams.policy == 'drop':
+                elided, _ = streams.elided.get(key, (0, params))
+                streams.elided[key] = (elided + len(data), params)
+                metrics.inc('stream_buffer.elided_bytes', len(data))
+                return
+            metrics.inc('stream_buffer.blocked')
+            async with streams.space:
+                await streams.space.wait_for(lambda: streams.fits(key, len(data)))
+        await self._enqueue_elided(streams, key)
+        streams.occupancy[key] = streams.occupancy.get(key, 0) + len(data)
+        await self._enqueue(method, params)
+
+    async def _enqueue_elided(self, streams: _StreamBuffers, key: StreamKey) -> None:
+        if key not in streams.elided:
+            return
+        elided, params = streams.elided.pop(key)
+        marker = f"\r\n[{elided} bytes elided]\r\n"
+        data = marker.encode() if isinstance(params['data'], bytes) else marker
+        streams.occupancy[key] = streams.occupancy.get(key, 0) + len(data)
+        await self._enqueue(key[0], {**params, 'data': data})
+
+    async def _release(self, item: Any) -> None:
+        streams = self._streams
+        if streams is None:
+            return
+        requests = item if isinstance(item, list) else [item]
+        released = []
+        for request in requests:
+            if not isinstance(request, RPCRequest) or request.method not in STREAM_NOTIFICATIONS:
+                continue
+            if not isinstance(request.params, dict) or not isinstance(request.params.get('data'), (str, bytes)):
+                continue
+            key = _stream_key(request.method, request.params)
+            occupied = streams.occupancy.get(key, 0) - len(request.params['data'])
+            if occupied > 0:
+                streams.occupancy[key] = occupied
+            else:
+                streams.occupancy.pop(key, None)
+            released.append(key)
+        if not released:
+            return
+        # report dropped output as soon as the stream drained
+        for key in released:
+            if key in streams.elided and key not in streams.occupancy:
+                await self._enqueue_elided(streams, key)
+        async with streams.space:
+            streams.space.notify_all()
+
+    def _flush_batch(self) -> None:
+        if self._batch_timer:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        if not self._batch or not self._batch.items:
+            return
+        self._results_queue.put_nowait(self._batch.requests())
+        self._batch = _NotificationBatch()
 
     async def end(self) ->  None:
+        self._flush_batch()
         await self._results_queue.put(None)
 
     def __aiter__(self) -> Self:
         return self
 
-    async def __anext__(self) -> RPCResponse | List[RPCResponse] | RPCRequest:
+    async def __anext__(self) -> RPCMessage:
         r = await self._results_queue.get()
         if r is None:
             raise StopAsyncIteration()
+        await self._release(r)
         return r
@@ -4,12 +4,12 @@ import tarfile
 from pathlib import Path
 from typing import Dict, Literal, TypeAlias, TypedDict, Unpack
 
-import aiodocker
 import aiofiles
 from jinja2 import Environment, FileSystemLoader, PrefixLoader, Template
 
 from ..docker.utils import ContainerConfigBuilder
 from ..utils.asyncify import asyncify
+from ..utils.clients import clients
 
 TEMPLATES_ROOT = (Path(__file__).resolve().parent / '_repository_templates').resolve()
 
@@ -89,34 +89,34 @@ class RepositoryTemplate:
 
         script_data = create_tar_with_script(script_path, arcname=script_path.name)
 
-        async with aiodocker.Docker() as client:
-            container = await client.containers.create(config)
-            try:
-                await container.start()
-                await container.put_archive(path='/tmp', data=script_data)
-
-                exec_instance = await container.exec(
-                    cmd=["bash", f"/tmp/{script_path.name}"],
-                    workdir='/workspace',
-                    user='root'
-                )
-
-                stream = exec_instance.start(detach=False)
-                stdout, stderr = "", ""
-
-                async with stream as s:
-                    while (msg := await s.read_out()) is not None:
-                        if msg.stream == 1:
-                            stdout += msg.data.decode()
-                        elif msg.stream == 2:
-                            stderr += msg.data.decode()
-
-                await exec_instance.inspect()
-
-                if stderr:
-                    print(f"[stderr] {stderr}")
-                if stdout:
-                    print(f"[stdout] {stdout}")
-
-            finally:
-                await container.delete(force=True)
+        client = clients.docker()
+        container = await client.containers.create(config)
+        try:
+            await container.start()
+            await container.put_archive(path='/tmp', data=script_data)
+
+            exec_instance = await container.exec(
+                cmd=["bash", f"/tmp/{script_path.name}"],
+                workdir='/workspace',
+                user='root'
+            )
+
+            stream = exec_instance.start(detach=False)
+            stdout, stderr = "", ""
+
+            async with stream as s:
+                while (msg := await s.read_out()) is not None:
+                    if msg.stream == 1:
+                        stdout += msg.data.decode()
+                    elif msg.stream == 2:
+                        stderr += msg.data.decode()
+
+            await exec_instance.inspect()
+
+            if stderr:
+                print(f"[stderr] {stderr}")
+            if stdout:
+                print(f"[stdout] {stdout}")
+
+        finally:
+            await container.delete(force=True)
@@ -0,0 +1,189 @@
+import asyncio
+import contextlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import aiodocker
+import aiohttp
+from redis import asyncio as aioredis
+
+from ..app.config import config
+from .metrics import metrics
+
+UNIX_PREFIX = 'unix://'
+
+
+def _connector_counts(connector: Optional[aiohttp.BaseConnector]) -> Dict[str, int]:
+    if connector is None or connector.closed:
+        return {'open_connections': 0, 'connections_in_use': 0}
+    in_use = len(connector._acquired)
+    idle = sum(len(conns) for conns in connector._conns.values())
+    return {'open_connections': in_use + idle, 'connections_in_use': in_use}
+
+
+def _pool_counts(pool: Optional[aioredis.ConnectionPool]) -> Dict[str, int]:
+    if pool is None:
+        return {'open_connections': 0, 'connections_in_use': 0}
+    in_use = [conn for conn in pool._in_use_connections if conn.is_connected]
+    idle = [conn for conn in pool._available_connections if conn and conn.is_connected]
+    return {'open_connections': len(in_use) + len(idle), 'connections_in_use': len(in_use)}
+
+
+class ClientRegistry:
+    """
+    Docker, redis and HTTP clients shared by the process, each created on first use
+    with a bounded connection pool. Commands that block on the redis server until
+    there is something to read get a redis client with a pool of their own, so
+    they can't take the connections of the others. Clients belong to the event loop they were
+    created on, a different loop gets new ones. While started, the docker daemon
+    and redis are checked every `health_check_interval` seconds.
+    Open connections are reported as `clients.<type>.open_connections`.
+    """
+
+    def __init__(
+        self,
+        docker_host: str,
+        redis_url: str,
+        docker_max_connections: int,
+        redis_max_connections: int,
+        http_max_connections: int,
+        health_check_interval: float,
+        blocking_redis_max_connections: int,
+    ) -> None:
+        self.docker_host = docker_host
+        self.redis_url = redis_url
+        self.docker_max_connections = docker_max_connections
+        self.redis_max_connections = redis_max_connections
+        self.http_max_connections = http_max_connections
+        self.health_check_interval = health_check_interval
+        self.blocking_redis_max_connections = blocking_redis_max_connections
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._docker: Optional[aiodocker.Docker] = None
+        self._redis: Optional[aioredis.Redis] = None
+        self._blocking_redis: Optional[aioredis.Redis] = None
+        self._http: Optional[aiohttp.ClientSession] = None
+        self._healthy: Dict[str, bool] = {}
+        self._task: Optional[asyncio.Task[None]] = None
+        metrics.collector(self._collect)
+
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # connections of a finished loop can't be used or closed anymore
+            self._docker = self._redis = self._blocking_redis = self._http = None
+            self._task = None
+            self._healthy.clear()
+            self._loop = loop
+
+    def docker(self) -> aiodocker.Docker:
+        self._bind_loop()
+        if self._docker is None:
+            if self.docker_host.startswith(UNIX_PREFIX):
+                connector = aiohttp.UnixConnector(
+                    self.docker_host[len(UNIX_PREFIX):],
+                    limit=self.docker_max_connections
+                )
+                # the host name only makes up the request urls
+                self._docker = aiodocker.Docker(f'{UNIX_PREFIX}localhost', connector=connector)
+            else:
+                self._docker = aiodocker.Docker(self.docker_host)
+        return self._docker
+
+    def _redis_client(self, max_connections: int) -> aioredis.Redis:
+        pool = aioredis.BlockingConnectionPool.from_url(
+            self.redis_url,
+            max_connections=max_connections,
+            health_check_interval=self.health_check_interval,
+            decode_responses=True
+        )
+        return aioredis.Redis(connection_pool=pool)
+
+    def redis(self) -> aioredis.Redis:
+        self._bind_loop()
+        if self._redis is None:
+            self._redis = self._redis_client(self.redis_max_connections)
+        return self._redis
+
+    def blocking_redis(self) -> aioredis.Redis:
+        """For commands that wait on the server, like XREAD with BLOCK."""
+        self._bind_loop()
+        if self._blocking_redis is None:
+            self._blocking_redis = self._redis_client(self.blocking_redis_max_connections)
+        return self._blocking_redis
+
+    def http(self) -> aiohttp.ClientSession:
+        self._bind_loop()
+        if self._http is None:
+            self._http = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.http_max_connections))
+        return self._http
+
+    async def check_health(self) -> Dict[str, bool]:
+        """Pings the clients created so far."""
+        checks: Dict[str, Callable[[], Awaitable[Any]]] = {}
+        if self._docker is not None:
+            checks['docker'] = self._docker.version
+        if self._redis is not None:
+            checks['redis'] = self._redis.ping
+        for kind, check in checks.items():
+            try:
+                await asyncio.wait_for(check(), self.health_check_interval)
+                self._healthy[kind] = True
+            except (aiodocker.DockerError, aiohttp.ClientError, aioredis.RedisError, OSError, asyncio.TimeoutError) as e:
+                if self._healthy.get(kind, True):
+                    logging.warning(f"{kind} client failed its health check", exc_info=e)
+                self._healthy[kind] = False
+                metrics.inc(f'clients.{kind}.health_check_errors')
+        return dict(self._healthy)
+
+    async def _health_checks(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            await self.check_health()
+
+    def start(self) -> None:
+        self._bind_loop()
+        if not self._task:
+            self._task = asyncio.create_task(self._health_checks())
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self._docker is not None:
+            await self._docker.close()
+        for redis in (self._redis, self._blocking_redis):
+            if redis is not None:
+                await redis.aclose(close_connection_pool=True)
+        if self._http is not None:
+            await self._http.close()
+        self._docker = self._redis = self._blocking_redis = self._http = None
+        self._healthy.clear()
+
+    def _collect(self) -> Dict[str, float]:
+        counts = {
+            'docker': _connector_counts(self._docker.connector if self._docker else None),
+            'redis': _pool_counts(self._redis.connection_pool if self._redis else None),
+            'blocking_redis': _pool_counts(self._blocking_redis.connection_pool if self._blocking_redis else None),
+            'http': _connector_counts(self._http.connector if self._http else None),
+        }
+        result: Dict[str, float] = {
+            f'clients.{kind}.{name}': value
+            for kind, values in counts.items()
+            for name, value in values.items()
+        }
+        for kind, healthy in self._healthy.items():
+            result[f'clients.{kind}.healthy'] = int(healthy)
+        return result
+
+
+clients = ClientRegistry(
+    config.DOCKER_HOST,
+    config.REDIS_BROKER_URL,
+    config.DOCKER_MAX_CONNECTIONS,
+    config.REDIS_MAX_CONNECTIONS,
+    config.HTTP_MAX_CONNECTIONS,
+    config.CLIENT_HEALTH_CHECK_INTERVAL,
+    config.REDIS_BLOCKING_MAX_CONNECTIONS,
+)
@@ -0,0 +1,126 @@
+import email.utils
+import mimetypes
+import os
+import re
+from pathlib import Path
+from typing import AsyncIterator, Optional, Tuple
+
+import aiofiles
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+IMMUTABLE = 'private, max-age=31536000, immutable'
+REVALIDATE = 'private, no-cache'
+
+CHUNK_SIZE = 64 * 1024
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_etag(stat: os.stat_result) -> str:
+    """Changes with any write or replace of the file, without reading it."""
+    return f'"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # weak comparison, as If-None-Match uses
+    if header.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in header.split(','))
+
+
+def _not_modified(request: Request, etag: str, stat: os.stat_result) -> bool:
+    if (if_none_match := request.headers.get('if-none-match')) is not None:
+        return _etag_matches(if_none_match, etag)
+    if (if_modified_since := request.headers.get('if-modified-since')) is not None:
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return int(stat.st_mtime) <= since.timestamp()
+    return False
+
+
+def _byte_range(request: Request, etag: str, stat: os.stat_result) -> Optional[Tuple[int, int]]:
+    """
+    The first and last byte of a single satisfiable range, `None` for the whole file.
+    Multiple ranges are served as the whole file, an unsatisfiable range raises `ValueError`.
+    """
+    header = request.headers.get('range')
+    if header is None or stat.st_size == 0:
+        return None
+    if (if_range := request.headers.get('if-range')) is not None:
+        # the range is only valid for the version of the file the client has
+        if if_range.strip() != etag and if_range.strip() != email.utils.formatdate(stat.st_mtime, usegmt=True):
+            return None
+    if (match := _RANGE.match(header.strip())) is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # the last `last` bytes
+        start, end = max(stat.st_size - int(last), 0), stat.st_size - 1
+    else:
+        start, end = int(first), min(int(last), stat.st_size - 1) if last else stat.st_size - 1
+        if last and int(last) < start:
+            # not a valid range, ignored
+            return None
+    if start >= stat.st_size:
+        raise ValueError(header)
+    return start, end
+
+
+async def _read(path: Path, start: int, length: int) -> AsyncIterator[bytes]:
+    async with aiofiles.open(path, 'rb') as file:
+        await file.seek(start)
+        while length > 0:
+            chunk = await file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def cached_file_response(
+    request: Request,
+    path: Path,
+    cache_control: str = REVALIDATE,
+    etag: Optional[str] = None,
+    media_type: Optional[str] = None,
+) -> Response:
+    """
+    `path` with a strong ETag and Last-Modified, answering If-None-Match and If-Modified-Since
+    with 304 and a single byte range with 206. `etag` defaults to one from the file's inode,
+    mtime and size, content addressed files can pass their hash.
+    """
+    stat = path.stat()
+    etag = etag or file_etag(stat)
+    media_type = media_type or mimetypes.guess_type(path.name)[0] or 'text/plain'
+    headers = {
+        'etag': etag,
+        'last-modified': email.utils.formatdate(stat.st_mtime, usegmt=True),
+        'cache-control': cache_control,
+        'accept-ranges': 'bytes',
+    }
+    if _not_modified(request, etag, stat):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        byte_range = _byte_range(request, etag, stat)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, 'content-range': f'bytes */{stat.st_size}'})
+    if byte_range is None:
+        return FileResponse(path, headers=headers, media_type=media_type, stat_result=stat)
+
+    start, end = byte_range
+    return StreamingResponse(
+        _read(path, start, end - start + 1),
+        status_code=206,
+        headers={
+            **headers,
+            'content-range': f'bytes {start}-{end}/{stat.st_size}',
+            'content-length': str(end - start + 1),
+        },
+        media_type=media_type,
+    )
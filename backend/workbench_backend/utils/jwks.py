@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from jose import JWTError
+
+from .metrics import metrics
+
+JWK = Dict[str, Any]
+
+
+class UnknownKeyError(JWTError):
+    pass
+
+
+class JWKSUnavailable(Exception):
+    pass
+
+
+class JWKSKeyManager:
+    """
+    Signing keys of an issuer, fetched lazily from its JWKS endpoint and kept by `kid`.
+    Keys older than `max_age - refresh_ahead` are refreshed in the background, keys
+    older than `max_age` before they are used. An unknown `kid` triggers a refetch,
+    so rotated keys are picked up without a restart. Fetches are at least
+    `min_refetch_interval` seconds apart, failed fetches keep the cached keys.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        max_age: float,
+        refresh_ahead: float,
+        min_refetch_interval: float,
+        timeout: float = 5,
+    ) -> None:
+        self.url = url
+        self.max_age = max_age
+        self.refresh_ahead = refresh_ahead
+        self.min_refetch_interval = min_refetch_interval
+        self.timeout = timeout
+        self._keys: Dict[str, JWK] = {}
+        self._fetched_at = float('-inf')
+        self._attempted_at = float('-inf')
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task[None]] = None
+        metrics.gauge('jwks.keys', lambda: len(self._keys))
+
+    async def get_key(self, kid: Optional[str]) -> JWK:
+        age = time.monotonic() - self._fetched_at
+        if not self._keys or age >= self.max_age:
+            await self.refresh()
+        elif age >= self.max_age - self.refresh_ahead:
+            self._refresh_in_background()
+        key = self._lookup(kid)
+        if key is None and self._keys:
+            await self.refresh()
+            key = self._lookup(kid)
+        if key is None:
+            if not self._keys:
+                raise JWKSUnavailable(f'No signing keys available from {self.url}')
+            raise UnknownKeyError(f'Unknown signing key: {kid}')
+        return key
+
+    async def refresh(self) -> None:
+        if self._lock.locked():
+            # a fetch is in flight, its result serves this caller too
+            async with self._lock:
+                return
+        async with self._lock:
+            if time.monotonic() - self._attempted_at < self.min_refetch_interval:
+                return
+            self._attempted_at = time.monotonic()
+            try:
+                async with httpx.AsyncClient(timeout=self.timeout) as client:
+                    resp = await client.get(self.url)
+                    resp.raise_for_status()
+                    jwks = resp.json()
+            except (httpx.HTTPError, ValueError) as e:
+                metrics.inc('jwks.fetch_errors')
+                logging.warning(f"Couldn't fetch signing keys from {self.url}", exc_info=e)
+                return
+            self._keys = {
+                key['kid']: key
+                for key in jwks.get('keys', [])
+                if 'kid' in key and key.get('use', 'sig') == 'sig'
+            }
+            self._fetched_at = time.monotonic()
+            metrics.inc('jwks.fetches')
+
+    def _refresh_in_background(self) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh())
+
+    def _lookup(self, kid: Optional[str]) -> Optional[JWK]:
+        if kid is None and len(self._keys) == 1:
+            return next(iter(self._keys.values()))
+        return self._keys.get(kid) if kid is not None else None
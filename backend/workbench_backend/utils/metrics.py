@@ -0,0 +1,57 @@
+import statistics
+import threading
+from collections import defaultdict, deque
+from typing import Callable, Deque, Dict, List
+
+
+class Metrics:
+    """
+    Process local counters, gauges and observations, exposed on `/metrics`.
+    Gauges are callables evaluated when a snapshot is taken, observations
+    keep the last `window` values and are reported as p50/p99/max.
+    """
+
+    def __init__(self, window: int = 1000) -> None:
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._collectors: List[Callable[[], Dict[str, float]]] = []
+        self._observations: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def counter(self, name: str) -> float:
+        return self._counters.get(name, 0)
+
+    def gauge(self, name: str, func: Callable[[], float]) -> None:
+        self._gauges[name] = func
+
+    def collector(self, func: Callable[[], Dict[str, float]]) -> None:
+        """For values with dynamic names, e.g. one per session."""
+        self._collectors.append(func)
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            self._counters[f'{name}.count'] += 1
+            self._observations[name].append(value)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            result = dict(self._counters)
+            observations = {name: list(values) for name, values in self._observations.items()}
+        for name, values in observations.items():
+            if len(values) > 1:
+                quantiles = statistics.quantiles(values, n=100, method='inclusive')
+                result[f'{name}.p50'] = quantiles[49]
+                result[f'{name}.p99'] = quantiles[98]
+            result[f'{name}.max'] = max(values)
+        for name, func in self._gauges.items():
+            result[name] = func()
+        for collector in self._collectors:
+            result.update(collector())
+        return result
+
+
+metrics = Metrics()
@@ -1,23 +1,14 @@
-import asyncio
-
-# import hashlib
 import hashlib
 import logging
 from typing import Optional
 
-import aiohttp
-from redis import asyncio as aioredis
 from sqlalchemy import UUID
-from tenacity import (
-    retry,
-    retry_if_exception_type,
-    stop_after_attempt,
-    wait_exponential,
-)
 
 from ..app.config import config
 from ..db.models.app import App
 from ..db.models.service import Service
+from .clients import clients
+from .readiness import wait_ready
 
 
 def hash_path(user_id: UUID[str], obj: App | Service, session_id: Optional[str] = None) -> str:
@@ -31,37 +22,10 @@ def hash_path(user_id: UUID[str], obj: App | Service, session_id: Optional[str]
 def proxy_url(hash: str) -> str:
     return f"{config.SCHEME}://{config.PROXY_TEMPLATE.format(hash=hash)}"
 
-@retry(
-        retry=retry_if_exception_type(RuntimeError),
-        stop=stop_after_attempt(7),
-        wait=wait_exponential(multiplier=1, max=5, exp_base=2),
-        reraise=True
-)
-async def check_service_up(service_name: str) -> None:
-    async with aiohttp.ClientSession(config.TRAEFIK_API_URL) as session:
-         async with session.get(f'/api/http/services/{service_name}') as resp:
-            if resp.status == 200:
-                data = await resp.json()
-                for _key, value in data.get('serverStatus',{}).items():
-                    if value != 'UP':
-                        raise RuntimeError('Service is starting')
-            else:
-                raise RuntimeError('Service not up')
-
-async def wait_service_up(service_name: str) -> bool:
-    try:
-        await check_service_up(service_name)
-        await asyncio.sleep(2)
-        return True
-    except RuntimeError:
-        return False
-
-
 class ProxyService:
 
     def __init__(self) -> None:
-        self.redis = aioredis.from_url(config.REDIS_BROKER_URL) # type: ignore
-        self.traefik_client = aiohttp.ClientSession(config.TRAEFIK_API_URL)
+        self.redis = clients.redis()
 
     async def new_service(self,name: str, ip: str, port: int) -> Optional[str]:
         async with self.redis.pipeline() as pipe:
@@ -72,7 +36,7 @@ class ProxyService:
             await pipe.set(f"traefik/http/routers/{name}/middlewares","apps-middleware@file, proxy-auth@file")
             result = await pipe.execute()
             logging.debug(f"Traefik variables set: {result}")
-        ready = await self.wait_service_up(name)
+        ready = await wait_ready(ip, port, f"{name}@redis")
         if ready:
             return proxy_url(name)
         else:
@@ -87,12 +51,3 @@ class ProxyService:
             f"traefik/http/routers/{name}/middlewares",
         )
         logging.debug(f"Traefik variables deleted: {result}")
-
-
-    async def wait_service_up(self, name: str) -> bool:
-        return await wait_service_up(f"{name}@redis")
-
-
-    async def close(self) -> None:
-        await self.redis.close()
-        await self.traefik_client.close()
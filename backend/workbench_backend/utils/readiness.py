@@ -0,0 +1,113 @@
+import asyncio
+import contextlib
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set
+
+import aiohttp
+
+from ..app.config import config
+from .clients import clients
+from .metrics import metrics
+
+
+async def wait_port_open(ip: str, port: int, timeout: float) -> bool:
+    """Connects to `ip:port` until it accepts, retrying quickly so the wait ends when the port opens."""
+    deadline = time.monotonic() + timeout
+    delay = 0.02
+    while True:
+        try:
+            _reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), 1)
+            writer.close()
+            with contextlib.suppress(OSError):
+                await writer.wait_closed()
+            return True
+        except (OSError, asyncio.TimeoutError):
+            pass
+        if time.monotonic() + delay >= deadline:
+            return False
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+
+class RouteWatcher:
+    """
+    Tells when Traefik has loaded a service. One poll of the service list
+    serves every waiter, and nothing is polled while there are no waiters.
+    """
+
+    def __init__(self, api_url: str, interval: float, per_page: int = 1000) -> None:
+        self._api_url = api_url
+        self._interval = interval
+        self._per_page = per_page
+        self._waiters: Dict[str, List[asyncio.Future[None]]] = {}
+        self._task: Optional[asyncio.Task[None]] = None
+
+    async def wait_published(self, service: str, timeout: float) -> bool:
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(service, []).append(future)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._watch())
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            waiters = self._waiters.get(service, [])
+            if future in waiters:
+                waiters.remove(future)
+            if not waiters:
+                self._waiters.pop(service, None)
+
+    async def _published(self) -> Set[str]:
+        published: Set[str] = set()
+        page = 1
+        while True:
+            params = {'page': str(page), 'per_page': str(self._per_page)}
+            async with clients.http().get(f'{self._api_url}/api/http/services', params=params) as resp:
+                resp.raise_for_status()
+                services: List[Dict[str, Any]] = await resp.json()
+                next_page = int(resp.headers.get('X-Next-Page') or 0)
+            for service in services:
+                if all(status == 'UP' for status in service.get('serverStatus', {}).values()):
+                    published.add(service['name'])
+            # traefik answers the last page with X-Next-Page: 1
+            if next_page <= page or len(services) < self._per_page:
+                return published
+            page = next_page
+
+    async def _watch(self) -> None:
+        while self._waiters:
+            try:
+                published = await self._published()
+                metrics.inc('route_watcher.polls')
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                logging.warning("Couldn't list traefik services", exc_info=e)
+                published = set()
+            for service in published & self._waiters.keys():
+                for future in self._waiters.pop(service):
+                    if not future.done():
+                        future.set_result(None)
+            if self._waiters:
+                await asyncio.sleep(self._interval)
+        # nothing is awaited between the last check and this, so a later waiter starts a new watch
+        self._task = None
+
+
+route_watcher = RouteWatcher(config.TRAEFIK_API_URL, config.ROUTE_WATCH_INTERVAL)
+
+
+async def wait_ready(ip: str, port: int, service: str, timeout: float = config.READINESS_TIMEOUT) -> bool:
+    """The upstream accepts connections and Traefik routes to it, both are awaited at the same time."""
+    started = time.perf_counter()
+    port_open, published = await asyncio.gather(
+        wait_port_open(ip, port, timeout),
+        route_watcher.wait_published(service, timeout)
+    )
+    metrics.observe('readiness.wait', time.perf_counter() - started)
+    if not port_open:
+        logging.warning(f"{ip}:{port} of {service} did not open in {timeout}s")
+    if not published:
+        logging.warning(f"Traefik did not publish {service} in {timeout}s")
+    return port_open and published
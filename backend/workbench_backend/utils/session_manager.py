@@ -1,10 +1,72 @@
-import json
-from typing import List, Optional, TypedDict
+import asyncio
+import contextlib
+import logging
+import time
+from typing import Dict, List, Optional, TypedDict
 from uuid import uuid4
 
 from redis import asyncio as aioredis
+from redis.commands.core import AsyncScript
 
 from ..app.config import config
+from .clients import clients
+from .ttl_cache import TTLCache
+
+# session:{id} is a hash with the session fields, session:{id}:proxies the set of
+# its proxy hashes, and proxy:{hash} the id of the session that opened the proxy.
+# Every key expires after SESSION_TTL unless the backend owning the session renews it.
+# Changes to proxy:{hash} keys are published on PROXY_CHANNEL by the same script.
+PROXY_CHANNEL = 'session:proxy_changes'
+
+_ADD_PROXY = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('SADD', KEYS[2], ARGV[1])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+redis.call('SET', KEYS[3], ARGV[2], 'EX', ARGV[3])
+redis.call('PUBLISH', ARGV[4], ARGV[1])
+return 1
+"""
+
+_REMOVE_PROXY = """
+if redis.call('SREM', KEYS[1], ARGV[1]) == 1 then
+    redis.call('DEL', KEYS[2])
+    redis.call('PUBLISH', ARGV[2], ARGV[1])
+end
+"""
+
+_END_SESSION = """
+for _, proxy_hash in ipairs(redis.call('SMEMBERS', KEYS[2])) do
+    redis.call('DEL', 'proxy:' .. proxy_hash)
+    redis.call('PUBLISH', ARGV[1], proxy_hash)
+end
+redis.call('DEL', KEYS[1], KEYS[2])
+"""
+
+_RENEW_SESSION = """
+if redis.call('EXPIRE', KEYS[1], ARGV[1]) == 0 then
+    return 0
+end
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+for _, proxy_hash in ipairs(redis.call('SMEMBERS', KEYS[2])) do
+    redis.call('EXPIRE', 'proxy:' .. proxy_hash, ARGV[1])
+end
+return 1
+"""
+
+_SESSION_BY_PROXY = """
+local session_id = redis.call('GET', KEYS[1])
+if not session_id then
+    return nil
+end
+local session_key = 'session:' .. session_id
+local email = redis.call('HGET', session_key, 'user_email')
+if not email then
+    return nil
+end
+return {session_id, email, redis.call('SMEMBERS', session_key .. ':proxies')}
+"""
 
 
 class SessionData(TypedDict):
@@ -13,52 +75,151 @@ class SessionData(TypedDict):
     proxy_hashes: List[str]
 
 class SessionManager:
-    def __init__(self) -> None:
-        self.redis = aioredis.from_url(config.REDIS_BROKER_URL, decode_responses=True) # type: ignore
+    """
+    Sessions of the edit and run websockets, shared with `proxy_auth` through redis.
+    Updates are single scripts, so concurrent changes to a session cannot be lost.
+    """
+
+    def __init__(self, ttl: int = config.SESSION_TTL) -> None:
+        self.ttl = ttl
+        self._scripts: Dict[str, AsyncScript] = {}
+        self._scripts_client: Optional[aioredis.Redis] = None
+        self._heartbeats: Dict[str, asyncio.Task[None]] = {}
+
+    @property
+    def redis(self) -> aioredis.Redis:
+        return clients.redis()
+
+    def _script(self, source: str) -> AsyncScript:
+        redis = self.redis
+        if redis is not self._scripts_client:
+            self._scripts = {}
+            self._scripts_client = redis
+        if (script := self._scripts.get(source)) is None:
+            script = self._scripts[source] = redis.register_script(source)
+        return script
 
     async def start_session(self, user_email: str) -> str:
         session_id = str(uuid4())
-        session_data: SessionData = {
-            "id": session_id,
-            "user_email": user_email,
-            "proxy_hashes": []
-        }
-        await self._set_session(session_id, session_data)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(f"session:{session_id}", mapping={"id": session_id, "user_email": user_email})
+            pipe.expire(f"session:{session_id}", self.ttl)
+            await pipe.execute()
+        self._heartbeats[session_id] = asyncio.create_task(self._heartbeat(session_id))
         return session_id
 
     async def end_session(self, session_id: str) -> None:
-        session_data = await self._get_session(session_id)
-        if session_data:
-            for proxy_hash in session_data["proxy_hashes"]:
-                await self.redis.delete(f"proxy:{proxy_hash}")
-            await self.redis.delete(f"session:{session_id}")
+        if (heartbeat := self._heartbeats.pop(session_id, None)) is not None:
+            heartbeat.cancel()
+        await self._script(_END_SESSION)(
+            keys=[f"session:{session_id}", f"session:{session_id}:proxies"],
+            args=[PROXY_CHANNEL]
+        )
 
     async def add_proxy_hash_to_session(self, session_id: str, proxy_hash: str) -> None:
-        session_data = await self._get_session(session_id)
-        if session_data and proxy_hash not in session_data["proxy_hashes"]:
-            session_data["proxy_hashes"].append(proxy_hash)
-            await self._set_session(session_id, session_data)
-            await self.redis.set(f"proxy:{proxy_hash}", session_id)
+        await self._script(_ADD_PROXY)(
+            keys=[f"session:{session_id}", f"session:{session_id}:proxies", f"proxy:{proxy_hash}"],
+            args=[proxy_hash, session_id, self.ttl, PROXY_CHANNEL]
+        )
 
     async def remove_proxy_hash_from_session(self, session_id: str, proxy_hash: str) -> None:
-        session_data = await self._get_session(session_id)
-        if session_data and proxy_hash in session_data["proxy_hashes"]:
-            session_data["proxy_hashes"].remove(proxy_hash)
-            await self._set_session(session_id, session_data)
-            await self.redis.delete(f"proxy:{proxy_hash}")
+        await self._script(_REMOVE_PROXY)(
+            keys=[f"session:{session_id}:proxies", f"proxy:{proxy_hash}"],
+            args=[proxy_hash, PROXY_CHANNEL]
+        )
 
     async def get_session_by_proxy_hash(self, proxy_hash: str) -> Optional[SessionData]:
-        session_id = await self.redis.get(f"proxy:{proxy_hash}")
-        if session_id:
-            return await self._get_session(session_id)
-        return None
+        result = await self._script(_SESSION_BY_PROXY)(keys=[f"proxy:{proxy_hash}"])
+        if not result:
+            return None
+        session_id, user_email, proxy_hashes = result
+        return {"id": session_id, "user_email": user_email, "proxy_hashes": proxy_hashes}
 
-    async def _get_session(self, session_id: str) -> Optional[SessionData]:
-        session_data = await self.redis.get(f"session:{session_id}")
-        return json.loads(session_data) if session_data else None
+    async def renew_session(self, session_id: str) -> bool:
+        """False if the session already expired."""
+        return bool(await self._script(_RENEW_SESSION)(
+            keys=[f"session:{session_id}", f"session:{session_id}:proxies"],
+            args=[self.ttl]
+        ))
 
-    async def _set_session(self, session_id: str, session_data: SessionData) -> None:
-        await self.redis.set(f"session:{session_id}", json.dumps(session_data))
+    async def _heartbeat(self, session_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            try:
+                if not await self.renew_session(session_id):
+                    logging.warning(f"Session {session_id} expired before it was renewed")
+            except aioredis.RedisError as e:
+                logging.warning(f"Couldn't renew session {session_id}", exc_info=e)
 
     async def close(self) -> None:
-        await self.redis.close()
+        for heartbeat in self._heartbeats.values():
+            heartbeat.cancel()
+        self._heartbeats.clear()
+
+
+class ProxyUserCache:
+    """
+    In-process tier in front of the session store for `proxy_auth`: the email of
+    the user whose session opened a proxy, or `None` for unknown proxies.
+    Entries are dropped when a change to the proxy is published on PROXY_CHANNEL.
+    While the subscription is down every lookup goes to redis.
+    """
+
+    def __init__(self, manager: SessionManager, maxsize: int, ttl: float, negative_ttl: float) -> None:
+        self._manager = manager
+        self._negative_ttl = negative_ttl
+        # '' marks a proxy without a session
+        self._cache: TTLCache[str, str] = TTLCache('proxy_auth.cache', maxsize, ttl)
+        self._subscribed = False
+        self._changes = 0
+        self._task: Optional[asyncio.Task[None]] = None
+
+    async def user_of(self, proxy_hash: str) -> Optional[str]:
+        if self._subscribed and (cached := self._cache.get(proxy_hash)) is not None:
+            return cached or None
+        changes = self._changes
+        session = await self._manager.get_session_by_proxy_hash(proxy_hash)
+        user = session["user_email"] if session else None
+        # a change published during the lookup may not be reflected in its result
+        if self._subscribed and changes == self._changes:
+            self._cache.set(proxy_hash, user or '', None if user else time.time() + self._negative_ttl)
+        return user
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self._manager.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(PROXY_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "subscribe":
+                            # changes published before the subscription were missed
+                            self._cache.clear()
+                            self._subscribed = True
+                        elif message["type"] == "message":
+                            self._changes += 1
+                            self._cache.pop(message["data"])
+            except aioredis.RedisError as e:
+                logging.warning("Proxy change subscription lost", exc_info=e)
+            finally:
+                self._subscribed = False
+            await asyncio.sleep(1)
+
+    def start(self) -> None:
+        if not self._task:
+            self._task = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+
+session_manager = SessionManager()
+proxy_user_cache = ProxyUserCache(
+    session_manager,
+    config.PROXY_AUTH_CACHE_SIZE,
+    config.PROXY_AUTH_CACHE_TTL,
+    config.PROXY_AUTH_NEGATIVE_TTL
+)
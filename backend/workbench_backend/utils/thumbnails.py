@@ -0,0 +1,43 @@
+import asyncio
+import os
+import uuid
+from pathlib import Path
+
+from PIL import Image, UnidentifiedImageError
+
+THUMBNAILS_DIR = 'thumbnails'
+
+
+def thumbnail_path(image: Path, size: int) -> Path:
+    return image.parent / THUMBNAILS_DIR / f'{image.stem}-{size}.png'
+
+
+def _resize(image: Path, destination: Path, size: int) -> bool:
+    partial = destination.with_name(f'.{destination.name}.{uuid.uuid4().hex}')
+    try:
+        with Image.open(image) as img:
+            img.thumbnail((size, size))
+            if img.mode not in ('1', 'L', 'LA', 'P', 'RGB', 'RGBA'):
+                img = img.convert('RGBA')
+            img.save(partial, format='PNG')
+    except (UnidentifiedImageError, OSError):
+        partial.unlink(missing_ok=True)
+        return False
+    # never a partly written thumbnail, whichever request finishes first
+    os.replace(partial, destination)
+    return True
+
+
+async def thumbnail(image: Path, size: int) -> Path:
+    """
+    `image` scaled down to fit in `size` x `size`, made once and kept next to it.
+    Images are named by the hash of their content, so their thumbnails never change.
+    Returns `image` itself if it can't be resized, like an SVG.
+    """
+    destination = thumbnail_path(image, size)
+    if destination.exists():
+        return destination
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    if await asyncio.to_thread(_resize, image, destination, size):
+        return destination
+    return image
@@ -0,0 +1,58 @@
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, Tuple, TypeVar
+
+from .metrics import metrics
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Bounded in-process cache, least recently used entries are evicted first.
+    Every entry has its own expiry, as a `time.time()` timestamp.
+    Hits, misses and evictions are counted as `<name>.hits/misses/evictions`.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float) -> None:
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[K, Tuple[float, V]] = OrderedDict()
+        metrics.gauge(f'{name}.size', lambda: len(self._entries))
+
+    def get(self, key: K) -> Optional[V]:
+        entry = self._entries.get(key)
+        if entry is None:
+            metrics.inc(f'{self.name}.misses')
+            return None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            metrics.inc(f'{self.name}.misses')
+            return None
+        self._entries.move_to_end(key)
+        metrics.inc(f'{self.name}.hits')
+        return value
+
+    def set(self, key: K, value: V, expires_at: Optional[float] = None) -> None:
+        """Kept until `expires_at`, but never longer than the cache ttl."""
+        if self.maxsize <= 0:
+            return
+        limit = time.time() + self.ttl
+        self._entries[key] = (min(expires_at, limit) if expires_at is not None else limit, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            metrics.inc(f'{self.name}.evictions')
+
+    def pop(self, key: K) -> Optional[V]:
+        entry = self._entries.pop(key, None)
+        return entry[1] if entry else None
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)